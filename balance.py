@@ -0,0 +1,62 @@
+"""
+This file is a part of the source code for rpg-tile-game
+This project has been licensed under the MIT license.
+Copyright (c) 2022-present SSS-Says-Snek
+
+This file is used to run balance simulations in worker processes, and report how each config did (see
+`settings/balance.json`)
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import time
+
+# Nothing is drawn, so there doesn't need to be a window (or a sound device)
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+from src.common import SETTINGS_DIR
+from src.sim import farm
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Runs balance simulations with every combination of settings")
+    parser.add_argument("--settings", default=SETTINGS_DIR / "balance.json", help="Balance settings file")
+    parser.add_argument("--workers", type=int, help="Number of worker processes (defaults to the settings)")
+    parser.add_argument("--out", default="balance_report.csv", help="CSV file for the result of every run")
+    parser.add_argument(
+        "--record", metavar="PATH", help="Only runs the first scenario once, and saves its controls to replay later"
+    )
+    args = parser.parse_args()
+
+    with open(args.settings) as f:
+        balance_settings = json.load(f)
+
+    if args.record is not None:
+        game = farm.Game()
+        task = farm.make_tasks(balance_settings)[0]
+        result = farm.run_task(game, game.settings.data, task, record=True)
+        with open(args.record, "w") as f:
+            json.dump(result.pop("recording"), f)
+        print(result)
+        raise SystemExit
+
+    def on_result(result: farm.Result, num_results: int, num_tasks: int):
+        if result["error"] is not None:
+            print(f"[{num_results}/{num_tasks}] config {result['config']} failed:\n{result['error']}")
+        else:
+            time_to_kill = "-" if result["time_to_kill"] is None else f"{result['time_to_kill']:.2f}s"
+            print(
+                f"[{num_results}/{num_tasks}] config {result['config']} {result['scenario']} seed {result['seed']}: "
+                f"ttk {time_to_kill}, took {result['damage_taken']:.0f} damage, {result['frame_ms_mean']:.3f} ms/frame"
+            )
+
+    time_started = time.perf_counter()
+    results = farm.run_batch(balance_settings, args.workers, on_result)
+    time_elapsed = time.perf_counter() - time_started
+
+    farm.write_results(args.out, results)
+    print(farm.format_summary(farm.summarise(results)))
+    print(f"{len(results)} runs in {time_elapsed:.1f}s, written to {args.out}")
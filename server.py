@@ -0,0 +1,24 @@
+"""
+This file is a part of the source code for rpg-tile-game
+This project has been licensed under the MIT license.
+Copyright (c) 2022-present SSS-Says-Snek
+
+This file is used to run a headless game server (see `settings/server.json`)
+"""
+
+from __future__ import annotations
+
+import os
+
+# Nothing is drawn, so there doesn't need to be a window (or a sound device)
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+from src.game import Game
+from src.net.server import GameServer
+
+if __name__ == "__main__":
+    game = Game()
+    server = GameServer(game.state)
+    print(f"Serving on {server.address[0]}:{server.address[1]}")
+    server.run()
@@ -8,4 +8,4 @@ This file imports some common things from... common
 
 from __future__ import annotations
 
-from .common import pygame, screen
+from .common import pygame
@@ -0,0 +1,55 @@
+"""
+This file is a part of the source code for rpg-tile-game
+This project has been licensed under the MIT license.
+Copyright (c) 2022-present SSS-Says-Snek
+
+This file defines the Bootstrap class, which times the phases of startup (e.g creating the display, loading images)
+"""
+from __future__ import annotations
+
+import contextlib
+import time
+from typing import Iterator
+
+
+class Bootstrap:
+    def __init__(self):
+        """Times each phase of startup, in the order they ran, to report where startup time goes"""
+
+        self.timings: list[tuple[str, float]] = []
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """
+        Times a phase, e.g `with bootstrap.phase("images"): ...`
+
+        Args:
+            name: Name of the phase
+        """
+
+        time_started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings.append((name, (time.perf_counter() - time_started) * 1000))
+
+    @property
+    def total(self) -> float:
+        """Milliseconds spent in every phase"""
+
+        return sum(ms for _, ms in self.timings)
+
+    def report(self) -> str:
+        """
+        Breaks down the startup time by phase
+
+        Returns:
+            A table of how long each phase took, and its share of the total
+        """
+
+        total = self.total
+        lines = ["Startup:"]
+        for name, ms in self.timings:
+            lines.append(f"  {name:<16}{ms:>9.1f} ms {ms / total if total > 0 else 0:>5.0%}")
+        lines.append(f"  {'total':<16}{total:>9.1f} ms")
+        return "\n".join(lines)
@@ -8,33 +8,94 @@ This file defines some common variables
 from __future__ import annotations
 
 import pathlib
+from typing import TYPE_CHECKING
 
 import pygame
 
-pygame.init()
+if TYPE_CHECKING:
+    from src.types import JSONSerializable
+
+SOURCE_DIR = pathlib.Path("src")
+ASSETS_DIR = pathlib.Path("assets")
+SAVE_DIR = ASSETS_DIR / "save"
+MAP_DIR = ASSETS_DIR / "maps"
+FONT_DIR = ASSETS_DIR / "fonts"
+IMG_DIR = ASSETS_DIR / "imgs"
+SETTINGS_DIR = ASSETS_DIR / "settings"
+ANIM_DIR = ASSETS_DIR / "imgs" / "animations"
+SHADER_DIR = SOURCE_DIR / "display" / "shaders"
 
 TILE_WIDTH = 32
 TILE_HEIGHT = 32
 TILE_ROW = 30
 TILE_COLUMN = 25
 
-WIDTH = TILE_WIDTH * TILE_ROW
-HEIGHT = TILE_HEIGHT * TILE_COLUMN
+WINDOW_WIDTH = TILE_WIDTH * TILE_ROW
+WINDOW_HEIGHT = TILE_HEIGHT * TILE_COLUMN
+WINDOW_RES = (WINDOW_WIDTH, WINDOW_HEIGHT)
+
+# Display settings, set by `init_display`. Before that, they're as if the render scale were 1 with no native UI
+RENDER_SCALE: int = 1
+NATIVE_UI: bool = False
+
+# The world renders at 1 / RENDER_SCALE of the window resolution, then gets upscaled (integer scales only)
+WIDTH = WINDOW_WIDTH
+HEIGHT = WINDOW_HEIGHT
 RES = (WIDTH, HEIGHT)
 
+# UI is either drawn at the window resolution, or with the world at the render resolution
+UI_RES = RES
+UI_WIDTH, UI_HEIGHT = UI_RES
+
 FPS = 60
 BASE_FPS = 60
 
-screen = pygame.display.set_mode(RES)
+# The window, the render target the world is drawn on, and the surface the UI is drawn on. Created by `init_display`
+window: pygame.Surface
+screen: pygame.Surface
+ui_screen: pygame.Surface
+
+
+def init_display(display_settings: dict[str, JSONSerializable]):
+    """
+    Creates the window and the surfaces drawn on. Has to be called (after `pygame.init`) before anything is drawn or
+    any image is converted
+
+    Args:
+        display_settings: The display settings, from `settings/display.json`
+
+    Raises:
+        ValueError: If the render scale isn't a positive integer
+    """
+
+    global RENDER_SCALE, NATIVE_UI, WIDTH, HEIGHT, RES, UI_RES, UI_WIDTH, UI_HEIGHT, window, screen, ui_screen
+
+    render_scale = display_settings["render_scale"]
+    if not isinstance(render_scale, int) or render_scale < 1:
+        raise ValueError(f"Render scale must be a positive integer, not {render_scale!r}")
+
+    RENDER_SCALE = render_scale
+    NATIVE_UI = display_settings["native_ui"]
+
+    WIDTH = WINDOW_WIDTH // RENDER_SCALE
+    HEIGHT = WINDOW_HEIGHT // RENDER_SCALE
+    RES = (WIDTH, HEIGHT)
+
+    UI_RES = WINDOW_RES if NATIVE_UI else RES
+    UI_WIDTH, UI_HEIGHT = UI_RES
+
+    window = pygame.display.set_mode(WINDOW_RES)
+    if RENDER_SCALE == 1:
+        screen = window
+    else:
+        screen = pygame.Surface(RES).convert()
+
+    if NATIVE_UI and RENDER_SCALE != 1:
+        # Transparent overlay that is blitted onto the window after the world is upscaled
+        ui_screen = pygame.Surface(WINDOW_RES, pygame.SRCALPHA)
+    else:
+        ui_screen = screen
+
+
 # screen = pygame.Surface(RES)
 # pygame.display.set_mode(RES, pygame.DOUBLEBUF | pygame.OPENGL)
-
-SOURCE_DIR = pathlib.Path("src")
-ASSETS_DIR = pathlib.Path("assets")
-SAVE_DIR = ASSETS_DIR / "save"
-MAP_DIR = ASSETS_DIR / "maps"
-FONT_DIR = ASSETS_DIR / "fonts"
-IMG_DIR = ASSETS_DIR / "imgs"
-SETTINGS_DIR = ASSETS_DIR / "settings"
-ANIM_DIR = ASSETS_DIR / "imgs" / "animations"
-SHADER_DIR = SOURCE_DIR / "display" / "shaders"
@@ -9,13 +9,17 @@ Attributes:
     time (Time): A global state for the game's current time (adjusted with pausing)
     dt (DT): A global state for the game's current deltatime (for framerate independance)
     event (Event): A global state for the game's current event queue
+    dirty_rects (DirtyRects): A global state for the regions of the screen that changed this frame
+    timers (Timers): A global state for the callbacks waiting on the game's time
 """
 
 from __future__ import annotations
 
-from typing import Callable
+import heapq
+import itertools
+from typing import Callable, Optional
 
-from src import pygame
+from src import common, pygame
 from src.common import BASE_FPS
 from src.display.transition import EaseTransition
 from src.types import Events
@@ -30,6 +34,9 @@ class Time:
         self.pause_time = 0
         self.paused = False
 
+        # Ticks of the manual clock, or None if time follows the real time (see `use_manual_clock`)
+        self.manual_ticks: Optional[float] = None
+
     def get_ticks(self) -> float:
         """
         Gets ticks since pygame app was opened, adjusted with pausing
@@ -38,9 +45,11 @@ class Time:
             Ticks since pygame app opened, adjusted with pausing
         """
 
-        if not self.paused:
-            return pygame.time.get_ticks() - self.offsetted_time
-        return self.pause_time
+        if self.paused:
+            return self.pause_time
+        if self.manual_ticks is not None:
+            return self.manual_ticks
+        return pygame.time.get_ticks() - self.offsetted_time
 
     @staticmethod
     def get_raw_ticks() -> float:
@@ -57,15 +66,53 @@ class Time:
         """Pauses time. Any call to `get_ticks` will return the paused time"""
 
         if not self.paused:
-            self.pause_time = pygame.time.get_ticks() - self.offsetted_time
+            self.pause_time = self.get_ticks()
             self.paused = True
 
     def unpause(self):
         """Unpauses time. Offset time is set to adjust for pause duration, `get_ticks` behaves normally"""
 
         if self.paused:
-            self.offsetted_time = pygame.time.get_ticks() - self.pause_time
             self.paused = False
+            self.set_ticks(self.pause_time)
+
+    def set_ticks(self, ticks: float):
+        """
+        Jumps to a point in time, e.g when loading a save. Time keeps going (or stays paused) from there
+
+        Args:
+            ticks: The new ticks, adjusted with pausing
+        """
+
+        if self.paused:
+            self.pause_time = ticks
+        elif self.manual_ticks is not None:
+            self.manual_ticks = ticks
+        else:
+            self.offsetted_time = pygame.time.get_ticks() - ticks
+
+    def use_manual_clock(self, ticks: float = 0):
+        """
+        Stops following the real time. Time then only moves with `advance`, e.g for simulations that run faster than
+        real time
+
+        Args:
+            ticks: The ticks to start at
+        """
+
+        self.manual_ticks = ticks
+        self.set_ticks(ticks)
+
+    def advance(self, ms: float):
+        """
+        Moves the manual clock forward, unless time is paused
+
+        Args:
+            ms: Milliseconds to move forward by
+        """
+
+        if self.manual_ticks is not None and not self.paused:
+            self.manual_ticks += ms
 
 
 class DT:
@@ -149,7 +196,197 @@ class Event:
         return self.events
 
 
+class Timer:
+    def __init__(self, deadline: float, callback: Callable[[], None], interval: Optional[float] = None):
+        """
+        A callback waiting to be called by the timer service. Gets returned so it can be cancelled
+
+        Args:
+            deadline: The time (from `time.get_ticks`) the callback gets called at
+            callback: The callback
+            interval: If not None, the timer repeats with this period in milliseconds
+        """
+
+        self.deadline = deadline
+        self.callback = callback
+        self.interval = interval
+
+        self.active = True
+
+    def cancel(self):
+        """Stops the timer. Cancelled timers are left in the heap and skipped when they're popped"""
+
+        self.active = False
+
+
+class Timers:
+    def __init__(self):
+        """
+        A pause-aware timer service. Timers are kept in a heap keyed on their deadline, so each frame only touches the
+        timers that expired, no matter how many are waiting. Deadlines use `time.get_ticks`, so timers stop while the
+        game is paused
+        """
+
+        self.heap: list[tuple[float, int, Timer]] = []
+        self.counter = itertools.count()  # Breaks ties, so timers with the same deadline fire in order of creation
+
+    def push(self, timer: Timer) -> Timer:
+        heapq.heappush(self.heap, (timer.deadline, next(self.counter), timer))
+        return timer
+
+    def after(self, delay: float, callback: Callable[[], None]) -> Timer:
+        """
+        Calls a callback once after a delay
+
+        Args:
+            delay: The delay in milliseconds
+            callback: The callback
+
+        Returns:
+            The timer
+        """
+
+        return self.push(Timer(time.get_ticks() + delay, callback))
+
+    def every(self, interval: float, callback: Callable[[], None]) -> Timer:
+        """
+        Calls a callback every interval, starting one interval from now, until the timer is cancelled
+
+        Args:
+            interval: The interval in milliseconds
+            callback: The callback
+
+        Returns:
+            The timer
+
+        Raises:
+            ValueError: If the interval isn't positive
+        """
+
+        if interval <= 0:
+            raise ValueError(f"Timer interval must be positive, got {interval}")
+
+        return self.push(Timer(time.get_ticks() + interval, callback, interval))
+
+    def update(self):
+        """Calls the callbacks of every expired timer. Should be called once a frame"""
+
+        now = time.get_ticks()
+        while self.heap and self.heap[0][0] <= now:
+            _, _, timer = heapq.heappop(self.heap)
+            if not timer.active:
+                continue
+
+            if timer.interval is None:
+                timer.active = False
+            else:
+                # Doesn't try to catch up on missed intervals after a long frame
+                timer.deadline += timer.interval
+                if timer.deadline <= now:
+                    timer.deadline = now + timer.interval
+                self.push(timer)
+
+            timer.callback()
+
+    def clear(self):
+        """Cancels every timer"""
+
+        for _, _, timer in self.heap:
+            timer.active = False
+        self.heap.clear()
+
+    def __len__(self) -> int:
+        return len(self.heap)
+
+
+class DirtyRects:
+    def __init__(self, max_rects: int = 64):
+        """
+        Keeps track of which regions of the screen changed this frame, so only those get pushed to the display
+
+        Args:
+            max_rects: Most rects to pass to the display at once, before they all get merged into one
+        """
+
+        self.enabled = False
+        self.max_rects = max_rects
+        self.screen_rect = pygame.Rect((0, 0), common.RES)  # Resized once the display is created
+
+        self.rects: list[pygame.Rect] = []
+        self.last_rects: list[pygame.Rect] = []
+        self.full = True
+        self.last_full = True
+
+    def mark(self, rect: Optional[pygame.Rect]):
+        """
+        Marks a region of the screen as changed. Drawing functions return their bounding rect, so they can be passed in
+
+        Args:
+            rect: The changed region in screen coordinates. None marks the entire screen
+        """
+
+        if not self.enabled:
+            return
+        if rect is None:
+            self.full = True
+            return
+
+        rect = self.screen_rect.clip(rect)
+        if rect.width and rect.height:
+            self.rects.append(rect)
+
+    def mark_all(self):
+        """Marks the entire screen as changed"""
+
+        self.full = True
+
+    @staticmethod
+    def merge(rects: list[pygame.Rect]) -> list[pygame.Rect]:
+        """
+        Merges overlapping rects together
+
+        Args:
+            rects: Rects to merge
+
+        Returns:
+            A list of rects that don't overlap each other
+        """
+
+        merged = []
+        for rect in rects:
+            idx = rect.collidelist(merged)
+            while idx != -1:
+                rect = rect.union(merged.pop(idx))
+                idx = rect.collidelist(merged)
+            merged.append(rect)
+
+        return merged
+
+    def update(self):
+        """
+        Updates the display. Regions that changed last frame are updated again as well, as whatever was drawn there
+        must be erased
+        """
+
+        if not self.enabled or self.full or self.last_full:
+            pygame.display.update()
+        else:
+            rects = self.merge(self.last_rects + self.rects)
+            if len(rects) > self.max_rects:
+                rects = [rects[0].unionall(rects[1:])]
+            scale = common.RENDER_SCALE
+            if scale != 1:
+                # Rects are on the render target, which gets upscaled into the window
+                rects = [pygame.Rect(rect.x * scale, rect.y * scale, rect.w * scale, rect.h * scale) for rect in rects]
+            pygame.display.update(rects)
+
+        self.last_rects, self.rects = self.rects, []
+        self.last_full, self.full = self.full, False
+
+
 # Glabal state, oooooo
 time = Time()
 event = Event()
 dt = DT(1.5)
+dirty_rects = DirtyRects()
+timers = Timers()
@@ -7,9 +7,10 @@ This file defines some animation-related things
 """
 from __future__ import annotations
 
+import copy
 import pathlib
 
-from src import pygame, screen
+from src import common, pygame
 from src.types import Size
 
 
@@ -33,7 +34,19 @@ class Animation:
         self.idx = 0
         self.num_frames = len(self.frames)
 
-    def play_anim(self, blit_pos, raw_dt: float, play_speed: int):
+    def copy(self) -> Animation:
+        """
+        Copies the animation without loading it again. The copy shares the frames, but plays on its own
+
+        Returns:
+            The copy
+        """
+
+        animation = copy.copy(self)
+        animation.idx = 0
+        return animation
+
+    def play_anim(self, blit_pos, raw_dt: float, play_speed: int) -> pygame.Rect:
         """
         Plays an animation and blits it on screen
 
@@ -41,12 +54,15 @@ class Animation:
             blit_pos: The blitting position
             raw_dt: DT for independant framerates
             play_speed: The playing speed for the animation
+
+        Returns:
+            The region of the screen drawn over
         """
 
         self.idx += raw_dt * play_speed
         self.idx %= self.num_frames
 
-        screen.blit(self.frames[int(self.idx)], blit_pos)
+        return common.screen.blit(self.frames[int(self.idx)], blit_pos)
 
 
 def load_spritesheet(spritesheet_path: pathlib.Path, sprite_size: Size) -> list[pygame.Surface]:
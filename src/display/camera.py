@@ -12,6 +12,8 @@ from __future__ import annotations
 import random
 from typing import Optional, Union
 
+import numpy as np
+
 from src import pygame
 
 
@@ -36,6 +38,10 @@ class Camera:
 
         self.camera = pygame.Rect(0, 0, self.camera_width, self.camera_height)
 
+        # What to add to a world position to get its screen position. Cached by `update_offset`
+        self.offset_x = 0
+        self.offset_y = 0
+
         self.last_shake = pygame.Vector2()
         self.shake_frames = 0
         self.shake_pixels = 3
@@ -71,6 +77,52 @@ class Camera:
             *target_pos.size,
         )
 
+    def update_offset(self):
+        """
+        Caches the camera offset used by `apply_xy` and `apply_many`.
+        Camera methods call it already, so it only needs to be called after moving `self.camera` directly
+        """
+
+        self.offset_x = -self.camera.x
+        self.offset_y = -self.camera.y
+
+    def apply_xy(self, x: float, y: float) -> tuple[int, int]:
+        """
+        A cheap version of `apply` for hot paths, which doesn't allocate any rects
+
+        Args:
+            x: Unadjusted x
+            y: Unadjusted y
+
+        Returns:
+            The adjusted position, based on the offset cached on `update_offset`
+        """
+
+        return int(x) + self.offset_x, int(y) + self.offset_y
+
+    def apply_many(self, positions: np.ndarray, parallax: Union[float, np.ndarray, None] = None) -> np.ndarray:
+        """
+        Offsets many positions at once, based on the offset cached on `update_offset`
+
+        Args:
+            positions: Array of unadjusted positions, with a shape of (n, 2)
+            parallax: Parallax weight, either for all positions or an array of n weights. Defaults to None
+
+        Returns:
+            An integer array of adjusted positions, with a shape of (n, 2)
+        """
+
+        positions = np.trunc(positions)
+        offset = np.array((self.offset_x, self.offset_y))
+
+        if parallax is None:
+            return positions.astype(np.int64) + offset
+
+        parallax = np.asarray(parallax, dtype=np.float64)
+        if parallax.ndim == 1:
+            parallax = parallax[:, np.newaxis]
+        return np.trunc(positions + offset * parallax).astype(np.int64)
+
     def hard_apply(self, target_pos: Union[tuple[int, int], list[int], pygame.Vector2, pygame.Rect]):
         target = target_pos
         if isinstance(target_pos, tuple) or isinstance(target_pos, list):
@@ -97,6 +149,7 @@ class Camera:
 
         # Restrict camera movement
         self.camera.x = max(self.camera.x, 0)
+        self.update_offset()
 
     def hard_adjust_to(self, target_pos: pygame.Vector2):
         """
@@ -109,6 +162,7 @@ class Camera:
         x = self.camera_width // 2 - target_pos.x
         y = self.camera_height // 2 - target_pos.y
         self.camera.topleft = (x, y)
+        self.update_offset()
 
     def start_shake(self, num_frames):
         """Starts shaking screen"""
@@ -121,6 +175,7 @@ class Camera:
 
         self.camera.x += random.randint(-self.shake_pixels, self.shake_pixels)
         self.camera.y += random.randint(-self.shake_pixels, self.shake_pixels)
+        self.update_offset()
 
         self.shake_frames -= 1
 
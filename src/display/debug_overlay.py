@@ -0,0 +1,200 @@
+"""
+This file is a part of the source code for rpg-tile-game
+This project has been licensed under the MIT license.
+Copyright (c) 2022-present SSS-Says-Snek
+
+This file defines the DebugOverlay class, used to draw debug info panels above entities
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+from src import pygame, utils
+from src.types import TupColor
+
+PANEL_COLOR = (249, 204, 127)
+BORDER_COLOR = (80, 46, 23)
+
+
+@dataclass
+class DebugField:
+    """
+    A line of a debug panel
+
+    Attributes:
+        label: The static part of the line, e.g "Tile pos: "
+        getter: Gets the value to show after the label from an entity, or None to leave the line empty
+    """
+
+    label: str
+    getter: Callable[[int], Optional[Any]]
+
+
+class DebugPanel:
+    def __init__(self, background: pygame.Surface):
+        """
+        A pooled panel surface, which remembers what is drawn on each of its lines
+
+        Args:
+            background: The empty panel
+        """
+
+        self.surf = background.copy()
+
+        self.lines: list[Optional[str]] = []
+
+
+class DebugOverlay:
+    def __init__(
+        self,
+        width: int = 180,
+        font_size: int = 15,
+        text_color: TupColor = (0, 0, 0),
+        line_height: int = 20,
+        padding: int = 10,
+        alpha: int = 180,
+    ):
+        """
+        Draws debug info panels above entities. Panels are pooled and reused by whatever entity needs one, labels are
+        cached and only values that changed since the panel was last drawn get redrawn
+
+        Systems can show their own info by registering fields with `add_field`
+
+        Args:
+            width: Width of the panels. Defaults to 180
+            font_size: Font size of the lines. Defaults to 15
+            text_color: Color of the lines. Defaults to black
+            line_height: Height of each line. Defaults to 20
+            padding: Padding around the lines. Defaults to 10
+            alpha: Transparency of the panels. Defaults to 180
+        """
+
+        self.width = width
+        self.font_size = font_size
+        self.text_color = text_color
+        self.line_height = line_height
+        self.padding = padding
+        self.alpha = alpha
+
+        self.fields: list[DebugField] = []
+        self.background: Optional[pygame.Surface] = None
+
+        self.panels: dict[int, DebugPanel] = {}
+        self.free_panels: list[DebugPanel] = []
+        self.drawn: set[int] = set()
+
+    def add_field(self, label: str, getter: Callable[[int], Optional[Any]]):
+        """
+        Adds a line to every debug panel
+
+        Args:
+            label: The static part of the line
+            getter: Gets the value shown after the label from an entity. Returning None leaves the line empty
+        """
+
+        self.fields.append(DebugField(label, getter))
+
+        # Panels get taller, so they're all rebuilt
+        self.background = None
+        self.panels.clear()
+        self.free_panels.clear()
+
+    @property
+    def panel_size(self) -> tuple[int, int]:
+        return self.width, len(self.fields) * self.line_height + 2 * self.padding
+
+    def get_background(self) -> pygame.Surface:
+        if self.background is None:
+            # The transparency is baked into the pixels, since blitting with surface alpha on top is a lot slower
+            self.background = pygame.Surface(self.panel_size, pygame.SRCALPHA)
+            pygame.draw.rect(self.background, (*PANEL_COLOR, self.alpha), ((0, 0), self.panel_size), border_radius=5)
+            pygame.draw.rect(
+                self.background, (*BORDER_COLOR, self.alpha), ((0, 0), self.panel_size), width=2, border_radius=5
+            )
+        return self.background
+
+    def get_panel(self, entity: int) -> DebugPanel:
+        panel = self.panels.get(entity)
+        if panel is None:
+            panel = self.free_panels.pop() if self.free_panels else DebugPanel(self.get_background())
+            self.panels[entity] = panel
+        return panel
+
+    def get_panel_rect(self, entity_rect: pygame.Rect) -> pygame.Rect:
+        """
+        Gets where the panel of an entity goes
+
+        Args:
+            entity_rect: The rect of the entity
+
+        Returns:
+            The rect of the panel, in the same coordinates as the entity rect
+        """
+
+        panel_rect = pygame.Rect((0, 0), self.panel_size)
+        panel_rect.bottom = entity_rect.top - 5
+        panel_rect.centerx = entity_rect.centerx
+        return panel_rect
+
+    def update_panel(self, panel: DebugPanel, entity: int):
+        """Redraws the lines of a panel whose value changed"""
+
+        if len(panel.lines) != len(self.fields):
+            panel.lines = [None] * len(self.fields)
+
+        for i, field in enumerate(self.fields):
+            value = field.getter(entity)
+            line = None if value is None else f"{field.label}{value}"
+            if line == panel.lines[i]:
+                continue
+
+            # Clears the line, inside the border
+            y = self.padding + i * self.line_height
+            line_rect = pygame.Rect(2, y, self.width - 4, self.line_height)
+            panel.surf.fill((*PANEL_COLOR, self.alpha), line_rect)
+
+            if value is not None:
+                panel.surf.set_clip(line_rect)
+
+                label_surf = utils.render_text(field.label, self.font_size, self.text_color)
+                panel.surf.blit(label_surf, (self.padding, y))
+                utils.draw_glyphs(
+                    panel.surf,
+                    str(value),
+                    (self.padding + label_surf.get_width(), y),
+                    self.font_size,
+                    self.text_color,
+                )
+
+                # Text blended on top makes the panel more opaque
+                panel.surf.set_clip(None)
+                panel.surf.fill((255, 255, 255, self.alpha), line_rect, special_flags=pygame.BLEND_RGBA_MIN)
+
+            panel.lines[i] = line
+
+    def draw(self, surf: pygame.Surface, entity: int, entity_rect: pygame.Rect) -> pygame.Rect:
+        """
+        Draws the panel of an entity above it
+
+        Args:
+            surf: The surface to draw on
+            entity: The entity
+            entity_rect: The rect of the entity, in the surface's coordinates
+
+        Returns:
+            The region drawn over
+        """
+
+        panel = self.get_panel(entity)
+        self.update_panel(panel, entity)
+        self.drawn.add(entity)
+
+        return surf.blit(panel.surf, self.get_panel_rect(entity_rect))
+
+    def end_frame(self):
+        """Returns the panels of entities that weren't drawn this frame to the pool"""
+
+        for entity in [entity for entity in self.panels if entity not in self.drawn]:
+            self.free_panels.append(self.panels.pop(entity))
+        self.drawn.clear()
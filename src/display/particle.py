@@ -13,9 +13,10 @@ import random
 from math import cos, radians, sin
 from typing import Callable, Optional
 
+import numpy as np
 import pygame.gfxdraw
 
-from src import core, pygame, screen, utils
+from src import common, core, pygame, utils
 from src.display.camera import Camera
 from src.entities.components.component import Position
 from src.types import Color, ImgLoadOptions
@@ -74,10 +75,20 @@ class ParticleManager(set):
             draw_when: When to draw the particle
         """
 
-        for particle in self:
-            if particle.draw_when == draw_when:
-                particle.pre_draw()
-                particle.draw(self.camera)
+        particles = [particle for particle in self if particle.draw_when == draw_when]
+        if not particles:
+            return
+
+        for particle in particles:
+            particle.pre_draw()
+
+        # Every particle is moved by the camera in one go. Static particles have a parallax of 0 (don't move at all)
+        draw_positions = self.camera.apply_many(
+            np.array([(particle.draw_pos.x, particle.draw_pos.y) for particle in particles]),
+            np.array([particle.get_parallax() for particle in particles]),
+        )
+        for particle, draw_pos in zip(particles, draw_positions.tolist()):
+            core.dirty_rects.mark(particle.draw(draw_pos))
 
     def draw_pre_interactables(self):
         self._draw_base("pre_interactables")
@@ -124,12 +135,56 @@ class ParticleManager(set):
             .build()
         )
 
+    def create_effect_particles(
+        self,
+        hue: tuple[float, float],
+        saturation: tuple[float, float],
+        positions: np.ndarray,
+        angle_gauss: tuple[float, float] = (180, 140),
+    ):
+        """
+        Creates many effect particles at once, with their random values drawn in batches
+
+        Args:
+            hue: Mean and standard deviation of the hue
+            saturation: Mean and standard deviation of the saturation
+            positions: A (N, 2) array of positions
+            angle_gauss: Mean and standard deviation of the angle. Defaults to (180, 140)
+        """
+
+        num_particles = len(positions)
+        hues = np.random.normal(*hue, num_particles).tolist()
+        saturations = np.random.normal(*saturation, num_particles).tolist()
+        angles = np.random.normal(*angle_gauss, num_particles).tolist()
+        angular_speeds = np.random.normal(1.4, 0.8, num_particles).tolist()
+
+        for pos, particle_hue, particle_saturation, angle, angular_speed in zip(
+            positions.tolist(), hues, saturations, angles, angular_speeds
+        ):
+            self.add(
+                Particle()
+                .builder()
+                .at(pygame.Vector2(pos), angle)
+                .gravity(gravity_acc=0.35, gravity_y_vel=-5)
+                .hsv(particle_hue, particle_saturation)
+                .lifespan(frames=40)
+                .angular_speed(speed=angular_speed)
+                .effect_fade(start_fade_frac=0.5)
+                .build()
+            )
+
     def create_fire_particle(self, pos: pygame.Vector2, offset: tuple[float, float] = (0, 0)):
         self.create_effect_particle(lambda: (random.gauss(20, 20), random.gauss(1, 0.1)), pos, offset=offset)
 
+    def create_fire_particles(self, positions: np.ndarray):
+        self.create_effect_particles((20, 20), (1, 0.1), positions)
+
     def create_regen_particle(self, pos: pygame.Vector2, offset: tuple[float, float] = (0, 0)):
         self.create_effect_particle(lambda: (random.gauss(120, 20), random.gauss(1, 0.08)), pos, offset=offset)
 
+    def create_regen_particles(self, positions: np.ndarray):
+        self.create_effect_particles((120, 20), (1, 0.08), positions)
+
     def create_text_particle(self, pos: pygame.Vector2, txt: str, color: tuple[int, int, int] = (0, 0, 0)):
         self.add(
             TextParticle()
@@ -309,37 +364,39 @@ class Particle:
     def pre_draw(self):
         self.draw_pos = self.pos.copy()
 
-    def draw(self, camera: Camera):
+    def get_parallax(self) -> float:
+        if self.static:
+            return 0
+        return 1 if self.parallax_val is None else self.parallax_val
+
+    def draw(self, draw_pos: tuple[int, int]) -> pygame.Rect:
+        """
+        Draws the particle
+
+        Args:
+            draw_pos: Position of the particle on the screen (already adjusted by the camera)
+
+        Returns:
+            The region of the screen drawn over
+        """
+
         # For now ONLY SQUARE (ofc I'll add derived particles)
-        particle_rect = pygame.Rect(*self.draw_pos, self.size, self.size)
-        if not self.static:
-            particle_rect = camera.apply(particle_rect)
-
-        pygame.gfxdraw.box(
-            screen,
-            particle_rect,
-            self.color,
-        )
+        rect = pygame.Rect(draw_pos, (self.size, self.size))
+        pygame.gfxdraw.box(common.screen, rect, self.color)
+        return rect
 
 
 class RoundParticle(Particle):
     """A particle that draws round particles instead of square ones"""
 
-    def draw(self, camera: Camera):
-        # For now ONLY SQUARE (ofc I'll add derived particles)
-        particle_rect = pygame.Rect(*self.draw_pos, self.size, self.size)
-        if not self.static:
-            particle_rect = camera.apply(particle_rect)
-
-        pygame.gfxdraw.filled_circle(
-            screen,
-            particle_rect.centerx,
-            particle_rect.centery,
-            self.size,
-            self.color,
-        )
-
+    def draw(self, draw_pos: tuple[int, int]) -> pygame.Rect:
         # TODO: Fix goofy ahh OverflowError when falling too much
+        center_x = draw_pos[0] + int(self.size) // 2
+        center_y = draw_pos[1] + int(self.size) // 2
+        pygame.gfxdraw.filled_circle(common.screen, center_x, center_y, self.size, self.color)
+
+        radius = int(self.size)
+        return pygame.Rect(center_x - radius, center_y - radius, 2 * radius + 1, 2 * radius + 1)
 
 
 class ImageParticle(Particle):
@@ -386,12 +443,8 @@ class ImageParticle(Particle):
     def builder(self):
         return self.Builder(self)
 
-    def draw(self, camera: Camera):
-        if not self.static:
-            # It's technically now a rect, but that doesn't matter
-            self.draw_pos = camera.apply(self.draw_pos, self.parallax_val)
-
-        screen.blit(self.image, self.draw_pos)
+    def draw(self, draw_pos: tuple[int, int]) -> pygame.Rect:
+        return common.screen.blit(self.image, draw_pos)
 
 
 class TextParticle(Particle):
@@ -404,12 +457,8 @@ class TextParticle(Particle):
 
     class Builder(Particle.Builder):
         def text(self, text: str, font_path: Optional[str] = None):
-            if font_path is None:
-                font = utils.load_font(self.particle.size)
-            else:
-                font = utils.load_font(self.particle.size, font_path)
-
-            self.particle.text_surf = font.render(text, True, self.particle.color)
+            # Shared with every other particle showing the same text, which is fine since only its alpha is changed
+            self.particle.text_surf = utils.render_text(text, self.particle.size, self.particle.color, True, font_path)
             return self
 
         def effect_easeout_drift(self, easeout_speed: float):
@@ -422,9 +471,9 @@ class TextParticle(Particle):
     def builder(self):
         return self.Builder(self)
 
-    def draw(self, camera: Camera):
+    def draw(self, draw_pos: tuple[int, int]) -> pygame.Rect:
         self.text_surf.set_alpha(self.color.a)
-        screen.blit(self.text_surf, camera.apply(pygame.Rect(*self.draw_pos, self.size, self.size)))
+        return common.screen.blit(self.text_surf, draw_pos)
 
 
 class WindParticle(Particle):
@@ -0,0 +1,371 @@
+"""
+This file is a part of the source code for rpg-tile-game
+This project has been licensed under the MIT license.
+Copyright (c) 2022-present SSS-Says-Snek
+
+This file defines the PostProcessor class and its passes, used to apply screen effects on the CPU
+"""
+from __future__ import annotations
+
+import time
+from typing import Optional, TypeVar
+
+import numpy as np
+
+from src import core, pygame
+from src.types import TupColor
+
+_P = TypeVar("_P", bound="PostPass")
+
+
+class PostPass:
+    # Whether the pass always gives the same output for the same input pixel. If not, the entire screen changes
+    static = True
+
+    def __init__(self, budget: float):
+        """
+        A base class for all post-processing passes, which edit the screen's pixels in place
+
+        Args:
+            budget: How many milliseconds the pass may take per frame (on average) before it gets suspended
+        """
+
+        self.budget = budget
+        self.enabled = True
+
+        self.size: Optional[tuple[int, int]] = None
+        self.avg_time: Optional[float] = None
+        self.suspended_frames = 0
+
+    def setup(self, size: tuple[int, int], channels: tuple[int, int, int]):
+        """
+        Precomputes whatever depends on the screen. Gets called again whenever the screen size changes
+
+        Args:
+            size: The (height, width) of the screen
+            channels: The byte index of the red, green and blue channels in each pixel
+        """
+
+        pass
+
+    def is_active(self) -> bool:
+        """
+        Returns whether the pass has anything to do this frame
+
+        Returns:
+            Whether the pass should be applied this frame
+        """
+
+        return True
+
+    def apply(self, pixels: np.ndarray, buffer: np.ndarray):
+        """
+        Applies the pass
+
+        Args:
+            pixels: A (height, width, 4) view of the screen's bytes, to be edited in place
+            buffer: A scratch uint16 array the same shape as `pixels`
+        """
+
+        pass
+
+
+class VignettePass(PostPass):
+    def __init__(self, strength: float, inner_radius: float, budget: float):
+        """
+        Darkens the edges of the screen
+
+        Args:
+            strength: How dark the corners get, from 0 to 1
+            inner_radius: Fraction of the screen that's left untouched, from 0 to 1
+            budget: Budget in milliseconds
+        """
+
+        super().__init__(budget)
+
+        self.strength = strength
+        self.inner_radius = inner_radius
+
+        self.mask: Optional[np.ndarray] = None
+        self.regions: list[tuple[slice, slice]] = []
+
+    def setup(self, size: tuple[int, int], channels: tuple[int, int, int]):
+        height, width = size
+        v = np.linspace(-1, 1, height, dtype=np.float32)[:, np.newaxis]
+        u = np.linspace(-1, 1, width, dtype=np.float32)[np.newaxis, :]
+
+        # 0 at the center, 1 at the corners
+        dist = np.sqrt(u**2 + v**2) / np.sqrt(2)
+        edge = np.clip((dist - self.inner_radius) / (1 - self.inner_radius), 0, 1)
+        factor = 1 - self.strength * edge * edge * (3 - 2 * edge)
+
+        # Fixed point, so the pass stays in integers
+        self.mask = np.round(factor * 256).astype(np.uint16)[..., np.newaxis]
+
+        # The square inside the inner radius isn't touched, so only the bands around it get processed
+        x0, x1 = int(width / 2 * (1 - self.inner_radius)), int(width / 2 * (1 + self.inner_radius))
+        y0, y1 = int(height / 2 * (1 - self.inner_radius)), int(height / 2 * (1 + self.inner_radius))
+        self.regions = [
+            (slice(0, y0), slice(None)),
+            (slice(y1, None), slice(None)),
+            (slice(y0, y1), slice(0, x0)),
+            (slice(y0, y1), slice(x1, None)),
+        ]
+
+    def apply(self, pixels: np.ndarray, buffer: np.ndarray):
+        for rows, cols in self.regions:
+            region, region_buffer = pixels[rows, cols], buffer[rows, cols]
+
+            np.multiply(region, self.mask[rows, cols], out=region_buffer)
+            region_buffer >>= 8
+            np.copyto(region, region_buffer, casting="unsafe")
+
+
+class ColorGradePass(PostPass):
+    def __init__(self, lut: np.ndarray, budget: float):
+        """
+        Remaps each color channel through a lookup table
+
+        Args:
+            lut: A (3, 256) uint8 array, the lookup table of the red, green and blue channels
+            budget: Budget in milliseconds
+        """
+
+        super().__init__(budget)
+
+        self.lut = lut
+        self.pair_luts: Optional[tuple[np.ndarray, np.ndarray]] = None
+
+    @classmethod
+    def from_curve(
+        cls, contrast: float, brightness: float, tint: tuple[float, float, float], budget: float
+    ) -> ColorGradePass:
+        """
+        Creates a color grade from a simple curve
+
+        Args:
+            contrast: Contrast multiplier around mid-gray
+            brightness: Value added to every channel
+            tint: Multiplier of each channel
+            budget: Budget in milliseconds
+
+        Returns:
+            The color grade pass
+        """
+
+        values = np.arange(256, dtype=np.float32)
+        curve = (values - 128) * contrast + 128 + brightness
+        lut = np.clip(np.outer(tint, curve), 0, 255).round().astype(np.uint8)
+
+        return cls(lut, budget)
+
+    def setup(self, size: tuple[int, int], channels: tuple[int, int, int]):
+        byte_luts = [np.arange(256, dtype=np.uint8) for _ in range(4)]
+        for channel, byte_idx in enumerate(channels):
+            byte_luts[byte_idx] = self.lut[channel]
+
+        # Looking up two bytes at a time is much faster. Every possible byte pair is mapped through the byte LUTs
+        pairs = np.arange(65536, dtype=np.uint16).view(np.uint8).reshape(-1, 2)
+        low_pairs = np.stack((byte_luts[0][pairs[:, 0]], byte_luts[1][pairs[:, 1]]), axis=1)
+        high_pairs = np.stack((byte_luts[2][pairs[:, 0]], byte_luts[3][pairs[:, 1]]), axis=1)
+
+        self.pair_luts = (low_pairs.view(np.uint16).ravel(), high_pairs.view(np.uint16).ravel())
+
+    def apply(self, pixels: np.ndarray, buffer: np.ndarray):
+        pairs = pixels.view(np.uint16)
+        low_lut, high_lut = self.pair_luts
+
+        np.take(low_lut, pairs[..., 0], out=pairs[..., 0], mode="clip")
+        np.take(high_lut, pairs[..., 1], out=pairs[..., 1], mode="clip")
+
+
+class DamageFlashPass(PostPass):
+    static = False
+
+    def __init__(self, color: TupColor, max_alpha: float, duration: int, budget: float):
+        """
+        Briefly tints the screen when the watched health goes down
+
+        Args:
+            color: Color of the flash
+            max_alpha: Opacity of the flash when it starts, from 0 to 1
+            duration: How long the flash fades out for, in milliseconds
+            budget: Budget in milliseconds
+        """
+
+        super().__init__(budget)
+
+        self.color = color
+        self.max_alpha = max_alpha
+        self.duration = duration
+
+        self.health = None
+        self.last_hp = 0
+        self.time_started = -duration
+        self.alpha = 0
+
+        self.color_bytes: Optional[np.ndarray] = None
+
+    def watch(self, health):
+        """
+        Flashes whenever a health component loses HP
+
+        Args:
+            health: The health component to watch
+        """
+
+        self.health = health
+        self.last_hp = health.hp
+
+    def flash(self):
+        """Starts a flash"""
+
+        self.time_started = core.time.get_raw_ticks()
+
+    def setup(self, size: tuple[int, int], channels: tuple[int, int, int]):
+        self.color_bytes = np.zeros(4, dtype=np.uint16)
+        for channel, byte_idx in enumerate(channels):
+            self.color_bytes[byte_idx] = self.color[channel]
+
+    def is_active(self) -> bool:
+        if self.health is not None:
+            if self.health.hp < self.last_hp:
+                self.flash()
+            self.last_hp = self.health.hp
+
+        time_elapsed = core.time.get_raw_ticks() - self.time_started
+        self.alpha = int(max(1 - time_elapsed / self.duration, 0) * self.max_alpha * 256)
+
+        return self.alpha > 0
+
+    def apply(self, pixels: np.ndarray, buffer: np.ndarray):
+        np.multiply(pixels, 256 - self.alpha, out=buffer, dtype=np.uint16)
+        buffer += self.color_bytes * self.alpha
+        buffer >>= 8
+        np.copyto(pixels, buffer, casting="unsafe")
+
+
+class PostProcessor:
+    def __init__(self, retry_interval: int = 120, smoothing: float = 0.1):
+        """
+        Applies post-processing passes to a surface on the CPU, using NumPy views into the surface's pixels
+
+        Args:
+            retry_interval: How many frames a pass stays suspended after going over its budget
+            smoothing: How quickly the average time of each pass follows its latest time
+        """
+
+        self.retry_interval = retry_interval
+        self.smoothing = smoothing
+
+        self.passes: list[PostPass] = []
+        self.buffer: Optional[np.ndarray] = None
+        self.last_applied: list[PostPass] = []
+
+    def add_pass(self, post_pass: _P) -> _P:
+        """
+        Adds a pass, which is applied after every pass added before it
+
+        Args:
+            post_pass: The pass
+
+        Returns:
+            The same pass
+        """
+
+        self.passes.append(post_pass)
+        return post_pass
+
+    def remove_pass(self, post_pass: PostPass):
+        self.passes.remove(post_pass)
+
+    def get_pass(self, pass_type: type[_P]) -> Optional[_P]:
+        """
+        Gets the first pass of a type
+
+        Args:
+            pass_type: Type of pass
+
+        Returns:
+            The pass, or None if there isn't one
+        """
+
+        for post_pass in self.passes:
+            if isinstance(post_pass, pass_type):
+                return post_pass
+        return None
+
+    @staticmethod
+    def get_channels(surface: pygame.Surface) -> tuple[int, int, int]:
+        """
+        Gets the byte index of the red, green and blue channels in each of the surface's pixels
+
+        Args:
+            surface: A 32 bit surface
+
+        Returns:
+            The byte indices
+        """
+
+        # The byte of each channel, going from least to most significant
+        byte_idxs = [shift // 8 for shift in surface.get_shifts()[:3]]
+        if np.little_endian:
+            return byte_idxs[0], byte_idxs[1], byte_idxs[2]
+        return 3 - byte_idxs[0], 3 - byte_idxs[1], 3 - byte_idxs[2]
+
+    def process(self, surface: pygame.Surface):
+        """
+        Applies every pass that is enabled, active and not suspended to the surface
+
+        Args:
+            surface: The surface to apply to. Only 32 bit surfaces are supported, others are left as is
+        """
+
+        if surface.get_bytesize() != 4:
+            return
+
+        to_apply = []
+        for post_pass in self.passes:
+            if not post_pass.enabled or not post_pass.is_active():
+                continue
+            if post_pass.suspended_frames > 0:
+                post_pass.suspended_frames -= 1
+                continue
+            to_apply.append(post_pass)
+
+        # Passes turning on or off change the entire screen, as do non-static passes
+        if to_apply != self.last_applied or any(not post_pass.static for post_pass in to_apply):
+            core.dirty_rects.mark_all()
+        self.last_applied = to_apply
+
+        if not to_apply:
+            return
+
+        # Transposing the (width, height) pixel array gives a contiguous (height, width) array, which is much faster
+        pixels = pygame.surfarray.pixels2d(surface).T.view(np.uint8).reshape(surface.get_height(), -1, 4)
+        size = pixels.shape[:2]
+
+        if self.buffer is None or self.buffer.shape != pixels.shape:
+            self.buffer = np.empty(pixels.shape, dtype=np.uint16)
+
+        for post_pass in to_apply:
+            if post_pass.size != size:
+                post_pass.setup(size, self.get_channels(surface))
+                post_pass.size = size
+
+            time_started = time.perf_counter()
+            post_pass.apply(pixels, self.buffer)
+            time_elapsed = (time.perf_counter() - time_started) * 1000
+
+            if post_pass.avg_time is None:
+                post_pass.avg_time = time_elapsed
+            else:
+                post_pass.avg_time += (time_elapsed - post_pass.avg_time) * self.smoothing
+
+            if post_pass.avg_time > post_pass.budget:
+                # Measured again from scratch once it's retried
+                post_pass.suspended_frames = self.retry_interval
+                post_pass.avg_time = None
+
+        # Unlocks the surface
+        del pixels
@@ -7,11 +7,15 @@ Copyright (c) 2022-present SSS-Says-Snek
 from __future__ import annotations
 
 import struct
+from typing import TYPE_CHECKING
 
-import moderngl
 import pygame
 
-from src.common import RES, SHADER_DIR, screen
+from src import common
+from src.common import SHADER_DIR
+
+if TYPE_CHECKING:
+    import moderngl
 
 
 class ShaderManager:
@@ -21,6 +25,9 @@ class ShaderManager:
         This also handles pygame screen rendering
         """
 
+        # ModernGL is only needed (and imported) once shaders are used
+        import moderngl
+
         self.ctx = moderngl.create_context()
         self.program = self.ctx.program(
             vertex_shader=self.load_shader("vertex"), fragment_shader=self.load_shader("fragment")
@@ -33,7 +40,7 @@ class ShaderManager:
         # Describes triangles to render
         render_indices = [0, 1, 2, 1, 2, 3]
 
-        self.screen_texture = self.ctx.texture(RES, 4)
+        self.screen_texture = self.ctx.texture(common.RES, 4)
         self.screen_texture.repeat_x = False
         self.screen_texture.repeat_y = False
         self.screen_texture.swizzle = "BGRA"
@@ -77,7 +84,7 @@ class ShaderManager:
     def render(self):
         """Renders the pygame "screen" onto the actual window"""
 
-        texture_data = screen.get_view("1")
+        texture_data = common.screen.get_view("1")
         self.screen_texture.write(texture_data)
         self.ctx.clear(14 / 255, 40 / 255, 66 / 255)
         self.screen_texture.use()
@@ -10,7 +10,7 @@ from __future__ import annotations
 
 from typing import Callable, Optional
 
-from src import core, pygame, screen
+from src import common, core, pygame
 from src.types import VoidFunc
 
 
@@ -127,7 +127,7 @@ class DarkenTransition:
         ease_function: Callable[[float], float] = EaseTransition.ease_linear,
         finish_darken_callback: Optional[VoidFunc] = None,
         finish_lighten_callback: Optional[VoidFunc] = None,
-        screen: pygame.Surface = screen,
+        screen: Optional[pygame.Surface] = None,
     ):
         """
         Provides an easy way to darken a desired surface with linear interpolation
@@ -136,12 +136,12 @@ class DarkenTransition:
             mode: Mode to fade
             duration: How long, in milliseconds, the transition should last
             darken_threshold: At what level it should stop getting darker
-            screen: What surface to fade. Defaults to `screen`
+            screen: What surface to fade. Defaults to `common.screen`
         """
 
         self.mode = mode
         self.duration = duration
-        self.screen = screen
+        self.screen = screen if screen is not None else common.screen
 
         self.alpha = 255 if mode == self.LIGHTEN else 0
         self.fade_out = darken_threshold * 255
@@ -152,7 +152,7 @@ class DarkenTransition:
         self.finish_out_callback = finish_darken_callback
         self.finish_in_callback = finish_lighten_callback
 
-        self.darken = pygame.Surface(screen.get_size())
+        self.darken = pygame.Surface(self.screen.get_size())
         self.darken.set_alpha(self.alpha)
 
     def start(self):
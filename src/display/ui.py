@@ -5,37 +5,57 @@ Copyright (c) 2022-present SSS-Says-Snek
 
 This file defines the UI class, used to handle... the game UI
 """
+
 from __future__ import annotations
 
+import heapq
+import itertools
 from dataclasses import dataclass
-from typing import Iterable, Optional
+from typing import Iterable, Iterator, Optional
 
 import esper
 
+from src import core, pygame
 from src.display.camera import Camera
 from src.display.particle import ParticleManager
 from src.display.widgets.widget import Widget
 
+_Cell = tuple[int, int]
+
 
-@dataclass
+@dataclass(eq=False)
 class WidgetInfo:
     widget: Widget
     visible: bool
     manual_draw: bool
 
+    removed: bool = False
+    cell: Optional[_Cell] = None  # Grid cell of widgets drawn relative to the camera
+
     def __iter__(self) -> Iterable:
         yield self.widget
         yield self.visible
         yield self.manual_draw
 
 
+def draw_order(widget_info: WidgetInfo) -> tuple[int, int]:
+    return widget_info.widget.z_index, widget_info.widget.uuid
+
+
 class UI:
-    def __init__(self, camera: Optional[Camera] = None):
+    def __init__(self, camera: Optional[Camera] = None, cell_size: int = 256, rebucket_interval: int = 30):
         """
         A user interface manager for the entire game
 
+        Widgets drawn relative to the camera (e.g mob health bars) are bucketed in a grid, and only the ones near the
+        viewport get drawn. Widgets close to the viewport are rebucketed whenever they get looked at, and every other
+        one is rebucketed once every `rebucket_interval` frames. Anything moving less than a cell in that time is
+        never missed
+
         Args:
             camera: The game camera
+            cell_size: Size of each grid cell in pixels. Defaults to 256
+            rebucket_interval: How many frames it takes to rebucket every widget. Defaults to 30
         """
 
         self.current_uuid = 0
@@ -47,27 +67,152 @@ class UI:
         self.widgets: dict[int, WidgetInfo] = {}
         self.hud_widgets: dict[str, int] = {}
 
+        # Widgets drawn on the screen, kept sorted in draw order
+        self.screen_widgets: list[WidgetInfo] = []
+
+        self.cell_size = cell_size
+        self.rebucket_interval = rebucket_interval
+        self.camera_widgets: list[WidgetInfo] = []
+        self.grid: dict[_Cell, set[WidgetInfo]] = {}
+        self.rebucket_idx = 0
+
+        # Adding and removing is deferred to the start of the next draw or update, so widgets can add or remove
+        # widgets (including themselves) while being iterated over
+        self.pending_adds: list[WidgetInfo] = []
+        self.pending_removes: list[WidgetInfo] = []
+
+    def get_cell(self, rect: pygame.Rect) -> _Cell:
+        return rect.centerx // self.cell_size, rect.centery // self.cell_size
+
+    def rebucket(self, widget_info: WidgetInfo, rect: pygame.Rect):
+        """
+        Moves a widget drawn relative to the camera to the grid cell it's in now
+
+        Args:
+            widget_info: The widget info
+            rect: The widget's world rect
+        """
+
+        cell = self.get_cell(rect)
+        if cell == widget_info.cell:
+            return
+
+        self.unbucket(widget_info)
+        self.grid.setdefault(cell, set()).add(widget_info)
+        widget_info.cell = cell
+
+    def unbucket(self, widget_info: WidgetInfo):
+        if widget_info.cell is None:
+            return
+
+        cell_widgets = self.grid[widget_info.cell]
+        cell_widgets.discard(widget_info)
+        if not cell_widgets:
+            del self.grid[widget_info.cell]
+        widget_info.cell = None
+
+    def flush(self):
+        """Applies the widgets added and removed since the last flush"""
+
+        if self.pending_adds:
+            for widget_info in self.pending_adds:
+                if widget_info.removed:
+                    continue
+
+                world_rect = widget_info.widget.world_rect()
+                if world_rect is None:
+                    self.screen_widgets.append(widget_info)
+                else:
+                    self.camera_widgets.append(widget_info)
+                    self.rebucket(widget_info, world_rect)
+
+            self.pending_adds.clear()
+            self.screen_widgets.sort(key=draw_order)
+
+        if self.pending_removes:
+            for widget_info in self.pending_removes:
+                self.unbucket(widget_info)
+
+            self.pending_removes.clear()
+            self.screen_widgets = [widget_info for widget_info in self.screen_widgets if not widget_info.removed]
+            self.camera_widgets = [widget_info for widget_info in self.camera_widgets if not widget_info.removed]
+
+    def rebucket_some(self):
+        """Rebuckets the next share of widgets drawn relative to the camera"""
+
+        if not self.camera_widgets:
+            return
+
+        count = -(-len(self.camera_widgets) // self.rebucket_interval)
+        for _ in range(count):
+            self.rebucket_idx %= len(self.camera_widgets)
+            widget_info = self.camera_widgets[self.rebucket_idx]
+            self.rebucket(widget_info, widget_info.widget.world_rect())
+            self.rebucket_idx += 1
+
+    def get_visible_camera_widgets(self) -> list[WidgetInfo]:
+        """
+        Gets the widgets drawn relative to the camera which are in the viewport, in draw order
+
+        Returns:
+            The visible widgets
+        """
+
+        if self.camera is None:
+            return sorted(self.camera_widgets, key=draw_order)
+
+        self.rebucket_some()
+
+        # Widgets are bucketed by their center, so the cells around the viewport are looked at too
+        viewport = self.camera.camera
+        left, top = self.get_cell(pygame.Rect(viewport.topleft, (0, 0)))
+        right, bottom = self.get_cell(pygame.Rect(viewport.bottomright, (0, 0)))
+
+        candidates = []
+        for cell in itertools.product(range(left - 1, right + 2), range(top - 1, bottom + 2)):
+            candidates.extend(self.grid.get(cell, ()))
+
+        visible_widgets = []
+        for widget_info in candidates:
+            world_rect = widget_info.widget.world_rect()
+            self.rebucket(widget_info, world_rect)
+            if self.camera.visible(world_rect):
+                visible_widgets.append(widget_info)
+
+        visible_widgets.sort(key=draw_order)
+        return visible_widgets
+
+    def iter_draw_order(self) -> Iterator[WidgetInfo]:
+        """Iterates over the widgets to draw this frame, from bottom to top"""
+
+        return heapq.merge(self.screen_widgets, self.get_visible_camera_widgets(), key=draw_order)
+
     def draw(self):
         """Draws all widgets"""
 
-        for widget, visible, manual_draw in self.widgets.copy().values():
-            if not visible or manual_draw:
+        self.flush()
+
+        for widget_info in self.iter_draw_order():
+            if not widget_info.visible or widget_info.manual_draw or widget_info.removed:
                 continue
 
-            widget.draw(self.camera)
+            widget_info.widget.draw(self.camera)
+            core.dirty_rects.mark(widget_info.widget.dirty_rect(self.camera))
 
     def update(self):
-        """Updates all widgets in the user interface"""
+        """Updates all widgets in the user interface, including the ones not drawn this frame"""
+
+        self.flush()
 
-        for widget, visible, manual_draw in self.widgets.values():
-            if not visible or manual_draw:
+        for widget_info in itertools.chain(self.screen_widgets, self.camera_widgets):
+            if not widget_info.visible or widget_info.manual_draw or widget_info.removed:
                 continue
 
-            widget.update()
+            widget_info.widget.update()
 
     def add_widget(self, widget: Widget, visible: bool = True, manual_draw: bool = False) -> int:
         """
-        Adds a widget to the UI
+        Adds a widget to the UI. It starts getting drawn and updated from the next draw or update
 
         Args:
             widget: The widget to add
@@ -79,7 +224,9 @@ class UI:
         """
 
         widget.uuid = self.current_uuid
-        self.widgets[self.current_uuid] = WidgetInfo(widget, visible, manual_draw)
+        widget_info = WidgetInfo(widget, visible, manual_draw)
+        self.widgets[self.current_uuid] = widget_info
+        self.pending_adds.append(widget_info)
 
         self.current_uuid += 1
         return widget.uuid
@@ -100,13 +247,15 @@ class UI:
 
     def remove_widget(self, uuid: int):
         """
-        Remove a widget given ID
+        Remove a widget given ID. It stops getting drawn and updated right away
 
         Args:
             uuid: ID of widget
         """
 
-        del self.widgets[uuid]
+        widget_info = self.widgets.pop(uuid)
+        widget_info.removed = True
+        self.pending_removes.append(widget_info)
 
     def toggle_visible(self, uuid: int):
         """
@@ -132,3 +281,4 @@ class UI:
         if widget.visible:
             widget.widget.update()
             widget.widget.draw(self.camera)
+            core.dirty_rects.mark(widget.widget.dirty_rect(self.camera))
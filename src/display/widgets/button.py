@@ -10,7 +10,7 @@ from __future__ import annotations
 
 from typing import Optional
 
-from src import core, pygame, screen, utils
+from src import common, core, pygame, utils
 from src.display.transition import EaseTransition
 from src.display.ui import UI
 from src.display.widgets.widget import Widget
@@ -36,7 +36,7 @@ class DefaultButton(Widget):
         fade_duration: int = 500,
         click_callback: Optional[VoidFunc] = None,
         fade_callback: Optional[VoidFunc] = None,
-        screen: pygame.Surface = screen,
+        screen: Optional[pygame.Surface] = None,
     ):
         super().__init__()
 
@@ -72,7 +72,7 @@ class DefaultButton(Widget):
             self.text_surf = None
             self.text_surf_center = None
 
-        self.screen = screen
+        self.screen = screen if screen is not None else common.ui_screen
 
     def _fade_callback(self):
         self.border_clicked = False
@@ -102,7 +102,7 @@ class DefaultButton(Widget):
             self._draw_border_effect()
 
         # Border
-        if self.hover_color is not None and self.rect.collidepoint(pygame.mouse.get_pos()):
+        if self.hover_color is not None and self.rect.collidepoint(utils.window_to_ui(pygame.mouse.get_pos())):
             bg_color = self.hover_color
         else:
             bg_color = self.color
@@ -120,9 +120,17 @@ class DefaultButton(Widget):
         if self.text_surf is not None:
             self.screen.blit(self.text_surf, self.text_surf_center)
 
+    def dirty_rect(self, _) -> pygame.Rect:
+        # Border effect expands past the button
+        return self.rect.inflate(self.border_expand.end, self.border_expand.end)
+
     def update(self):
         for event in core.event.get():
-            if event.type == pygame.MOUSEBUTTONDOWN and self.rect.collidepoint(event.pos) and not self.border_clicked:
+            if (
+                event.type == pygame.MOUSEBUTTONDOWN
+                and self.rect.collidepoint(utils.window_to_ui(event.pos))
+                and not self.border_clicked
+            ):
                 self.border_clicked = True
                 self.border_fade.start()
                 self.border_expand.start()
@@ -5,20 +5,21 @@ Copyright (c) 2022-present SSS-Says-Snek
 
 This file contains widgets for all health bars
 """
+
 from __future__ import annotations
 
 import colorsys
 import math
 from typing import Any, Union
 
-from src import pygame, screen, utils
+from src import common, pygame, utils
 from src.common import IMG_DIR
 from src.display.camera import Camera
 from src.display.ui import UI
 from src.display.widgets.widget import Widget
 from src.entities.components import item_component
 from src.entities.components.component import Health, Position
-from src.types import Pos, TupColor
+from src.types import Pos
 
 
 class HealthBar(Widget):
@@ -37,7 +38,7 @@ class HealthBar(Widget):
         self.uuid = None
         self.ui = ui
         self.entity = entity
-        self.screen = screen
+        self.screen = common.ui_screen
 
         self.pos = pos
         self.width = width
@@ -80,13 +81,33 @@ class HealthBar(Widget):
                 self.rect.topleft[1] - border_width,
             )
 
-    def draw_border(self, _):
-        pygame.draw.rect(self.screen, (0, 0, 0), self.border_rect, width=self.border_width)
+        self.hp_color = (0, 0, 0)
+        self.health_version = None
+
+        # The bar is drawn onto its own surface, which is only redrawn when the hp or flash changes
+        self.cache = None
+        self.cache_key = None
+        self.redrawn = False
+
+    @property
+    def animating(self) -> bool:
+        return self.flash_size > 0
+
+    def get_bounds(self) -> pygame.Rect:
+        """Gets the region the bar takes up, in the same coordinates as its rects"""
+
+        return self.border_rect
+
+    def get_draw_pos(self, camera: Camera) -> Pos:
+        return self.get_bounds().topleft
+
+    def draw_border(self, surf: pygame.Surface, offset: Pos):
+        pygame.draw.rect(surf, (0, 0, 0), self.border_rect.move(offset), width=self.border_width)
 
-    def draw_body(self, _, hp_color):
-        pygame.draw.rect(self.screen, hp_color, self.rect)
+    def draw_body(self, surf: pygame.Surface, offset: Pos):
+        pygame.draw.rect(surf, self.hp_color, self.rect.move(offset))
 
-    def draw_flash(self, _):
+    def draw_flash(self, surf: pygame.Surface, offset: Pos):
         if self.flash_width > 0:
             flash_rect = pygame.Rect(
                 self.rect.x + self.rect.width,
@@ -98,18 +119,17 @@ class HealthBar(Widget):
             if self.flash_hp_diff == -1:
                 flash_rect.right = self.rect.right
 
-            pygame.draw.rect(self.screen, (255, 255, 255), flash_rect)
-        else:
-            self.flash_hp_diff = 0
+            pygame.draw.rect(surf, (255, 255, 255), flash_rect.move(offset))
+
+    def update_health(self):
+        """Resizes and recolors the bar, as well as starting a flash, after the hp changes"""
 
-    def draw(self, camera: Camera):
-        self.flash_duration -= 1
         self.rect.width = self.health_component.hp / self.health_component.max_hp * self.width
 
         hp_percentage = self.rect.width / self.width
         hsv = (hp_percentage / 3, 1, 1)
         rgb = colorsys.hsv_to_rgb(*hsv)
-        hp_color = [max(int(color_value * 255), 0) for color_value in rgb]
+        self.hp_color = tuple(max(int(color_value * 255), 0) for color_value in rgb)
 
         hp_lost = self.previous_health - self.health_component.hp
         self.flash_size += abs(hp_lost)
@@ -126,6 +146,29 @@ class HealthBar(Widget):
                 entity_pos = self.ui.world.component_for_entity(self.entity, Position)
                 self.ui.particle_manager.create_text_particle(entity_pos.pos, hurt_txt)
 
+        self.previous_health = self.health_component.hp
+
+    def render(self):
+        """Redraws the cached surface of the bar"""
+
+        bounds = self.get_bounds()
+        if self.cache is None or self.cache.get_size() != bounds.size:
+            self.cache = pygame.Surface(bounds.size, pygame.SRCALPHA)
+        else:
+            self.cache.fill((0, 0, 0, 0))
+
+        offset = (-bounds.x, -bounds.y)
+        self.draw_body(self.cache, offset)
+        self.draw_border(self.cache, offset)
+        self.draw_flash(self.cache, offset)
+
+    def draw(self, camera: Camera):
+        self.flash_duration -= 1
+
+        if self.health_component.version != self.health_version:
+            self.health_version = self.health_component.version
+            self.update_health()
+
         if self.flash_duration <= 0:
             if self.health_component.hp > 0:
                 self.flash_size -= 1
@@ -136,18 +179,32 @@ class HealthBar(Widget):
                 self.flash_size *= 0.985
                 self.flash_size = max(0.0, self.flash_size)
 
-        self.draw_body(camera, hp_color)
-        self.draw_border(camera)
-
         self.flash_width = self.flash_size * self.width / self.health_component.max_hp
+        if self.flash_width <= 0:
+            self.flash_hp_diff = 0
 
-        self.draw_flash(camera)
+        cache_key = (self.rect.width, int(self.flash_width), self.flash_hp_diff)
+        self.redrawn = cache_key != self.cache_key
+        if self.redrawn:
+            self.render()
+            self.cache_key = cache_key
 
-        self.previous_health = self.health_component.hp
+        self.screen.blit(self.cache, self.get_draw_pos(camera))
+
+    def dirty_rect(self, camera: Camera) -> pygame.Rect:
+        # Unchanged pixels don't need updating
+        if not self.redrawn:
+            return pygame.Rect(0, 0, 0, 0)
+        return self.get_bounds()
 
 
 class PlayerHealthBar(HealthBar):
-    HEALTHBAR_BORDER = utils.load_img(IMG_DIR / "ui" / "player_healthbar.png")
+    # Loaded by `load_assets`
+    HEALTHBAR_BORDER: pygame.Surface
+
+    @classmethod
+    def load_assets(cls):
+        cls.HEALTHBAR_BORDER = utils.load_img(IMG_DIR / "ui" / "player_healthbar.png")
 
     def __init__(
         self,
@@ -171,11 +228,17 @@ class PlayerHealthBar(HealthBar):
             center=center,
         )
 
-    def draw_border(self, _):
-        self.screen.blit(self.HEALTHBAR_BORDER, self.border_rect.topleft)
+    def get_bounds(self) -> pygame.Rect:
+        return self.border_rect.union(self.HEALTHBAR_BORDER.get_rect(topleft=self.border_rect.topleft))
+
+    def draw_border(self, surf: pygame.Surface, offset: Pos):
+        surf.blit(self.HEALTHBAR_BORDER, self.border_rect.move(offset))
 
 
 class MobHealthBar(HealthBar):
+    # Under the HUD
+    z_index = -1
+
     def __init__(
         self,
         ui: UI,
@@ -198,33 +261,17 @@ class MobHealthBar(HealthBar):
 
         self.y_offset = 20
 
-    def draw_border(self, camera: Camera):
-        pygame.draw.rect(self.screen, (0, 0, 0), camera.apply(self.border_rect), width=self.border_width)
+        # Drawn in the world, not on the UI
+        self.screen = common.screen
 
-    def draw_body(self, camera: Camera, hp_color: TupColor):
-        pygame.draw.rect(self.screen, hp_color, camera.apply(self.rect))
-
-    def draw_flash(self, camera: Camera):
-        if self.flash_width > 0:
-            flash_rect = pygame.Rect(
-                self.rect.x + self.rect.width,
-                self.rect.y,
-                self.flash_width,
-                self.height,
-            )
+    def get_draw_pos(self, camera: Camera) -> Pos:
+        return camera.apply_xy(*self.get_bounds().topleft)
 
-            if self.flash_hp_diff == -1:
-                flash_rect.right = self.rect.right
-
-            pygame.draw.rect(self.screen, (255, 255, 255), camera.apply(flash_rect))
-        else:
-            self.flash_hp_diff = 0
-
-    def draw(self, camera: Camera):
-        if self.health_component.hp == self.health_component.max_hp:
-            # No health bar if max hp
-            return
+    def dirty_rect(self, camera: Camera) -> pygame.Rect:
+        # Follows the mob around, so it always needs updating
+        return camera.apply(self.get_bounds())
 
+    def update_position(self):
         entity_rect = self.pos.rect
         self.border_rect.center = (
             entity_rect.centerx - self.border_width,
@@ -235,14 +282,26 @@ class MobHealthBar(HealthBar):
             self.border_rect.y + self.border_width,
         )
 
+    def world_rect(self) -> pygame.Rect:
+        self.update_position()
+        return self.border_rect
+
+    def draw(self, camera: Camera):
+        if self.health_component.hp == self.health_component.max_hp:
+            # No health bar if max hp
+            return
+
+        self.update_position()
         super().draw(camera)
 
+    def update(self):
+        # Done here rather than when drawing, since mobs off-screen don't get their health bar drawn
         if self.health_component.hp <= 0:  # and self.flash_size <= 0:
             self.ui.remove_widget(self.uuid)
+            self.ui.level.effect_manager.remove_effect(self.entity)
 
             # Delete entity FOR NOW. In the future, DeathSystem would and should handle item drops
             self.ui.world.delete_entity(self.entity)
-            return
 
 
 class ItemDurabilityBar(PlayerHealthBar):
@@ -266,6 +325,7 @@ class ItemDurabilityBar(PlayerHealthBar):
             border_width=border_width,
             center=center,
         )
+        self.get_bounds = super(PlayerHealthBar, self).get_bounds
         self.draw_border = super(PlayerHealthBar, self).draw_border
 
     def draw(self, camera: Camera):
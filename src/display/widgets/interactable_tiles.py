@@ -15,8 +15,8 @@ from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     from src.entities.components.tile_component import Tile
 
-from src import core, pygame, screen, utils
-from src.common import IMG_DIR, TILE_HEIGHT, TILE_WIDTH, WIDTH
+from src import common, core, pygame, utils
+from src.common import IMG_DIR, TILE_HEIGHT, TILE_WIDTH
 from src.display.camera import Camera
 from src.display.transition import EaseTransition
 from src.display.widgets.widget import Widget
@@ -46,8 +46,14 @@ class SignState(Flag):
 
 
 class TileHover(Widget):
-    FONT = utils.load_font(32)
-    SURF = create_tile_hover_surf(FONT)
+    # Shared by every tile hover. Loaded by `load_assets`
+    FONT: pygame.font.Font
+    SURF: pygame.Surface
+
+    @classmethod
+    def load_assets(cls):
+        cls.FONT = utils.load_font(32)
+        cls.SURF = create_tile_hover_surf(cls.FONT)
 
     def __init__(self, tile: "Tile", outline: pygame.Surface):
         super().__init__()
@@ -63,12 +69,22 @@ class TileHover(Widget):
         rect_copy = self.rect.copy()
         rect_copy.y += round(math.sin(core.time.get_ticks() / 150) * 5)
 
-        screen.blit(self.SURF, camera.apply(rect_copy))
-        screen.blit(self.outline, camera.apply((self.x - 1, self.y - 1)))
+        common.screen.blit(self.SURF, camera.apply(rect_copy))
+        common.screen.blit(self.outline, camera.apply((self.x - 1, self.y - 1)))
+
+    def dirty_rect(self, camera: Camera) -> pygame.Rect:
+        # Covers the whole bob
+        surf_rect = self.SURF.get_rect(topleft=camera.apply(self.rect).topleft).inflate(0, 10)
+        return surf_rect.union(self.outline.get_rect(topleft=camera.apply((self.x - 1, self.y - 1)).topleft))
 
 
 class SignDialogue(Widget):
-    DIALOGUE_BACKGROUND = utils.load_img(IMG_DIR / "ui" / "dialogue_background.png").convert_alpha()
+    # Loaded by `load_assets`
+    DIALOGUE_BACKGROUND: pygame.Surface
+
+    @classmethod
+    def load_assets(cls):
+        cls.DIALOGUE_BACKGROUND = utils.load_img(IMG_DIR / "ui" / "dialogue_background.png").convert_alpha()
 
     def __init__(self, text: str):
         super().__init__()
@@ -76,9 +92,10 @@ class SignDialogue(Widget):
         self.width, self.height = self.DIALOGUE_BACKGROUND.get_size()
         self.x_offset = 80
 
-        self.font = utils.load_font(16, "Minecraftia")
+        self.font_size, self.font_name = 16, "Minecraftia"
+        self.font = utils.load_font(self.font_size, self.font_name)
         self.rect = pygame.Rect(0, 0, self.width, self.height)
-        self.rect.center = (WIDTH // 2, 680)
+        self.rect.center = (common.UI_WIDTH // 2, common.UI_HEIGHT - 120)
 
         self.state = SignState.INACTIVE
         self.text_idxs = {"total": 0, "line": 0, "char": 0}
@@ -89,8 +106,8 @@ class SignDialogue(Widget):
         self.wrapped_text = self.wrap_text(self.text)
 
         # Easing transitions
-        self.transition_up = EaseTransition(800, self.rect.y, 1000, EaseTransition.ease_out_exp)
-        self.transition_down = EaseTransition(self.rect.y, 800, 1000, EaseTransition.ease_out_exp)
+        self.transition_up = EaseTransition(common.UI_HEIGHT, self.rect.y, 1000, EaseTransition.ease_out_exp)
+        self.transition_down = EaseTransition(self.rect.y, common.UI_HEIGHT, 1000, EaseTransition.ease_out_exp)
 
     def wrap_text(self, text: str):
         wrapped_text = []
@@ -119,14 +136,14 @@ class SignDialogue(Widget):
         line_surf = None
 
         for i, wrapped_line in enumerate(wrapped_text):
-            line_surf = self.font.render(wrapped_line, False, (78, 53, 36))
+            line_surf = utils.render_text(wrapped_line, self.font_size, (78, 53, 36), False, self.font_name)
             x, y = self.rect.x + self.x_offset, self.rect.y + 35 + i * self.font.get_height() * 1.3
-            screen.blit(line_surf, (x, y))
+            common.ui_screen.blit(line_surf, (x, y))
 
         if line_surf is not None and self.show_cursor:
             # Utilizes last line to get cursor pos
             pygame.draw.rect(
-                screen,
+                common.ui_screen,
                 (78, 53, 36),
                 (x + line_surf.get_width(), y, 2, line_surf.get_height() * 4 / 5),
             )
@@ -186,7 +203,7 @@ class SignDialogue(Widget):
                 self.text_idxs = {"total": 0, "line": 0, "char": 0}
 
             # Draw body of dialogue
-            screen.blit(self.DIALOGUE_BACKGROUND, draw_rect)
+            common.ui_screen.blit(self.DIALOGUE_BACKGROUND, draw_rect)
 
             # Handle the typing
             wrap_text_copy = self.wrapped_text
@@ -194,3 +211,8 @@ class SignDialogue(Widget):
             wrap_text_copy[-1] = wrap_text_copy[-1][: self.text_idxs["char"] + 1]
 
             self.blit_wrapped_text(wrap_text_copy)
+
+    def dirty_rect(self, _) -> pygame.Rect:
+        if self.state == SignState.INACTIVE:
+            return pygame.Rect(0, 0, 0, 0)
+        return self.rect
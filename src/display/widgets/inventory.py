@@ -8,9 +8,11 @@ This file contains widgets for the inventory
 
 from __future__ import annotations
 
+from typing import Optional
+
 import pygame.gfxdraw
 
-from src import core, pygame, screen
+from src import common, pygame, utils
 from src.common import TILE_WIDTH
 from src.display.camera import Camera
 from src.display.ui import UI
@@ -45,6 +47,10 @@ class Hotbar(Widget):
         self.frame = self.original_frame
         self.frame_rect = self.frame.get_rect(center=self.center_pos)
 
+        # The frame is only rebuilt when something shown on it changes
+        self.frame_key = None
+        self.redrawn = False
+
         # Populate hotbar rects and durability bars
         self.hotbar_rects = []
         self.hotbar_durability_bars = []
@@ -77,7 +83,28 @@ class Hotbar(Widget):
     def idx_to_pixelx(self, idx: int):
         return idx * self.frame_size[0] + idx * self.spacing
 
-    def draw(self, camera: Camera):
+    def get_hovered_idx(self) -> Optional[int]:
+        mouse_pos = utils.window_to_ui(pygame.mouse.get_pos())
+        adjusted_mouse_pos = (
+            mouse_pos[0] - self.frame_rect.x,
+            mouse_pos[1] - self.frame_rect.y,
+        )
+
+        for idx, hotbar_rect in enumerate(self.hotbar_rects):
+            if hotbar_rect.collidepoint(adjusted_mouse_pos):
+                return idx
+        return None
+
+    def get_frame_key(self, hovered_idx: Optional[int]) -> tuple:
+        """Gets everything shown on the frame, so it only gets rebuilt when one of them changes"""
+
+        durability_keys = tuple(
+            None if durability_bar is None else (durability_bar.health_component.version, durability_bar.animating)
+            for durability_bar in self.hotbar_durability_bars
+        )
+        return self.inventory_component.version, hovered_idx, self.inventory_component.cooldown.ready, durability_keys
+
+    def build_frame(self, camera: Camera, hovered_idx: Optional[int]):
         frame = self.original_frame.copy()
 
         # Draw icons and durability
@@ -128,35 +155,20 @@ class Hotbar(Widget):
             width=4,
         )
 
-        mouse_pos = pygame.mouse.get_pos()
-        adjusted_mouse_pos = (
-            mouse_pos[0] - self.frame_rect.x,
-            mouse_pos[1] - self.frame_rect.y,
-        )
-
         # Blit gray rect for hovering
-        for idx, hotbar_rect in enumerate(self.hotbar_rects):
-            if hotbar_rect.collidepoint(adjusted_mouse_pos) and idx != equipped_item_idx:
-                pygame.draw.rect(
-                    frame,
-                    (128, 128, 128),
-                    pygame.Rect(self.idx_to_pixelx(idx), 0, *self.frame_size),
-                    width=4,
-                )
-                break
+        if hovered_idx is not None and hovered_idx != equipped_item_idx:
+            pygame.draw.rect(
+                frame,
+                (128, 128, 128),
+                pygame.Rect(self.idx_to_pixelx(hovered_idx), 0, *self.frame_size),
+                width=4,
+            )
 
         # Cooldown indicator
-        if self.inventory_component.on_cooldown:
+        if not self.inventory_component.cooldown.ready:
             for idx, hotbar_rect in enumerate(self.hotbar_rects):
-                if self.inventory_component.cooldown != 0:
-                    # Witchcraftery
-                    rect_height = (
-                        1
-                        - (core.time.get_ticks() - self.inventory_component.last_used)
-                        / (self.inventory_component.cooldown * 1000)
-                    ) * self.frame_size[1]
-                else:
-                    rect_height = 0
+                # Witchcraftery
+                rect_height = (1 - self.inventory_component.cooldown.progress) * self.frame_size[1]
 
                 # Rect of the hotbar cooldown
                 rect = pygame.Rect(self.idx_to_pixelx(idx), 0, self.frame_size[0], rect_height)
@@ -165,5 +177,23 @@ class Hotbar(Widget):
                 # gfxdraw accepts alpha
                 pygame.gfxdraw.box(frame, rect, (0, 0, 0, 90 + 1.5 * rect_height))
 
+        self.frame = frame
+
+    def draw(self, camera: Camera):
+        hovered_idx = self.get_hovered_idx()
+        frame_key = self.get_frame_key(hovered_idx)
+
+        # The cooldown indicator changes every frame
+        self.redrawn = frame_key != self.frame_key or not self.inventory_component.cooldown.ready
+        if self.redrawn:
+            self.build_frame(camera, hovered_idx)
+            self.frame_key = frame_key
+
         # Blit frame to appropriate position
-        screen.blit(frame, self.frame_rect)
+        common.ui_screen.blit(self.frame, self.frame_rect)
+
+    def dirty_rect(self, camera: Camera) -> pygame.Rect:
+        # Unchanged pixels don't need updating
+        if not self.redrawn:
+            return pygame.Rect(0, 0, 0, 0)
+        return self.frame_rect
@@ -11,10 +11,14 @@ from __future__ import annotations
 
 from typing import Optional
 
+from src import pygame
 from src.display.camera import Camera
 
 
 class Widget:
+    # Widgets are drawn from the lowest to the highest z index, then in the order they were added
+    z_index = 0
+
     def __init__(self):
         """A base class for all game widgets"""
 
@@ -34,3 +38,26 @@ class Widget:
         """Updates the widget"""
 
         pass
+
+    def world_rect(self) -> Optional[pygame.Rect]:
+        """
+        Gets the region of the world a widget drawn relative to the camera takes up, so it can be culled
+
+        Returns:
+            The region in world coordinates, or None if the widget is drawn on the screen and never culled
+        """
+
+        return None
+
+    def dirty_rect(self, camera: Optional[Camera]) -> Optional[pygame.Rect]:
+        """
+        Gets the region of the screen the widget draws over, for dirty rect rendering
+
+        Args:
+            camera: The game camera
+
+        Returns:
+            The region in screen coordinates, or None if the widget could draw anywhere
+        """
+
+        return None
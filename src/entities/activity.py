@@ -0,0 +1,148 @@
+"""
+This file is a part of the source code for rpg-tile-game
+This project has been licensed under the MIT license.
+Copyright (c) 2022-present SSS-Says-Snek
+
+This file contains the activity scheduler, which lets systems tick entities far away from the camera less often
+"""
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Optional
+
+from src import core, pygame
+
+if TYPE_CHECKING:
+    from src.entities.systems.system import System
+    from src.states.level_state import LevelState
+
+
+@dataclass
+class ActivityRegion:
+    """
+    How a system ticks entities based on their distance (in pixels) from the camera viewport
+
+    Attributes:
+        active_radius: Entities within this distance are ticked every frame
+        lod_interval: Entities outside the active radius are ticked once every `lod_interval` frames
+        freeze_radius: Entities beyond this distance are not ticked at all. None means never freeze
+        max_catch_up_dt: Cap of the catch-up DT given to entities ticked at reduced frequency
+    """
+
+    active_radius: float
+    lod_interval: int = 1
+    freeze_radius: Optional[float] = None
+    max_catch_up_dt: float = 8
+
+
+class ActivityScheduler:
+    def __init__(self, level_state: LevelState):
+        """
+        Decides which entities each system should tick this frame, and with what DT.
+        Regions are configured per system in `settings/activity.json`, keyed by the system's class name.
+        Systems without a region tick everything every frame
+
+        Args:
+            level_state: The level state
+        """
+
+        self.level = level_state
+        self.camera = self.level.camera
+
+        self.regions: dict[str, ActivityRegion] = {
+            system_name: ActivityRegion(**region_settings)
+            for system_name, region_settings in self.level.settings["activity"].items()
+        }
+
+        # What distances are measured from. None means the camera viewport, but servers have one view per client
+        self.views: Optional[list[pygame.Rect]] = None
+
+        self.frame = 0
+        self.sim_time = 0.0  # Sum of DT of every ticked frame
+
+        # System name -> entity -> sim time of the entity's last tick
+        self.last_ticks: dict[str, dict[int, float]] = {system_name: {} for system_name in self.regions}
+
+        # Every entity ticked by any system, while something needs to know (the autosave journal takes and replaces
+        # it every record). None means nothing's tracked
+        self.ticked: Optional[set[int]] = None
+
+    def update(self):
+        """Advances the scheduler by one frame. Should only be called when the game isn't paused"""
+
+        self.frame += 1
+        self.sim_time += core.dt.dt
+
+        # Forget entities that don't exist anymore every once in a while
+        if self.frame % 600 == 0:
+            for last_ticks in self.last_ticks.values():
+                for entity in [entity for entity in last_ticks if not self.level.world.entity_exists(entity)]:
+                    del last_ticks[entity]
+
+    def distance_to_camera(self, rect: pygame.Rect) -> float:
+        """
+        Gets the (chessboard) distance from a rect to the camera viewport, or to the closest view if there are views
+
+        Args:
+            rect: The rect to check
+
+        Returns:
+            0 if the rect is inside the viewport, otherwise the distance in pixels
+        """
+
+        if self.views is None:
+            return self.distance_to_view(rect, self.camera.camera)
+        return min((self.distance_to_view(rect, view) for view in self.views), default=math.inf)
+
+    @staticmethod
+    def distance_to_view(rect: pygame.Rect, view: pygame.Rect) -> float:
+        dx = max(view.left - rect.right, rect.left - view.right, 0)
+        dy = max(view.top - rect.bottom, rect.top - view.bottom, 0)
+        return max(dx, dy)
+
+    def get_dt(self, system: System, entity: int, rect: pygame.Rect) -> Optional[float]:
+        """
+        Gets the DT a system should tick an entity with this frame
+
+        Args:
+            system: The system ticking the entity
+            entity: The entity ID
+            rect: The entity's rect (used for its distance from the camera)
+
+        Returns:
+            The DT (including catch-up time for entities ticked at reduced frequency),
+            or None if the entity shouldn't be ticked this frame (or is in an unloaded part of the map)
+        """
+
+        # Entities in parts of a streamed map that aren't loaded have nothing to stand on
+        if not self.level.tilemap.is_loaded(rect):
+            return None
+
+        system_name = type(system).__name__
+        region = self.regions.get(system_name)
+        if region is None:
+            if self.ticked is not None:
+                self.ticked.add(entity)
+            return core.dt.dt
+
+        last_ticks = self.last_ticks[system_name]
+        distance = self.distance_to_camera(rect)
+
+        if distance <= region.active_radius:
+            last_ticks[entity] = self.sim_time
+            if self.ticked is not None:
+                self.ticked.add(entity)
+            return core.dt.dt
+        if region.freeze_radius is not None and distance > region.freeze_radius:
+            return None
+
+        # Staggers entities so they don't all tick on the same frame
+        if (self.frame + entity) % region.lod_interval:
+            return None
+
+        if self.ticked is not None:
+            self.ticked.add(entity)
+        last_tick = last_ticks.get(entity, self.sim_time - core.dt.dt)
+        last_ticks[entity] = self.sim_time
+        return min(self.sim_time - last_tick, region.max_catch_up_dt)
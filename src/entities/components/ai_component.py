@@ -10,10 +10,11 @@ This file contains various utilities for entity AI
 from __future__ import annotations
 
 import math
+from typing import Optional
 
 from src.entities.components.component import Movement, Position
 from src.tilemap import TileMap
-from src.utils import enum_eq
+from src.utils import Cooldown, enum_eq
 
 
 class EntityState:
@@ -43,7 +44,8 @@ class EntityState:
             self.flee_speed = flee_speed
             self.flee_time = flee_time
 
-            self.flee_start_time = 0
+            # Fleeing stops once this is ready again
+            self.flee_timer = Cooldown(flee_time * 1000)
 
     @enum_eq
     class Follow:
@@ -63,9 +65,10 @@ class EntityState:
 
 
 class FollowsEntityClose:
-    def __init__(self, entity: int, follow_range: int):
+    def __init__(self, entity: int, follow_range: int, jump_vel: Optional[float] = None):
         self.entity_followed = entity
         self.follow_range = follow_range
+        self.jump_vel = jump_vel  # None if it can't jump (to follow paths to other platforms)
 
 
 class Patroller:
@@ -85,7 +88,7 @@ class MeleeAttack:
         self.damage = damage
         self.collision = collision
 
-        self.last_attacked = 0
+        self.cooldown = Cooldown(attack_cooldown * 1000)
 
 
 class MeleeWeaponAttack:
@@ -99,4 +102,4 @@ class RangeAttack:
         self.attack_cooldown = attack_cooldown
         self.ideal_parabola = -1 if ideal_parabola else 1
 
-        self.last_attacked = 0
+        self.cooldown = Cooldown(attack_cooldown * 1000)
@@ -20,7 +20,12 @@ class Graphics:
         sprite: Optional[pygame.Surface] = None,
         animations: Optional[dict] = None,
         animation_speeds: Optional[dict] = None,
+        asset_key: Optional[str] = None,
     ):
+        # Key of the image (for sprites) or mob settings (for animations) the graphics were loaded from, which
+        # snapshots store instead of the surfaces
+        self.asset_key = asset_key
+
         # self.sprites usually for prototyping purposes, where I don't have animations yet
         # Assume that sprite is the sprite facing right
         self.sprites = (
@@ -72,17 +77,34 @@ class Movement:
 class Health:
     def __init__(self, hp: float, max_hp: int):
         self._hp = hp
-        self.max_hp = max_hp
+        self._max_hp = max_hp
 
         self.prev_hp = hp
 
+        # Bumped whenever the hp or max hp changes, so whatever displays it knows when to redraw
+        self.version = 0
+
     @property
     def hp(self) -> float:
         return self._hp
 
     @hp.setter
     def hp(self, value: float):
-        self._hp = max(min(value, self.max_hp), 0)
+        value = max(min(value, self.max_hp), 0)
+        if value != self._hp:
+            self._hp = value
+            self.version += 1
+
+    @property
+    def max_hp(self) -> float:
+        return self._max_hp
+
+    @max_hp.setter
+    def max_hp(self, value: float):
+        if value != self._max_hp:
+            self._max_hp = value
+            self._hp = min(self._hp, value)
+            self.version += 1
 
 
 class Inventory:
@@ -91,11 +113,12 @@ class Inventory:
         self.hotbar_size = hotbar_size
 
         self.inventory: list[Optional[int]] = [None for _ in range(size)]
-        self.equipped_item_idx = 0
+        self._equipped_item_idx = 0
+
+        # Bumped whenever the contents or equipped item change, so whatever displays it knows when to redraw
+        self.version = 0
 
-        self.cooldown = 0  # Changes based on equipped item
-        self.last_used = 0
-        self.on_cooldown = False
+        self.cooldown = utils.Cooldown()  # Duration changes based on equipped item
 
     def get_available_idx(self) -> Optional[int]:
         for i, item in enumerate(self.inventory):
@@ -103,19 +126,45 @@ class Inventory:
                 return i
         return None
 
+    @property
+    def equipped_item_idx(self) -> int:
+        return self._equipped_item_idx
+
+    @equipped_item_idx.setter
+    def equipped_item_idx(self, value: int):
+        if value != self._equipped_item_idx:
+            self._equipped_item_idx = value
+            self.version += 1
+
     @property
     def equipped_item(self):
         return self.inventory[self.equipped_item_idx]
 
     def remove_item(self, idx: int):
         self.inventory[idx] = None
+        self.version += 1
 
     def __getitem__(self, item: int) -> Optional[Entity]:
         return self.inventory[item]
 
     def __setitem__(self, key: int, value: Entity):
         self.inventory[key] = value
+        self.version += 1
 
 
 class NoCollidePlayer:
     pass
+
+
+class Controls:
+    def __init__(self):
+        """
+        What a player wants to do this frame, filled in by the InputSystem from the keyboard and mouse (or by the
+        server, from a client's input). Jumps, item uses and hotbar picks are cleared once they're handled
+        """
+
+        self.move = 0  # -1 for left, 1 for right
+        self.jump = False
+        self.use = False
+        self.hotbar_idx: Optional[int] = None
+        self.aim = pygame.Vector2()  # World position the player is aiming at
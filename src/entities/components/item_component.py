@@ -9,7 +9,7 @@ from __future__ import annotations
 
 from typing import Optional
 
-from src import core, pygame
+from src import pygame
 from src.entities.components.component import Inventory
 
 
@@ -24,8 +24,7 @@ class Item:
     def use(self, inventory_component: Inventory):
         self.used = True
 
-        inventory_component.cooldown = self.cooldown
-        inventory_component.last_used = core.time.get_ticks()
+        inventory_component.cooldown.start(self.cooldown * 1000)
 
 
 class ItemPosition:
@@ -42,7 +41,11 @@ class ItemGraphics:
         icon: Optional[pygame.Surface] = None,
         world_sprite: Optional[pygame.Surface] = None,
         flip_on_dir: bool = False,
+        asset_keys: tuple[Optional[str], Optional[str], Optional[str]] = (None, None, None),
     ):
+        # Image keys of the sprite, icon and world sprite, which snapshots store instead of the surfaces
+        self.asset_keys = asset_keys
+
         self.original_img = sprite
         self.current_img = sprite
         self.size = sprite.get_rect().size
@@ -64,10 +67,23 @@ class ItemGraphics:
 class Consumable:
     def __init__(self, num_uses: int = 1):
         self.total_uses = num_uses
-        self.uses_left = num_uses
+        self._uses_left = num_uses
 
         self.consumed = False
 
+        # Same as Health.version, since durability bars display consumables like health
+        self.version = 0
+
+    @property
+    def uses_left(self) -> int:
+        return self._uses_left
+
+    @uses_left.setter
+    def uses_left(self, value: int):
+        if value != self._uses_left:
+            self._uses_left = value
+            self.version += 1
+
     @property
     def hp(self):
         return self.uses_left
@@ -66,7 +66,12 @@ class Decoration:
 
 
 class GrassBlades:
-    GRASS_BLADES = utils.load_img_dir(IMG_DIR / "deco" / "grass", colorkey=(0, 0, 0))
+    # Loaded by `load_assets`
+    GRASS_BLADES: list[pygame.Surface]
+
+    @classmethod
+    def load_assets(cls):
+        cls.GRASS_BLADES = utils.load_img_dir(IMG_DIR / "deco" / "grass", colorkey=(0, 0, 0))
 
     @dataclass
     class Blade:
@@ -2,47 +2,130 @@
 This file is a part of the source code for rpg-tile-game
 This project has been licensed under the MIT license.
 Copyright (c) 2022-present SSS-Says-Snek
+
+This file contains the effect manager, which stores every status effect in NumPy arrays, one set of arrays per type
 """
 
 from __future__ import annotations
 
-import random
-from typing import TYPE_CHECKING
+import math
+from typing import TYPE_CHECKING, Optional
+
+import numpy as np
 
-from src.display.camera import Camera
 from src.types import Entity
 
 if TYPE_CHECKING:
+    from src.display.particle import ParticleManager
     from src.states.level_state import LevelState
 
-from src import core, utils
+from src import core
 from src.entities.components.component import Graphics, Health, Position
 
 
 class EffectManager:
     def __init__(self, level_state: LevelState):
-        self.effect_dict: dict[int, Effect] = {}
+        """
+        A manager for all status effects. Effects of the same type stack, and are stored together so their ticks are
+        applied in one batch per frame
+
+        Args:
+            level_state: The level state
+        """
 
         self.level = level_state
-        self.particle_system = self.level.particle_manager
+        self.particle_manager = self.level.particle_manager
         self.camera = self.level.camera
 
+        self.stores: dict[type[Effect], EffectStore] = {}
+
     def add_effect(self, entity: Entity, effect: Effect):
-        self.effect_dict[entity] = effect
+        """
+        Adds an effect to an entity, on top of the effects it already has
 
-    def update(self):
-        for entity, effect in self.effect_dict.copy().items():
-            effect.update(entity)
+        Args:
+            entity: The entity
+            effect: The effect, as made by its builder
+        """
+
+        world = self.level.world
+        if not world.entity_exists(entity):
+            # Died before the effect could be added
+            return
+
+        if type(effect) not in self.stores:
+            self.stores[type(effect)] = EffectStore(type(effect))
+
+        pos = world.try_component(entity, Position)
+        graphics = world.try_component(entity, Graphics)
+        self.stores[type(effect)].add(entity, effect, pos, graphics.size if graphics is not None else (0, 0))
+
+    def remove_effect(self, entity: Entity, effect_type: Optional[type[Effect]] = None):
+        """
+        Removes every effect of an entity
+
+        Args:
+            entity: The entity
+            effect_type: Only remove effects of this type. Defaults to every type
+        """
+
+        for store_type, store in self.stores.items():
+            if effect_type is None or store_type is effect_type:
+                store.remove_entities(np.array([entity]))
+
+    def has_effect(self, entity: Entity, effect_type: type[Effect]) -> bool:
+        store = self.stores.get(effect_type)
+        return store is not None and entity in store.entity[: store.num_effects]
+
+    def __len__(self) -> int:
+        return sum(len(store) for store in self.stores.values())
 
-            if not effect.on:
-                del self.effect_dict[entity]
+    def clear(self):
+        """Removes every effect"""
+
+        self.stores.clear()
+
+    def update(self):
+        """Applies every tick due this frame, and removes effects that ran out. Shouldn't be called when paused"""
+
+        now = core.time.get_ticks()
+        world = self.level.world
+
+        for store in self.stores.values():
+            # Nothing to do until the next tick or expiry of the store
+            if now < store.next_deadline:
+                continue
+
+            entities, hp_changes = store.tick(now)
+            dead_entities = []
+            for entity, hp_change in zip(entities.tolist(), hp_changes.tolist()):
+                # Deleted entities count as dead too (try_component raises for them)
+                health = world.try_component(entity, Health) if world.entity_exists(entity) else None
+                if health is None:
+                    dead_entities.append(entity)
+                    continue
+                health.hp += hp_change
+
+            if dead_entities:
+                store.remove_entities(np.array(dead_entities))
+            store.expire(now)
 
     def draw(self):
-        for entity, effect in self.effect_dict.items():
-            effect.draw(entity, self.camera)
+        """Emits the particles of every effect type, with one batched call per type"""
+
+        for effect_type, store in self.stores.items():
+            if len(store) == 0 or effect_type.particle_chance <= 0:
+                continue
+
+            positions = store.get_particle_positions(effect_type.particle_chance)
+            if len(positions) > 0:
+                effect_type.emit_particles(self.particle_manager, positions)
 
 
 class Effect:
+    # Chance for each entity with the effect to emit a particle every frame
+    particle_chance = 0.0
+
     def __init__(self, level_state: LevelState):
         self.level = level_state
         self.world = self.level.world
@@ -52,11 +135,6 @@ class Effect:
         self.duration = 0
         self.interval = 0
 
-        self.apply_effect = utils.Task(0)
-        self.time_created = core.time.get_ticks()
-
-        self.time_waiting = 0
-
     class Builder:
         def __init__(self, effect):
             self.effect = effect
@@ -72,65 +150,190 @@ class Effect:
         def duration(self, duration: float, interval: float):
             self.effect.duration = duration
             self.effect.interval = interval
-            self.effect.apply_effect.period = interval * 1000
 
             return self
 
         def build(self):
             return self.effect
 
-    @property
-    def on(self):
-        return not core.time.get_ticks() - self.time_created > self.duration * 1000
-
     def builder(self):
         return self.Builder(self)
 
-    def update(self, entity: Entity):
+    @staticmethod
+    def emit_particles(particle_manager: ParticleManager, positions: np.ndarray):
         """
-        Updates effect
+        Emits the particles of the effect type
 
         Args:
-            entity: Entity ID of effect "owner"
+            particle_manager: The particle manager
+            positions: A (N, 2) array of where to emit particles
         """
 
-        if self.time_waiting == 0:
-            self.time_waiting = core.time.get_ticks()
-        if self.apply_effect.update() and core.time.get_ticks() - self.time_waiting > self.interval:
-            health_component = self.world.component_for_entity(entity, Health)
-            health_component.hp += self.heal_power
-            health_component.hp -= self.damage
-
-    def draw(self, entity: Entity, camera: Camera):
-        """Draws some stuff for the effect"""
-
         pass
 
 
 class BurnEffect(Effect):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-
-    def draw(self, entity: Entity, _):
-        if random.random() < 0.7:
-            pos = self.level.world.component_for_entity(entity, Position).pos
-            size = self.level.world.component_for_entity(entity, Graphics).size
-            self.level.particle_manager.create_fire_particle(
-                pos, offset=(random.randint(0, size[0]), random.randint(0, size[1]))
-            )
+    particle_chance = 0.7
+
+    @staticmethod
+    def emit_particles(particle_manager: ParticleManager, positions: np.ndarray):
+        particle_manager.create_fire_particles(positions)
 
 
 class RegenEffect(Effect):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-
-    def draw(self, entity: Entity, _):  # No camera >:(
-        if random.random() < 0.12:
-            pos = self.level.world.component_for_entity(entity, Position).pos
-            size = self.level.world.component_for_entity(entity, Graphics).size
-            self.level.particle_manager.create_regen_particle(
-                pos, offset=(random.randint(0, size[0]), random.randint(0, size[1]))
-            )
+    particle_chance = 0.12
+
+    @staticmethod
+    def emit_particles(particle_manager: ParticleManager, positions: np.ndarray):
+        particle_manager.create_regen_particles(positions)
+
+
+class EffectStore:
+    def __init__(self, effect_type: type[Effect], capacity: int = 64):
+        """
+        Every effect of one type, with each attribute stored in its own array. Each effect is a stack, so an entity
+        has as many rows as times the effect was added to it
+
+        Args:
+            effect_type: The effect type
+            capacity: Number of effects to allocate room for. Arrays double in size when full
+        """
+
+        self.effect_type = effect_type
+
+        self.capacity = capacity
+        self.num_effects = 0
+
+        self.entity = np.full(capacity, -1, dtype=np.int64)
+        self.hp_change = np.zeros(capacity)  # Heal power minus damage, applied every tick
+        self.interval = np.zeros(capacity)  # In milliseconds
+        self.next_tick = np.zeros(capacity)
+        self.end_time = np.zeros(capacity)
+        self.size = np.zeros((capacity, 2))
+
+        # Positions are read when emitting particles, since entities move
+        self.positions: list[Optional[Position]] = []
+
+        # Earliest tick or expiry, so frames without either skip the store
+        self.next_deadline = math.inf
+
+    def __len__(self) -> int:
+        return self.num_effects
+
+    def _grow(self):
+        """Doubles the capacity of every array"""
+
+        self.capacity *= 2
+        for attr in ("entity", "hp_change", "interval", "next_tick", "end_time", "size"):
+            old_arr = getattr(self, attr)
+            new_arr = np.zeros((self.capacity, *old_arr.shape[1:]), dtype=old_arr.dtype)
+            new_arr[: self.num_effects] = old_arr[: self.num_effects]
+            setattr(self, attr, new_arr)
+
+    def reserve(self, capacity: int):
+        """Grows the arrays until they have room for `capacity` effects"""
+
+        while self.capacity < capacity:
+            self._grow()
+
+    def update_next_deadline(self):
+        n = self.num_effects
+        if n == 0:
+            self.next_deadline = math.inf
+        else:
+            self.next_deadline = min(self.next_tick[:n].min(), self.end_time[:n].min())
+
+    def add(self, entity: Entity, effect: Effect, pos: Optional[Position], size: tuple[int, int]):
+        if self.num_effects == self.capacity:
+            self._grow()
+
+        now = core.time.get_ticks()
+        interval = effect.interval * 1000
+
+        idx = self.num_effects
+        self.entity[idx] = entity
+        self.hp_change[idx] = effect.heal_power - effect.damage
+        self.interval[idx] = interval
+        # Effects without an interval never tick
+        self.next_tick[idx] = now + interval if interval > 0 else math.inf
+        self.end_time[idx] = now + effect.duration * 1000
+        self.size[idx] = size
+        self.positions.append(pos)
+
+        self.num_effects += 1
+        self.next_deadline = min(self.next_deadline, self.next_tick[idx], self.end_time[idx])
+
+    def tick(self, now: float) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Advances every effect whose tick is due
+
+        Args:
+            now: The current time
+
+        Returns:
+            The entities ticked, and the total hp change of each
+        """
+
+        n = self.num_effects
+        next_tick = self.next_tick[:n]
+
+        # An effect ends before it would tick at the same time
+        due = (next_tick <= now) & (next_tick < self.end_time[:n])
+        if not due.any():
+            self.update_next_deadline()
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        entities, inverse = np.unique(self.entity[:n][due], return_inverse=True)
+        hp_changes = np.bincount(inverse, weights=self.hp_change[:n][due], minlength=len(entities))
+
+        # Doesn't try to catch up on missed ticks after a long frame
+        next_tick[due] += self.interval[:n][due]
+        late = next_tick <= now
+        next_tick[late] = now + self.interval[:n][late]
+
+        self.update_next_deadline()
+        return entities, hp_changes
+
+    def _keep(self, keep: np.ndarray):
+        """Removes the effects not kept by compacting the arrays"""
+
+        n = self.num_effects
+        num_kept = int(keep.sum())
+        if num_kept == n:
+            return
+
+        for arr in (self.entity, self.hp_change, self.interval, self.next_tick, self.end_time, self.size):
+            arr[:num_kept] = arr[:n][keep]
+        self.positions = [self.positions[idx] for idx in np.flatnonzero(keep)]
+
+        self.num_effects = num_kept
+        self.update_next_deadline()
+
+    def expire(self, now: float):
+        self._keep(self.end_time[: self.num_effects] > now)
+
+    def remove_entities(self, entities: np.ndarray):
+        self._keep(~np.isin(self.entity[: self.num_effects], entities))
+
+    def get_particle_positions(self, chance: float) -> np.ndarray:
+        """
+        Picks the entities which emit a particle this frame, once per entity no matter how many stacks it has
+
+        Args:
+            chance: Chance of each entity emitting a particle
+
+        Returns:
+            A (N, 2) array of random positions inside the picked entities
+        """
+
+        _, first_idxs = np.unique(self.entity[: self.num_effects], return_index=True)
+        picked = first_idxs[np.random.random(len(first_idxs)) < chance]
+        picked = [idx for idx in picked.tolist() if self.positions[idx] is not None]
+        if not picked:
+            return np.empty((0, 2))
+
+        positions = np.array([self.positions[idx].pos.xy for idx in picked])
+        return positions + np.random.random((len(picked), 2)) * self.size[picked]
 
 
 """            
@@ -0,0 +1,361 @@
+"""
+This file is a part of the source code for rpg-tile-game
+This project has been licensed under the MIT license.
+Copyright (c) 2022-present SSS-Says-Snek
+
+This file contains the autosave journal, which appends what changed in a level to a write-ahead file every interval,
+and compacts it into a full snapshot (the checkpoint) every so often
+
+Each record is a snapshot (see `snapshot.py`) with only the tables that changed since the last record. Tables with a
+row per entity are diffed row by row: changed rows are saved in full, and removed entities are saved in a
+"<table>/removed" table. Other tables (e.g effects) are small, and are saved whole whenever they change. String table
+indices are shared by the checkpoint and every record after it, so records only save new strings
+
+Records only pack the entities that could have changed since the last record (see `Journal.take_changes`), so making
+one costs about as much as what changed, rather than as much as the whole level
+"""
+from __future__ import annotations
+
+import math
+import os
+import struct
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Optional
+
+import numpy as np
+
+from src import common, core
+from src.entities import snapshot
+from src.entities.components.component import Health, Inventory
+from src.types import Entity
+
+if TYPE_CHECKING:
+    from src.states.level_state import LevelState
+
+CHECKPOINT_FILE = "autosave.snapshot"
+JOURNAL_FILE = "autosave.journal"
+
+# Sequence number, payload length and payload CRC32 of a record
+RECORD_HEADER = struct.Struct("<QII")
+SEQ_DTYPE = np.dtype([("seq", "<u8")])
+
+
+class Journal:
+    def __init__(self, level_state: LevelState):
+        """
+        Autosaves a level by journaling changes. Records and checkpoints are made on the main thread, but written
+        (and fsynced) by a background thread. Configured in `settings/autosave.json`
+
+        Args:
+            level_state: The level state
+        """
+
+        self.level = level_state
+
+        autosave_settings = self.level.settings["autosave"]
+        self.interval = autosave_settings["interval"]
+        self.records_per_checkpoint = autosave_settings["records_per_checkpoint"]
+
+        self.checkpoint_path = common.SAVE_DIR / CHECKPOINT_FILE
+        self.journal_path = common.SAVE_DIR / JOURNAL_FILE
+
+        self.last_saved = core.time.get_ticks()
+        self.seq = 0
+        self.num_records = 0  # Since the last checkpoint
+        self.num_record_bytes = 0
+        self.num_checkpoint_bytes = 0
+
+        # Strings and tables as of the last record, or None before the first checkpoint
+        self.strings: Optional[snapshot.StringTable] = None
+        self.num_strings_saved = 0
+        self.tables: dict[str, np.ndarray] = {}
+
+        # What's needed to tell which entities changed since the last record
+        self.activity_scheduler = self.level.activity_scheduler
+        self.activity_scheduler.ticked = set()
+        self.health_states: dict[Entity, tuple[int, float]] = {}
+        self.running_timers = np.empty(0, dtype=np.int64)
+        self.changed_all = False
+
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="autosave")
+
+    def reset(self):
+        """Makes the next autosave a checkpoint, e.g after the level was replaced by a snapshot"""
+
+        self.strings = None
+        self.tables.clear()
+        self.last_saved = -math.inf
+
+    def update(self):
+        """Autosaves if the interval has passed. Shouldn't be called when paused"""
+
+        now = core.time.get_ticks()
+        if now - self.last_saved < self.interval:
+            return
+        self.last_saved = now
+
+        if (
+            self.strings is None
+            or self.num_records >= self.records_per_checkpoint
+            or self.num_record_bytes > self.num_checkpoint_bytes
+        ):
+            self.checkpoint()
+        else:
+            self.record()
+
+    def touch_all(self):
+        """Makes the next record save every entity, e.g after reloaded settings were copied into components"""
+
+        self.changed_all = True
+
+    def take_changes(self, entities: np.ndarray) -> np.ndarray:
+        """
+        Gets the entities whose saved components could have changed since the last record, and starts tracking again.
+        Components are changed in place all over the systems, so rather than marking every change, entities count as
+        changed if:
+        - A system ticked them (see `ActivityScheduler.ticked`), which is what moves mobs and makes them attack
+        - Their health changed (see `Health.version`), since anything can hit them
+        - They have an inventory or are in one, since held items are moved every frame, and inventory slots are saved
+          in a table shared by every inventory
+        - They're new, or one of their timers was still running as of the last record
+
+        Args:
+            entities: Every saved entity, sorted
+
+        Returns:
+            The changed entities, sorted
+        """
+
+        world = self.level.world
+        changed = self.activity_scheduler.ticked
+        self.activity_scheduler.ticked = set()
+
+        health_states = {}
+        for entity, health in world.get_component(Health):
+            health_states[entity] = health.version, health.prev_hp
+            if self.health_states.get(entity) != health_states[entity]:
+                changed.add(entity)
+        self.health_states = health_states
+
+        for entity, inventory in world.get_component(Inventory):
+            changed.add(entity)
+            changed.update(item for item in inventory.inventory if item is not None)
+
+        if self.changed_all:
+            self.changed_all = False
+            return entities
+
+        changed_entities = [np.fromiter(changed, dtype=np.int64, count=len(changed)), self.running_timers]
+        if "entities" in self.tables:
+            changed_entities.append(np.setdiff1d(entities, self.tables["entities"]["entity"], assume_unique=True))
+        return np.intersect1d(np.concatenate(changed_entities), entities)
+
+    def update_running_timers(self):
+        """Finds the entities with timers still running, which change without any system touching them"""
+
+        running_timers = []
+        for table in snapshot.COMPONENT_TABLES:
+            if table.timers:
+                arr = self.tables[table.name]
+                running = np.zeros(len(arr), dtype=bool)
+                for column in table.timers:
+                    running |= arr[column] > 0
+                running_timers.append(arr["entity"][running])
+        self.running_timers = np.unique(np.concatenate(running_timers))
+
+    def checkpoint(self):
+        """Saves a full snapshot, which replaces the journal"""
+
+        entities = snapshot.get_saved_entities(self.level)
+        self.changed_all = False
+        self.take_changes(entities)
+
+        self.strings = snapshot.StringTable()
+        writer = snapshot.SnapshotWriter(self.level, self.strings)
+        snapshot.write_tables(writer, entities)
+        self.tables = dict(writer.tables)
+        for name in snapshot.KEYED_TABLES:
+            self.tables[name] = snapshot.sort_by_entity(self.tables[name])
+        self.update_running_timers()
+
+        self.num_strings_saved = len(self.strings.strings)
+        self.num_records = 0
+        self.num_record_bytes = 0
+
+        # Records up to this one are part of the checkpoint
+        seq_table = np.array([self.seq], dtype=SEQ_DTYPE)
+        data = snapshot.pack_snapshot(
+            [*self.tables.items(), ("journal", seq_table)], self.strings, core.time.get_ticks(), self.level.player
+        )
+        self.num_checkpoint_bytes = len(data)
+        self.executor.submit(self._write_checkpoint, data)
+
+    def record(self):
+        """Appends what changed since the last record (or checkpoint) to the journal"""
+
+        entities = snapshot.get_saved_entities(self.level)
+        changed_entities = self.take_changes(entities)
+
+        writer = snapshot.SnapshotWriter(self.level, self.strings)
+        snapshot.write_tables(writer, entities, changed_entities)
+
+        changed_tables = []
+        for name, arr in writer.tables:
+            old_arr = self.tables.get(name)
+            if name == "entities":
+                changed, removed = snapshot.diff_keyed_table(old_arr, arr)
+                self.tables[name] = arr
+            elif name in snapshot.KEYED_TABLES:
+                # Most component types aren't on any entity in a given level
+                if len(old_arr) == 0 and len(arr) == 0:
+                    continue
+
+                # Only the rows of changed entities were packed. The rest are kept, unless their entity is gone
+                repacked = snapshot.in_sorted(old_arr["entity"], changed_entities)
+                kept = ~repacked & snapshot.in_sorted(old_arr["entity"], entities)
+                if len(arr) == 0 and kept.all():
+                    continue
+
+                changed, removed = snapshot.diff_keyed_table(old_arr[repacked], arr)
+                deleted = old_arr[~repacked & ~kept]["entity"].astype(np.int64).view(snapshot.ENTITY_DTYPE)
+                removed = np.concatenate([removed, deleted])
+                self.tables[name] = snapshot.sort_by_entity(np.concatenate([old_arr[kept], arr]))
+            else:
+                if old_arr is None or old_arr.tobytes() != arr.tobytes():
+                    changed_tables.append((name, arr))
+                self.tables[name] = arr
+                continue
+
+            if len(changed) > 0:
+                changed_tables.append((name, changed))
+            if len(removed) > 0:
+                changed_tables.append((f"{name}/removed", removed))
+        self.update_running_timers()
+
+        new_strings = snapshot.StringTable(self.strings.strings[self.num_strings_saved :])
+        self.num_strings_saved = len(self.strings.strings)
+
+        # Nothing happened (e.g the player is standing still, with no mobs around)
+        if not changed_tables and not new_strings.strings:
+            return
+
+        self.seq += 1
+        payload = snapshot.pack_snapshot(changed_tables, new_strings, core.time.get_ticks(), self.level.player)
+        data = RECORD_HEADER.pack(self.seq, len(payload), zlib.crc32(payload)) + payload
+
+        self.num_records += 1
+        self.num_record_bytes += len(data)
+        self.executor.submit(self._append_record, data)
+
+    def _write_checkpoint(self, data: bytes):
+        common.SAVE_DIR.mkdir(parents=True, exist_ok=True)
+
+        # Replacing the file is atomic, so a crash leaves either the old or the new checkpoint
+        tmp_path = self.checkpoint_path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.checkpoint_path)
+
+        # Records left over from a crash before this are skipped by their sequence number anyway
+        with open(self.journal_path, "wb"):
+            pass
+
+    def _append_record(self, data: bytes):
+        with open(self.journal_path, "ab") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def flush(self):
+        """Waits for every autosave to be written"""
+
+        self.executor.submit(lambda: None).result()
+
+    def read_autosave(self) -> Optional[bytes]:
+        """
+        Replays the journal on top of the checkpoint. Records after a torn or corrupted one (e.g from a crash
+        mid-write) are ignored
+
+        Returns:
+            The autosave as a snapshot, or None if there isn't a checkpoint
+        """
+
+        self.flush()
+        if not self.checkpoint_path.exists():
+            return None
+
+        time, player, raw_tables = snapshot.unpack_snapshot(self.checkpoint_path.read_bytes())
+        num_strings, strings_data = raw_tables.pop("strings", (0, memoryview(b"")))
+        strings = snapshot.StringTable.from_bytes(bytes(strings_data), num_strings).strings
+
+        num_rows, seq_data = raw_tables.pop("journal")
+        seq = int(np.frombuffer(seq_data, dtype=SEQ_DTYPE, count=num_rows)["seq"][0])
+        tables = {
+            name: np.frombuffer(data, dtype=snapshot.TABLE_DTYPES[name], count=num_rows)
+            for name, (num_rows, data) in raw_tables.items()
+        }
+
+        journal = self.journal_path.read_bytes() if self.journal_path.exists() else b""
+        offset = 0
+        while offset + RECORD_HEADER.size <= len(journal):
+            record_seq, length, crc = RECORD_HEADER.unpack_from(journal, offset)
+            payload = journal[offset + RECORD_HEADER.size : offset + RECORD_HEADER.size + length]
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                break
+            offset += RECORD_HEADER.size + length
+
+            if record_seq <= seq:
+                continue
+            if record_seq != seq + 1:
+                break
+            seq = record_seq
+
+            time, player, raw_tables = snapshot.unpack_snapshot(payload)
+            num_strings, strings_data = raw_tables.pop("strings", (0, memoryview(b"")))
+            strings.extend(snapshot.StringTable.from_bytes(bytes(strings_data), num_strings).strings)
+
+            changed_tables = {
+                name: np.frombuffer(
+                    data,
+                    dtype=snapshot.ENTITY_DTYPE if name.endswith("/removed") else snapshot.TABLE_DTYPES[name],
+                    count=num_rows,
+                )
+                for name, (num_rows, data) in raw_tables.items()
+            }
+            for name in snapshot.KEYED_TABLES:
+                changed = changed_tables.pop(name, None)
+                removed = changed_tables.pop(f"{name}/removed", None)
+                if changed is None and removed is None:
+                    continue
+
+                arr = tables.get(name, np.empty(0, dtype=snapshot.TABLE_DTYPES[name]))
+                dropped = [] if removed is None else [removed["entity"]]
+                if changed is not None:
+                    dropped.append(changed["entity"])
+                arr = arr[~np.isin(arr["entity"], np.concatenate(dropped))]
+                if changed is not None:
+                    arr = np.concatenate([arr, changed])
+                tables[name] = arr
+            tables.update(changed_tables)
+
+        tables["entities"] = snapshot.sort_by_entity(tables["entities"])
+        return snapshot.pack_snapshot(list(tables.items()), snapshot.StringTable(strings), time, player)
+
+    def load_autosave(self) -> bool:
+        """
+        Loads the autosave into the level, if there is one
+
+        Returns:
+            Whether there was an autosave to load
+        """
+
+        data = self.read_autosave()
+        if data is None:
+            return False
+
+        snapshot.load_snapshot(self.level, data)
+        self.reset()
+        return True
@@ -0,0 +1,504 @@
+"""
+This file is a part of the source code for rpg-tile-game
+This project has been licensed under the MIT license.
+Copyright (c) 2022-present SSS-Says-Snek
+
+This file contains the pathfinder, which answers A* path queries over a platformer navigation graph of the tilemap,
+and flow fields, which lead any number of mobs toward the same target
+"""
+from __future__ import annotations
+
+import heapq
+import itertools
+import math
+from collections import OrderedDict
+from typing import TYPE_CHECKING, NamedTuple, Optional
+
+import numpy as np
+
+from src import pygame
+from src.common import TILE_HEIGHT, TILE_WIDTH
+from src.entities.components.component import Position
+from src.types import Entity
+
+if TYPE_CHECKING:
+    from src.states.level_state import LevelState
+    from src.tilemap import TileMap
+
+Node = tuple[int, int]
+
+
+class PathStep(NamedTuple):
+    tile: Node
+    move: str  # How the step is reached from the previous one: "start", "walk", "jump" or "drop"
+
+
+Path = list[PathStep]
+
+
+class NavGraph:
+    def __init__(self, tilemap: TileMap, nav_settings: dict):
+        """
+        A navigation graph of the tiles mobs can stand on, with walk, jump and drop edges between them.
+        Derived from the collision and ramp grids of the tilemap
+
+        Args:
+            tilemap: The tilemap
+            nav_settings: Pathfinding settings (see `settings/pathfinding.json`)
+        """
+
+        self.tilemap = tilemap
+
+        self.clearance = nav_settings["clearance"]
+        self.max_jump_height = nav_settings["max_jump_height"]
+        self.max_jump_distance = nav_settings["max_jump_distance"]
+        self.max_drop = nav_settings["max_drop"]
+        self.jump_cost = nav_settings["jump_cost"]
+
+        self.edges: dict[Node, list[tuple[Node, float, str]]] = {}
+        self.version = 0  # Incremented on every (re)build
+
+    def is_solid(self, x: int, y: int) -> bool:
+        grid_width, grid_height = self.tilemap.collision_grid.shape
+        if x < 0 or x >= grid_width:
+            return True
+        if y < 0 or y >= grid_height:
+            return False
+        return bool(self.tilemap.collision_grid[x, y])
+
+    def is_ramp(self, x: int, y: int) -> bool:
+        grid_width, grid_height = self.tilemap.ramp_grid.shape
+        return 0 <= x < grid_width and 0 <= y < grid_height and bool(self.tilemap.ramp_grid[x, y])
+
+    def is_clear(self, x: int, y: int) -> bool:
+        """Whether a mob's feet can be in a tile (with enough head room above it)"""
+
+        return not any(self.is_solid(x, y - i) for i in range(self.clearance))
+
+    def is_standable(self, x: int, y: int) -> bool:
+        return self.is_clear(x, y) and (self.is_ramp(x, y) or self.is_solid(x, y + 1) or self.is_ramp(x, y + 1))
+
+    def nearest_node(self, tile: Node) -> Optional[Node]:
+        """
+        Gets the node a mob is standing on (or will land on, if it's in the air)
+
+        Args:
+            tile: The tile of the mob's feet
+
+        Returns:
+            The node, or None if there is no ground within the max drop height
+        """
+
+        x, y = tile
+        for y_offset in range(self.max_drop + 1):
+            if (x, y + y_offset) in self.edges:
+                return x, y + y_offset
+            if self.is_solid(x, y + y_offset):
+                break
+        return None
+
+    def _is_jump_clear(self, x: int, y: int, target_x: int, target_y: int) -> bool:
+        """Approximates a jump arc as going up, across at the highest of both heights, then down"""
+
+        top = min(y, target_y)
+        direction = 1 if target_x > x else -1
+
+        if any(not self.is_clear(x, row) for row in range(top, y + 1)):
+            return False
+        if any(not self.is_clear(column, top - 1) for column in range(x, target_x + direction, direction)):
+            return False
+        return all(self.is_clear(target_x, row) for row in range(top, target_y + 1))
+
+    def _find_edges(self, x: int, y: int) -> list[tuple[Node, float, str]]:
+        edges = []
+
+        for direction in (-1, 1):
+            next_x = x + direction
+
+            if self.is_standable(next_x, y):
+                edges.append(((next_x, y), 1, "walk"))
+            elif self.is_clear(next_x, y):
+                # Walk off the ledge, then fall straight down
+                for drop in range(1, self.max_drop + 1):
+                    if self.is_solid(next_x, y + drop):
+                        break
+                    if self.is_standable(next_x, y + drop):
+                        edges.append(((next_x, y + drop), 1 + drop, "drop"))
+                        break
+
+            # Ramps are walked up and down like stairs
+            for step_y in (y - 1, y + 1):
+                if (self.is_ramp(x, y) or self.is_ramp(next_x, step_y)) and self.is_standable(next_x, step_y):
+                    edges.append(((next_x, step_y), math.sqrt(2), "walk"))
+
+            for jump_x in range(1, self.max_jump_distance + 1):
+                target_x = x + jump_x * direction
+
+                for jump_y in range(-self.max_jump_height, self.max_jump_height + 1):
+                    target_y = y + jump_y
+
+                    # Already covered by walking and dropping
+                    if jump_x == 1 and jump_y >= 0:
+                        continue
+                    if not self.is_standable(target_x, target_y) or not self._is_jump_clear(
+                        x, y, target_x, target_y
+                    ):
+                        continue
+
+                    edges.append(
+                        ((target_x, target_y), math.hypot(jump_x, jump_y) + self.jump_cost, "jump")
+                    )
+
+        return edges
+
+    def build(self, tile_rect: Optional[pygame.Rect] = None):
+        """
+        (Re)builds the nodes and edges within an area
+
+        Args:
+            tile_rect: The area to rebuild, in tiles. Defaults to the whole map
+        """
+
+        grid_width, grid_height = self.tilemap.collision_grid.shape
+        if tile_rect is None:
+            tile_rect = pygame.Rect(0, 0, grid_width, grid_height)
+        tile_rect = tile_rect.clip(0, 0, grid_width, grid_height)
+
+        for x in range(tile_rect.left, tile_rect.right):
+            for y in range(tile_rect.top, tile_rect.bottom):
+                self.edges.pop((x, y), None)
+                if self.is_standable(x, y):
+                    self.edges[(x, y)] = self._find_edges(x, y)
+
+        self.version += 1
+
+    @property
+    def margin(self) -> tuple[int, int]:
+        """How far (in tiles) edges can reach, which is how far changing a tile can affect the graph"""
+
+        return max(self.max_jump_distance, 1) + 1, max(self.max_drop, self.max_jump_height, self.clearance) + 1
+
+
+class Pathfinder:
+    def __init__(self, level_state: LevelState):
+        """
+        Answers path queries with A* over a navigation graph, with a budget of queries per frame.
+        Found paths are cached per (start region, goal region) and reused for nearby queries.
+        Configured in `settings/pathfinding.json`
+
+        Args:
+            level_state: The level state
+        """
+
+        self.level = level_state
+        self.tilemap = self.level.tilemap
+
+        pathfinding_settings = self.level.settings["pathfinding"]
+        self.cache_region_size = pathfinding_settings["cache_region_size"]
+        self.cache_size = pathfinding_settings["cache_size"]
+        self.queries_per_frame = pathfinding_settings["queries_per_frame"]
+        self.max_expansions = pathfinding_settings["max_expansions"]
+        self.splice_expansions = pathfinding_settings["splice_expansions"]
+
+        self.nav_graph = NavGraph(self.tilemap, pathfinding_settings)
+        for chunk_rect, _, _ in self.tilemap.chunks:
+            self.nav_graph.build(self.pixel_to_tile_rect(chunk_rect))
+        self.tilemap.subscribe_tiles_changed(self.on_tiles_changed)
+
+        self.cache: OrderedDict[tuple[Node, Node], Path] = OrderedDict()
+
+        # Queued queries and their results, per entity
+        self.requests: dict[Entity, tuple[Node, Node]] = {}
+        self.paths: dict[Entity, Path] = {}
+        self.failed: dict[Entity, tuple[Node, Node]] = {}
+
+        self._counter = itertools.count()
+
+    @staticmethod
+    def pixel_to_tile_rect(rect: pygame.Rect) -> pygame.Rect:
+        left, top = rect.left // TILE_WIDTH, rect.top // TILE_HEIGHT
+        return pygame.Rect(
+            left, top, -(-rect.right // TILE_WIDTH) - left, -(-rect.bottom // TILE_HEIGHT) - top
+        )
+
+    @staticmethod
+    def get_feet_tile(rect: pygame.Rect) -> Node:
+        return rect.centerx // TILE_WIDTH, (rect.bottom - 1) // TILE_HEIGHT
+
+    def get_cache_region(self, node: Node) -> Node:
+        return node[0] // self.cache_region_size, node[1] // self.cache_region_size
+
+    def on_tiles_changed(self, rect: pygame.Rect):
+        tile_rect = self.pixel_to_tile_rect(rect).inflate(self.nav_graph.margin[0] * 2, self.nav_graph.margin[1] * 2)
+        self.nav_graph.build(tile_rect)
+
+        def is_affected(path: Path) -> bool:
+            return any(tile_rect.collidepoint(step.tile) for step in path)
+
+        for key in [key for key, path in self.cache.items() if is_affected(path)]:
+            del self.cache[key]
+        for entity in [entity for entity, path in self.paths.items() if is_affected(path)]:
+            del self.paths[entity]
+
+        # New tiles could connect what couldn't be reached before
+        self.failed.clear()
+
+    def search(
+        self, start: Node, goals: set[Node], max_expansions: int, heuristic_goal: Optional[Node] = None
+    ) -> Optional[Path]:
+        """
+        Searches for the cheapest path from a node to any of the goal nodes
+
+        Args:
+            start: The start node
+            goals: The goal nodes
+            max_expansions: Max number of nodes to expand before giving up
+            heuristic_goal: Node the A* heuristic estimates the distance to. None runs Dijkstra
+
+        Returns:
+            The path, or None if no goal could be reached
+        """
+
+        def heuristic(node: Node) -> float:
+            if heuristic_goal is None:
+                return 0
+            return math.dist(node, heuristic_goal)
+
+        open_heap = [(heuristic(start), next(self._counter), start)]
+        costs = {start: 0.0}
+        came_from: dict[Node, tuple[Optional[Node], str]] = {start: (None, "start")}
+        closed = set()
+
+        while open_heap and len(closed) < max_expansions:
+            _, _, node = heapq.heappop(open_heap)
+            if node in closed:
+                continue
+            if node in goals:
+                path = []
+                while node is not None:
+                    prev_node, move = came_from[node]
+                    path.append(PathStep(node, move))
+                    node = prev_node
+                return path[::-1]
+
+            closed.add(node)
+            for next_node, cost, move in self.nav_graph.edges.get(node, ()):
+                next_cost = costs[node] + cost
+                if next_cost < costs.get(next_node, math.inf):
+                    costs[next_node] = next_cost
+                    came_from[next_node] = (node, move)
+                    heapq.heappush(open_heap, (next_cost + heuristic(next_node), next(self._counter), next_node))
+
+        return None
+
+    def _splice(self, path: Path, start: Node, goal: Node) -> Optional[Path]:
+        """Reuses a cached path between the same regions, with short searches to and from its ends"""
+
+        tiles = [step.tile for step in path]
+        if start in tiles:
+            path = path[tiles.index(start) :]
+        else:
+            start_region = self.get_cache_region(start)
+            entrances = {tile for tile in tiles if self.get_cache_region(tile) == start_region}
+            head = self.search(start, entrances, self.splice_expansions)
+            if head is None:
+                return None
+            path = head + path[tiles.index(head[-1].tile) + 1 :]
+
+        tiles = [step.tile for step in path]
+        if goal in tiles:
+            return path[: tiles.index(goal) + 1]
+
+        tail = self.search(path[-1].tile, {goal}, self.splice_expansions, goal)
+        if tail is None:
+            return None
+        return path + tail[1:]
+
+    def find_path(self, start: Node, goal: Node) -> Optional[Path]:
+        """
+        Finds a path between two nodes right away (ignoring the per-frame budget)
+
+        Args:
+            start: The start node
+            goal: The goal node
+
+        Returns:
+            The path, or None if the goal can't be reached
+        """
+
+        key = (self.get_cache_region(start), self.get_cache_region(goal))
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            path = self._splice(self.cache[key], start, goal)
+            if path is not None:
+                return path
+
+        path = self.search(start, {goal}, self.max_expansions, goal)
+        if path is not None:
+            self.cache[key] = path
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+        return path
+
+    def get_path(self, entity: Entity, rect: pygame.Rect, goal_rect: pygame.Rect) -> Optional[Path]:
+        """
+        Gets an entity's path to a goal. If its last path doesn't fit anymore, a new query is queued,
+        and the last path (if any) is returned until the query is answered
+
+        Args:
+            entity: The entity ID
+            rect: The entity's rect
+            goal_rect: The rect of the goal
+
+        Returns:
+            The path, or None if there isn't one (yet)
+        """
+
+        path = self.paths.get(entity)
+
+        start = self.nav_graph.nearest_node(self.get_feet_tile(rect))
+        goal = self.nav_graph.nearest_node(self.get_feet_tile(goal_rect))
+        if start is None or goal is None:
+            # Mid-jump or fall, so the last path is still the best guess
+            return path
+
+        if path is not None and path[-1].tile == goal and any(step.tile == start for step in path):
+            return path
+        if self.failed.get(entity) != (start, goal):
+            self.requests[entity] = (start, goal)
+
+        return path
+
+    def update(self):
+        """Answers queued queries, up to the per-frame budget"""
+
+        for _ in range(min(self.queries_per_frame, len(self.requests))):
+            entity = next(iter(self.requests))
+            start, goal = self.requests.pop(entity)
+
+            if not self.level.world.entity_exists(entity):
+                self.paths.pop(entity, None)
+                self.failed.pop(entity, None)
+                continue
+
+            path = self.find_path(start, goal)
+            if path is None:
+                self.paths.pop(entity, None)
+                self.failed[entity] = (start, goal)
+            else:
+                self.paths[entity] = path
+                self.failed.pop(entity, None)
+
+
+class FlowField:
+    MOVES = ("start", "walk", "jump", "drop")
+
+    def __init__(self, level_state: LevelState, target: Entity):
+        """
+        A flow field toward an entity: every tile of the navigation graph stores the next tile toward it.
+        It's only recomputed (with Dijkstra, from the target outwards) when the target crosses a tile boundary,
+        so any number of mobs can follow the target for the cost of one array lookup each
+
+        Args:
+            level_state: The level state
+            target: The entity the flow field leads to
+        """
+
+        self.level = level_state
+        self.nav_graph = self.level.pathfinder.nav_graph
+        self.target = target
+        self.max_cost = self.level.settings["pathfinding/flow_field_max_cost"]
+
+        grid_shape = self.level.tilemap.collision_grid.shape
+        self.costs = np.full(grid_shape, np.inf, dtype=np.float32)
+        self.next_tiles = np.zeros((*grid_shape, 2), dtype=np.int32)
+        self.moves = np.zeros(grid_shape, dtype=np.uint8)  # Indices into MOVES
+
+        self.target_node: Optional[Node] = None
+        self.graph_version = -1
+
+        # Tiles with a finite cost, so the next recompute only has to reset those
+        self._reached: list[Node] = []
+
+        self._reverse_edges: dict[Node, list[tuple[Node, float, str]]] = {}
+
+    def _build_reverse_edges(self):
+        self._reverse_edges.clear()
+        for node, edges in self.nav_graph.edges.items():
+            for next_node, cost, move in edges:
+                self._reverse_edges.setdefault(next_node, []).append((node, cost, move))
+
+    def recompute(self, target_node: Node):
+        """
+        Recomputes the flow field toward a node, up to the max cost
+
+        Args:
+            target_node: The node of the target
+        """
+
+        if self.graph_version != self.nav_graph.version:
+            self._build_reverse_edges()
+            self.graph_version = self.nav_graph.version
+
+        if self._reached:
+            reached = np.array(self._reached)
+            self.costs[reached[:, 0], reached[:, 1]] = np.inf
+        self._reached = [target_node]
+
+        self.target_node = target_node
+        self.costs[target_node] = 0
+        self.moves[target_node] = 0
+
+        open_heap = [(0.0, target_node)]
+        while open_heap:
+            cost, node = heapq.heappop(open_heap)
+            if cost > self.costs[node]:
+                continue
+
+            for prev_node, edge_cost, move in self._reverse_edges.get(node, ()):
+                prev_cost = cost + edge_cost
+                if prev_cost <= self.max_cost and prev_cost < self.costs[prev_node]:
+                    if self.costs[prev_node] == np.inf:
+                        self._reached.append(prev_node)
+                    self.costs[prev_node] = prev_cost
+                    self.next_tiles[prev_node] = node
+                    self.moves[prev_node] = self.MOVES.index(move)
+                    heapq.heappush(open_heap, (prev_cost, prev_node))
+
+    def update(self):
+        """Recomputes the flow field if the target moved to another tile, or the navigation graph changed"""
+
+        if not self.level.world.entity_exists(self.target):
+            return
+
+        target_rect = self.level.world.component_for_entity(self.target, Position).rect
+        target_node = self.nav_graph.nearest_node(Pathfinder.get_feet_tile(target_rect))
+        if target_node is None:
+            # Too high up, so it's not clear where it'll land yet
+            return
+
+        if target_node != self.target_node or self.graph_version != self.nav_graph.version:
+            self.recompute(target_node)
+
+    def get_path(self, rect: pygame.Rect) -> Optional[Path]:
+        """
+        Gets the next step toward the target from where a mob is
+
+        Args:
+            rect: The mob's rect
+
+        Returns:
+            A path of the mob's current step and its next step (only the current step if it's at the target),
+            or None if the target can't be reached from there
+        """
+
+        node = self.nav_graph.nearest_node(Pathfinder.get_feet_tile(rect))
+        if node is None or self.costs[node] == np.inf:
+            return None
+
+        if node == self.target_node:
+            return [PathStep(node, "start")]
+
+        next_x, next_y = self.next_tiles[node]
+        return [PathStep(node, "start"), PathStep((int(next_x), int(next_y)), self.MOVES[self.moves[node]])]
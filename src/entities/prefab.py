@@ -0,0 +1,199 @@
+"""
+This file is a part of the source code for rpg-tile-game
+This project has been licensed under the MIT license.
+Copyright (c) 2022-present SSS-Says-Snek
+
+This file contains prefabs, which are mob templates declared in `settings/prefabs.json`. Each prefab is compiled once
+per level: its animations are loaded, its settings are looked up, and components nothing changes are created once and
+shared by every mob spawned from it
+"""
+from __future__ import annotations
+
+import copy
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Optional
+
+from src import pygame, utils
+from src.entities.components import ai_component, item_component
+from src.entities.components.component import (Graphics, Health, Inventory,
+                                               Movement, NoCollidePlayer,
+                                               Position)
+from src.schema import MobSettings, PrefabSettings, SettingsError
+from src.types import Entity
+
+if TYPE_CHECKING:
+    from src.states.level_state import LevelState
+
+
+def create_melee_attack(prefab: Prefab) -> ai_component.MeleeAttack:
+    mob_settings = prefab.mob_settings
+    return ai_component.MeleeAttack(
+        attack_range=mob_settings.attack_range if mob_settings.attack_range is not None else 0,
+        attack_cooldown=mob_settings.attack_cooldown,
+        damage=mob_settings.attack_damage,
+        collision=mob_settings.attack_collision,
+    )
+
+
+def create_follows_player(prefab: Prefab) -> ai_component.FollowsEntityClose:
+    return ai_component.FollowsEntityClose(
+        entity=prefab.level.player,
+        follow_range=prefab.mob_settings.follow_range,
+        jump_vel=prefab.mob_settings.jump_vel,
+    )
+
+
+def create_entity_state(prefab: Prefab) -> ai_component.EntityState:
+    speed = prefab.mob_settings.speed
+    mob_confs = prefab.level.records["mobs/conf"]
+    return ai_component.EntityState(
+        available_states=[
+            ai_component.EntityState.Patrol(patrol_speed=speed * mob_confs.patrol_speed_factor),
+            ai_component.EntityState.Flee(
+                flee_speed=speed * mob_confs.flee_speed_factor,
+                flee_time=mob_confs.flee_time,
+            ),
+            ai_component.EntityState.Follow(),
+        ],
+        starting_state=ai_component.EntityState.Patrol,
+    )
+
+
+# Components every mob of a prefab shares, since nothing changes them after they're created
+SHARED_COMPONENTS: dict[str, Callable[[Prefab], Any]] = {
+    "no_collide_player": lambda prefab: NoCollidePlayer(),
+    "patroller": lambda prefab: ai_component.Patroller(),
+    "melee_weapon_attack": lambda prefab: ai_component.MeleeWeaponAttack(
+        attack_range=prefab.mob_settings.attack_range
+    ),
+}
+
+# Components every mob gets its own of
+INSTANCE_COMPONENTS: dict[str, Callable[[Prefab], Any]] = {
+    "melee_attack": create_melee_attack,
+    "follows_player": create_follows_player,
+    "entity_state": create_entity_state,
+}
+
+
+class Prefab:
+    def __init__(self, level_state: LevelState, name: str, prefab_settings: PrefabSettings):
+        """
+        A mob template, compiled from its settings
+
+        Args:
+            level_state: The level state
+            name: Name of the prefab, e.g "walker"
+            prefab_settings: The prefab's settings
+
+        Raises:
+            SettingsError: If the prefab's mob or any of its components don't exist
+        """
+
+        self.level = level_state
+        self.name = name
+        self.spawn_name = prefab_settings.spawn
+
+        self.mob_key = prefab_settings.mob
+        if self.mob_key not in self.level.records:
+            raise SettingsError(f'Prefab "{name}" has an unknown mob "{self.mob_key}"')
+        self.mob_settings: MobSettings = self.level.records[self.mob_key]
+
+        # Loaded once. Every mob gets copies, which share the frames
+        self.animations, self.animation_speeds = utils.load_mob_animations(
+            self.mob_settings, prefab_settings.frame_size
+        )
+        self.size = utils.get_size(self.animations)
+
+        self.shared_components = []
+        self.instance_components: list[Callable[[Prefab], Any]] = []
+        for component_name in prefab_settings.components:
+            if component_name in SHARED_COMPONENTS:
+                self.shared_components.append(SHARED_COMPONENTS[component_name](self))
+            elif component_name in INSTANCE_COMPONENTS:
+                self.instance_components.append(INSTANCE_COMPONENTS[component_name])
+            else:
+                raise SettingsError(f'Prefab "{name}" has an unknown component "{component_name}"')
+
+        self.weapon_name = prefab_settings.weapon_name
+        self.weapon_graphics: Optional[item_component.ItemGraphics] = None
+        if prefab_settings.weapon_sprite is not None:
+            if self.weapon_name is None:
+                raise SettingsError(f'Prefab "{name}" has a weapon sprite, but no weapon name')
+
+            weapon_surf = self.level.imgs[prefab_settings.weapon_sprite]
+            # Copied for every weapon, so the icon is only scaled once
+            self.weapon_graphics = item_component.ItemGraphics(
+                sprite=weapon_surf, asset_keys=(prefab_settings.weapon_sprite, None, None)
+            )
+            self.weapon_size = utils.get_size(weapon_surf)
+
+    def create_components(self, pos: pygame.Vector2) -> list[Any]:
+        """Creates the components of a mob spawned at `pos` (without its weapon)"""
+
+        mob_settings = self.mob_settings
+        components = [
+            Graphics(
+                animations={animation_type: animation.copy() for animation_type, animation in self.animations.items()},
+                animation_speeds=self.animation_speeds,
+                asset_key=self.mob_key,
+            ),
+            Position(pos=pos.copy(), rect_size=self.size),
+            Health(hp=mob_settings.hp, max_hp=mob_settings.max_hp),
+            Movement(speed=mob_settings.speed),
+            *self.shared_components,
+            *(create_component(self) for create_component in self.instance_components),
+        ]
+        if self.weapon_graphics is not None:
+            components.append(Inventory(size=1))
+        return components
+
+    def create_weapon_components(self, owner: Entity, pos: pygame.Vector2) -> list[Any]:
+        """Creates the components of the sword held by a mob"""
+
+        return [
+            item_component.Item(name=self.weapon_name, cooldown=self.mob_settings.attack_cooldown, owner=owner),
+            copy.copy(self.weapon_graphics),
+            item_component.ItemPosition(pos=pos.copy(), rect_size=self.weapon_size, in_inventory=True),
+            item_component.MeleeWeapon(attack_damage=self.mob_settings.attack_damage),
+            item_component.SlashingSword(),
+        ]
+
+    def spawn(self, pos: pygame.Vector2) -> Entity:
+        """
+        Spawns a mob from the prefab
+
+        Args:
+            pos: Where the mob spawns
+
+        Returns:
+            The entity ID
+        """
+
+        return self.spawn_many([pos])[0]
+
+    def spawn_many(self, positions: Iterable[pygame.Vector2]) -> list[Entity]:
+        """
+        Spawns a mob from the prefab at every position, e.g for a wave. Every component is created first, then the
+        mobs (and then their weapons) are added to the world in one go
+
+        Args:
+            positions: Where the mobs spawn
+
+        Returns:
+            The entity IDs
+        """
+
+        positions = list(positions)
+        world = self.level.world
+
+        mobs_components = [self.create_components(pos) for pos in positions]
+        entities = [world.create_entity(*components) for components in mobs_components]
+        if self.weapon_graphics is None:
+            return entities
+
+        weapons_components = [self.create_weapon_components(entity, pos) for entity, pos in zip(entities, positions)]
+        weapons = [world.create_entity(*components) for components in weapons_components]
+        for mob_components, weapon in zip(mobs_components, weapons):
+            inventory: Inventory = mob_components[-1]
+            inventory[0] = weapon
+        return entities
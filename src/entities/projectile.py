@@ -0,0 +1,308 @@
+"""
+This file is a part of the source code for rpg-tile-game
+This project has been licensed under the MIT license.
+Copyright (c) 2022-present SSS-Says-Snek
+
+This file contains the projectile manager, which stores every projectile in NumPy arrays.
+Like particles, projectiles are NOT ECS entities, so thousands of them can be moved in one vectorized pass.
+Slots of dead projectiles are recycled by new ones, so sustained fire doesn't allocate anything per shot.
+"""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from src import common, core, pygame
+from src.common import TILE_HEIGHT, TILE_WIDTH
+
+if TYPE_CHECKING:
+    from src.states.level_state import LevelState
+
+
+class ProjectileManager:
+    def __init__(self, level_state: LevelState, capacity: int = 256):
+        """
+        A manager for all projectiles, with each attribute stored in its own array
+
+        Formulas (relative to the spawn position):
+            x = vtcos(theta)
+            y = vtsin(theta) + gt^2/2
+
+        Args:
+            level_state: The level state
+            capacity: Number of projectiles to allocate room for. Arrays double in size when full
+
+        Dead projectiles keep their slots until they're recycled: Every array is used up to `num_slots`, and
+        `alive` tells which slots hold a projectile
+        """
+
+        self.level = level_state
+        self.camera = self.level.camera
+        self.tilemap = self.level.tilemap
+
+        self.capacity = capacity
+        self.num_slots = 0
+
+        # Slots of dead projectiles, reused lowest first (the top of the stack) so projectiles stay packed
+        self.free_slots = np.zeros(capacity, dtype=np.int64)
+        self.num_free = 0
+
+        # Spawn data
+        self.spawn_pos = np.zeros((capacity, 2))
+        self.initial_angle = np.zeros(capacity)
+        self.vel = np.zeros(capacity)
+        self.gravity = np.zeros(capacity)
+        self.damage = np.zeros(capacity)
+        self.shot_by = np.full(capacity, -1, dtype=np.int64)
+        self.sprite_idx = np.zeros(capacity, dtype=np.int64)
+        self.size = np.zeros((capacity, 2))
+        self.t = np.zeros(capacity)
+
+        # Recomputed every update
+        self.pos = np.zeros((capacity, 2))
+        self.angle = np.zeros(capacity)
+        self.alive = np.zeros(capacity, dtype=bool)
+
+        # Sprites are shared between projectiles, and rotated sprites are cached per whole degree
+        self.sprites: list[pygame.Surface] = []
+        self.sprite_sizes: list[tuple[int, int]] = []
+        self._sprite_to_idx: dict[pygame.Surface, int] = {}
+        self._rotated_sprites: dict[tuple[int, int], pygame.Surface] = {}
+
+    def __len__(self) -> int:
+        return int(self.alive[: self.num_slots].sum())
+
+    def _grow(self):
+        """Doubles the capacity of every array"""
+
+        self.capacity *= 2
+        for attr in (
+            "spawn_pos",
+            "initial_angle",
+            "vel",
+            "gravity",
+            "damage",
+            "shot_by",
+            "sprite_idx",
+            "size",
+            "t",
+            "pos",
+            "angle",
+            "alive",
+            "free_slots",
+        ):
+            old_arr = getattr(self, attr)
+            new_arr = np.zeros((self.capacity, *old_arr.shape[1:]), dtype=old_arr.dtype)
+            new_arr[: self.num_slots] = old_arr[: self.num_slots]
+            setattr(self, attr, new_arr)
+
+    def reserve(self, capacity: int):
+        """Grows the arrays until they have room for `capacity` projectiles"""
+
+        while self.capacity < capacity:
+            self._grow()
+
+    def get_sprite_idx(self, sprite: pygame.Surface) -> int:
+        if sprite not in self._sprite_to_idx:
+            self._sprite_to_idx[sprite] = len(self.sprites)
+            self.sprites.append(sprite)
+            self.sprite_sizes.append(sprite.get_bounding_rect().size)
+        return self._sprite_to_idx[sprite]
+
+    def spawn(
+        self,
+        pos: pygame.Vector2,
+        vel: float,
+        angle: float,
+        damage: float,
+        sprite: pygame.Surface,
+        shot_by: int = -1,
+        gravity: float = 0.5,
+    ) -> int:
+        """
+        Spawns a projectile, in the slot of a dead one if there is any. Every attribute of the slot is reset
+
+        Args:
+            pos: Spawn position
+            vel: Initial speed
+            angle: Initial angle, in radians
+            damage: Damage dealt to whatever the projectile hits
+            sprite: Sprite of the projectile, facing right
+            shot_by: Entity that shot the projectile, which can't be hit by it. Defaults to -1 (nobody)
+            gravity: Gravity acceleration
+
+        Returns:
+            Index of the projectile (valid until it dies)
+        """
+
+        if self.num_free:
+            self.num_free -= 1
+            idx = int(self.free_slots[self.num_free])
+        else:
+            if self.num_slots == self.capacity:
+                self._grow()
+            idx = self.num_slots
+            self.num_slots += 1
+
+        sprite_idx = self.get_sprite_idx(sprite)
+
+        self.spawn_pos[idx] = pos.x, pos.y
+        self.pos[idx] = pos.x, pos.y
+        self.initial_angle[idx] = angle
+        self.vel[idx] = vel
+        self.gravity[idx] = gravity
+        self.damage[idx] = damage
+        self.shot_by[idx] = shot_by
+        self.sprite_idx[idx] = sprite_idx
+        self.size[idx] = self.sprite_sizes[sprite_idx]
+        self.t[idx] = 0
+        self.angle[idx] = 0
+        self.alive[idx] = True
+
+        return idx
+
+    def update(self):
+        """Moves every projectile and updates their angles"""
+
+        n = self.num_slots
+        if n == 0:
+            return
+
+        t = self.t[:n]
+        t += core.dt.dt
+
+        cos_theta = np.cos(self.initial_angle[:n])
+        sin_theta = np.sin(self.initial_angle[:n])
+        vel = self.vel[:n]
+        gravity = self.gravity[:n]
+
+        pos = self.pos[:n]
+        pos[:, 0] = self.spawn_pos[:n, 0] + cos_theta * vel * t
+        pos[:, 1] = self.spawn_pos[:n, 1] + sin_theta * vel * t + gravity * t**2 / 2
+
+        # Direction travelled over the last (base) frame, used to rotate the sprite
+        move_angle = 180 + np.degrees(np.arctan2(sin_theta * vel + gravity * (t - 0.5), cos_theta * vel))
+        self.angle[:n] = np.where(cos_theta > 0, 180 - move_angle, -move_angle)
+
+    def _collides_with_tiles(self, pos: np.ndarray, size: np.ndarray) -> np.ndarray:
+        """Checks every cell each projectile rect overlaps against the tilemap's collision grid"""
+
+        collision_grid = self.tilemap.collision_grid
+        grid_width, grid_height = collision_grid.shape
+
+        min_cell = np.floor_divide(pos, (TILE_WIDTH, TILE_HEIGHT)).astype(np.int64)
+        max_cell = (np.ceil((pos + size) / (TILE_WIDTH, TILE_HEIGHT)) - 1).astype(np.int64)
+        max_span = (max_cell - min_cell).max(axis=0) + 1
+
+        collided = np.zeros(len(pos), dtype=bool)
+        for x_offset in range(max_span[0]):
+            cell_x = np.minimum(min_cell[:, 0] + x_offset, max_cell[:, 0])
+            for y_offset in range(max_span[1]):
+                cell_y = np.minimum(min_cell[:, 1] + y_offset, max_cell[:, 1])
+
+                in_grid = (cell_x >= 0) & (cell_x < grid_width) & (cell_y >= 0) & (cell_y < grid_height)
+                collided[in_grid] |= collision_grid[cell_x[in_grid], cell_y[in_grid]]
+
+        return collided
+
+    def collide(self, entity: int, rect: pygame.Rect) -> float:
+        """
+        Collides every alive projectile with an entity's rect. Projectiles that hit are killed
+
+        Args:
+            entity: The entity ID (projectiles shot by it are ignored)
+            rect: The entity's rect
+
+        Returns:
+            Total damage dealt to the entity
+        """
+
+        n = self.num_slots
+        if n == 0:
+            return 0
+
+        pos = self.pos[:n]
+        size = self.size[:n]
+        alive = self.alive[:n]
+
+        hit = (
+            alive
+            & (self.shot_by[:n] != entity)
+            & (pos[:, 0] < rect.right)
+            & (pos[:, 0] + size[:, 0] > rect.left)
+            & (pos[:, 1] < rect.bottom)
+            & (pos[:, 1] + size[:, 1] > rect.top)
+        )
+        if not hit.any():
+            return 0
+
+        alive &= ~hit
+        return float(self.damage[:n][hit].sum())
+
+    def visible(self) -> np.ndarray:
+        """Returns the indices of alive projectiles within the camera viewport"""
+
+        n = self.num_slots
+        pos = self.pos[:n]
+        size = self.size[:n]
+        camera_rect = self.camera.camera
+
+        return np.flatnonzero(
+            self.alive[:n]
+            & (pos[:, 0] < camera_rect.right)
+            & (pos[:, 0] + size[:, 0] > camera_rect.left)
+            & (pos[:, 1] < camera_rect.bottom)
+            & (pos[:, 1] + size[:, 1] > camera_rect.top)
+        )
+
+    def cull(self):
+        """Kills projectiles out of bounds or inside unwalkable tiles, then frees the slots of dead ones"""
+
+        n = self.num_slots
+        if n == 0:
+            return
+
+        pos = self.pos[:n]
+        alive = self.alive[:n]
+        alive &= (pos[:, 1] <= self.tilemap.height) & (pos[:, 0] >= 0) & (pos[:, 0] <= self.tilemap.width)
+        alive &= ~self._collides_with_tiles(pos, self.size[:n])
+
+        num_alive = int(alive.sum())
+        if num_alive + self.num_free == n:
+            # Nothing died since the last cull
+            return
+
+        # Dead slots at the end are given up, so passes over the arrays don't include them
+        if num_alive == 0:
+            n = 0
+        else:
+            n -= int(alive[::-1].argmax())
+
+        dead = np.flatnonzero(~alive[:n])
+        self.free_slots[: len(dead)] = dead[::-1]
+        self.num_free = len(dead)
+        self.num_slots = n
+
+    def clear(self):
+        """Removes every projectile"""
+
+        self.alive[: self.num_slots] = False
+        self.num_slots = 0
+        self.num_free = 0
+
+    def get_rotated_sprite(self, sprite_idx: int, angle: float) -> pygame.Surface:
+        key = (int(sprite_idx), round(float(angle)) % 360)
+        if key not in self._rotated_sprites:
+            self._rotated_sprites[key] = pygame.transform.rotate(self.sprites[sprite_idx], key[1])
+        return self._rotated_sprites[key]
+
+    def draw(self):
+        """Draws all visible projectiles"""
+
+        visible = self.visible()
+        draw_positions = self.camera.apply_many(self.pos[visible])
+
+        for idx, draw_pos in zip(visible, draw_positions.tolist()):
+            sprite = self.get_rotated_sprite(self.sprite_idx[idx], self.angle[idx])
+            core.dirty_rects.mark(common.screen.blit(sprite, draw_pos))
@@ -0,0 +1,1188 @@
+"""
+This file is a part of the source code for rpg-tile-game
+This project has been licensed under the MIT license.
+Copyright (c) 2022-present SSS-Says-Snek
+
+This file contains world snapshots, which save the entities, components, effects and projectiles of a level (as well
+as the game time) in a compact binary format, and load them back
+
+A snapshot is a header followed by tables. Each table is a NumPy structured array with one row per component (or
+effect, or projectile), stored as raw bytes. Strings (e.g item names and asset keys) are stored once in a string
+table and referred to by index, and surfaces are stored as the keys of the assets they were loaded from
+"""
+from __future__ import annotations
+
+import copy
+import math
+import struct
+from typing import TYPE_CHECKING, Any, Iterable, Optional
+
+import numpy as np
+import pytmx
+
+from src import core, pygame, utils
+from src.entities import effect
+from src.entities.components import ai_component, item_component
+from src.entities.components.component import (Controls, Graphics, Health,
+                                               Inventory, Movement,
+                                               NoCollidePlayer, Position)
+from src.streamed_tilemap import StreamedTileMap
+from src.types import Entity, TupSize
+
+if TYPE_CHECKING:
+    from src.states.level_state import LevelState
+
+SNAPSHOT_MAGIC = b"RTGSNAP\0"
+SNAPSHOT_VERSION = 1
+
+# Magic, version, game time and player entity
+HEADER = struct.Struct("<8sHdq")
+# Name length, number of rows and number of bytes of a table
+TABLE_HEADER = struct.Struct("<HII")
+
+ENTITY_DTYPE = np.dtype([("entity", "<i8")])
+EFFECT_DTYPE = np.dtype(
+    [
+        ("type", "<i4"),
+        ("entity", "<i8"),
+        ("hp_change", "<f8"),
+        ("interval", "<f8"),
+        ("next_tick", "<f8"),
+        ("end_time", "<f8"),
+    ]
+)
+STREAMED_OBJECT_DTYPE = np.dtype([("map_idx", "<i4"), ("obj_id", "<i8"), ("entity", "<i8")])
+PROJECTILE_DTYPE = np.dtype(
+    [
+        ("spawn_x", "<f8"),
+        ("spawn_y", "<f8"),
+        ("initial_angle", "<f8"),
+        ("vel", "<f8"),
+        ("gravity", "<f8"),
+        ("damage", "<f8"),
+        ("shot_by", "<i8"),
+        ("sprite", "<i4"),
+        ("t", "<f8"),
+        ("x", "<f8"),
+        ("y", "<f8"),
+        ("angle", "<f8"),
+    ]
+)
+
+
+class StringTable:
+    def __init__(self, strings: Iterable[str] = ()):
+        """
+        The strings of a snapshot, which tables refer to by index
+
+        Args:
+            strings: Strings already in the table
+        """
+
+        self.strings = list(strings)
+        self.idxs = {string: idx for idx, string in enumerate(self.strings)}
+
+    def add(self, string: Optional[str]) -> int:
+        """
+        Adds a string, unless it's in the table already
+
+        Args:
+            string: The string
+
+        Returns:
+            Index of the string, or -1 for None
+        """
+
+        if string is None:
+            return -1
+
+        idx = self.idxs.get(string)
+        if idx is None:
+            idx = self.idxs[string] = len(self.strings)
+            self.strings.append(string)
+        return idx
+
+    def get(self, idx: int) -> Optional[str]:
+        return None if idx < 0 else self.strings[idx]
+
+    def to_bytes(self) -> bytes:
+        return "\0".join(self.strings).encode()
+
+    @classmethod
+    def from_bytes(cls, data: bytes, num_strings: int) -> StringTable:
+        return cls(data.decode().split("\0") if num_strings > 0 else ())
+
+
+def pack_snapshot(tables: list[tuple[str, np.ndarray]], strings: StringTable, time: float, player: Entity) -> bytes:
+    """
+    Packs tables into a snapshot
+
+    Args:
+        tables: The name and rows of each table
+        strings: The strings the tables refer to
+        time: The game time
+        player: The player entity
+
+    Returns:
+        The snapshot
+    """
+
+    chunks = [HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, time, player)]
+    for name, num_rows, data in (
+        *((name, len(arr), arr.tobytes()) for name, arr in tables),
+        ("strings", len(strings.strings), strings.to_bytes()),
+    ):
+        encoded_name = name.encode()
+        chunks.append(TABLE_HEADER.pack(len(encoded_name), num_rows, len(data)))
+        chunks.append(encoded_name)
+        chunks.append(data)
+
+    return b"".join(chunks)
+
+
+def unpack_snapshot(data: bytes) -> tuple[float, Entity, dict[str, tuple[int, memoryview]]]:
+    """
+    Splits a snapshot into its tables
+
+    Args:
+        data: The snapshot
+
+    Returns:
+        The game time, the player entity, and the number of rows and bytes of each table
+
+    Raises:
+        ValueError: If the data isn't a snapshot of this version
+    """
+
+    data = memoryview(data)
+    if len(data) < HEADER.size:
+        raise ValueError("Not a snapshot")
+    magic, version, time, player = HEADER.unpack_from(data)
+    if magic != SNAPSHOT_MAGIC:
+        raise ValueError("Not a snapshot")
+    if version != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot version {version} (expected {SNAPSHOT_VERSION})")
+
+    tables: dict[str, tuple[int, memoryview]] = {}
+    offset = HEADER.size
+    while offset < len(data):
+        name_length, num_rows, num_bytes = TABLE_HEADER.unpack_from(data, offset)
+        offset += TABLE_HEADER.size
+        name = bytes(data[offset : offset + name_length]).decode()
+        offset += name_length
+        tables[name] = num_rows, data[offset : offset + num_bytes]
+        offset += num_bytes
+
+    return time, player, tables
+
+
+class SnapshotWriter:
+    def __init__(self, level_state: LevelState, strings: Optional[StringTable] = None):
+        """
+        Collects the tables of a snapshot being saved
+
+        Args:
+            level_state: The level state
+            strings: A string table to add to, so indices stay the same between snapshots. Defaults to a new one
+        """
+
+        self.level = level_state
+
+        self.strings = strings if strings is not None else StringTable()
+        self.tables: list[tuple[str, np.ndarray]] = []
+
+        # Inventories are variable size, so their slots go in a table of their own
+        self.inventory_slots: list[Entity] = []
+
+        self.image_keys: Optional[dict[pygame.Surface, str]] = None
+
+    def get_image_key(self, img: pygame.Surface) -> str:
+        """
+        Gets the key of a loaded image
+
+        Args:
+            img: The image, as loaded (not a copy or transformed version of it)
+
+        Returns:
+            The key of the image
+        """
+
+        if self.image_keys is None:
+            self.image_keys = {loaded_img: key for key, loaded_img in self.level.imgs.items()}
+
+        key = self.image_keys.get(img)
+        if key is None:
+            raise ValueError("Only images loaded by the game can be saved")
+        return key
+
+    def add_table(self, name: str, arr: np.ndarray):
+        self.tables.append((name, arr))
+
+    def to_bytes(self, player: Entity) -> bytes:
+        return pack_snapshot(self.tables, self.strings, core.time.get_ticks(), player)
+
+
+class SnapshotReader:
+    def __init__(self, level_state: LevelState, data: bytes):
+        """
+        Splits a snapshot being loaded into its tables, and rebuilds what the tables refer to
+
+        Args:
+            level_state: The level state
+            data: The snapshot
+        """
+
+        self.level = level_state
+
+        self.time, self.player, self.tables = unpack_snapshot(data)
+
+        num_strings, strings_data = self.tables.get("strings", (0, memoryview(b"")))
+        self.strings = StringTable.from_bytes(bytes(strings_data), num_strings)
+
+        # Saved entity IDs (sorted) and the entities they were loaded as
+        self.saved_entities = np.empty(0, dtype=np.int64)
+        self.loaded_entities = np.empty(0, dtype=np.int64)
+
+        self.inventory_slots: list[Entity] = []
+
+        # Components holding surfaces are made once per asset, then copied
+        self.graphics: dict[tuple[str, bool, TupSize], Graphics] = {}
+        self.item_graphics: dict[tuple[tuple[Optional[str], ...], TupSize, bool], item_component.ItemGraphics] = {}
+
+    def get_table(self, name: str, dtype: np.dtype) -> np.ndarray:
+        """
+        Gets a table of the snapshot
+
+        Args:
+            name: Name of the table
+            dtype: The structured dtype of the table
+
+        Returns:
+            A (writable) copy of the table, which is empty if the snapshot doesn't have it
+        """
+
+        if name not in self.tables:
+            return np.empty(0, dtype=dtype)
+
+        num_rows, data = self.tables[name]
+        return np.frombuffer(data, dtype=dtype, count=num_rows).copy()
+
+    def remap(self, entities: np.ndarray) -> np.ndarray:
+        """
+        Maps saved entity IDs to the IDs they were loaded as
+
+        Args:
+            entities: The saved entity IDs
+
+        Returns:
+            The loaded entity IDs, with -1 for entities that weren't saved
+        """
+
+        if len(self.saved_entities) == 0:
+            return np.full(len(entities), -1, dtype=np.int64)
+
+        idxs = np.minimum(np.searchsorted(self.saved_entities, entities), len(self.saved_entities) - 1)
+        return np.where(self.saved_entities[idxs] == entities, self.loaded_entities[idxs], -1)
+
+    def get_graphics(self, key: str, animated: bool, frame_size: TupSize) -> Graphics:
+        cache_key = (key, animated, frame_size)
+        if cache_key not in self.graphics:
+            if animated:
+                animations, animation_speeds = utils.load_mob_animations(self.level.records[key], frame_size)
+                self.graphics[cache_key] = Graphics(
+                    animations=animations, animation_speeds=animation_speeds, asset_key=key
+                )
+            else:
+                self.graphics[cache_key] = Graphics(sprite=self.level.imgs[key], asset_key=key)
+
+        # Surfaces are shared, but every entity plays its own animations
+        graphics = copy.copy(self.graphics[cache_key])
+        if graphics.animations is not None:
+            graphics.animations = {name: copy.copy(anim) for name, anim in graphics.animations.items()}
+        return graphics
+
+    def get_item_graphics(
+        self, keys: tuple[Optional[str], Optional[str], Optional[str]], size: TupSize, flip_on_dir: bool
+    ) -> item_component.ItemGraphics:
+        cache_key = (keys, size, flip_on_dir)
+        if cache_key not in self.item_graphics:
+            sprite_key, icon_key, world_sprite_key = keys
+
+            # Held sprites can be scaled versions of the image
+            sprite = self.level.imgs[sprite_key]
+            if sprite.get_size() != size:
+                sprite = pygame.transform.scale(sprite, size)
+
+            self.item_graphics[cache_key] = item_component.ItemGraphics(
+                sprite=sprite,
+                icon=None if icon_key is None else self.level.imgs[icon_key],
+                world_sprite=None if world_sprite_key is None else self.level.imgs[world_sprite_key],
+                flip_on_dir=flip_on_dir,
+                asset_keys=keys,
+            )
+
+        return copy.copy(self.item_graphics[cache_key])
+
+
+def restore_cooldown(cooldown: utils.Cooldown, duration: float, left: float):
+    cooldown.duration = duration
+    if left > 0:
+        cooldown.start(duration, elapsed=duration - left)
+
+
+def nan_to_none(value: float) -> Optional[float]:
+    return None if math.isnan(value) else value
+
+
+class ComponentTable:
+    # Name of the table in snapshots, which stays the same if the component is renamed
+    name = ""
+    component_type: type = object
+
+    # Name and dtype of each column, besides the entity
+    fields: list[tuple[str, str]] = []
+    # Columns holding entity IDs, which get remapped when loading
+    references: tuple[str, ...] = ()
+    # Columns holding the time left of a timer, which counts down without the component being changed
+    timers: tuple[str, ...] = ()
+
+    def __init__(self):
+        """Saves and loads one type of component, with one row per component"""
+
+        self.dtype = np.dtype([("entity", "<i8"), *self.fields])
+
+    def pack(self, component: Any, writer: SnapshotWriter) -> tuple:
+        """
+        Turns a component into a row of the table
+
+        Args:
+            component: The component
+            writer: The snapshot being saved
+
+        Returns:
+            The row, without the entity
+        """
+
+        return ()
+
+    def unpack(self, row: tuple, reader: SnapshotReader) -> Any:
+        """
+        Turns a row of the table back into a component
+
+        Args:
+            row: The row, without the entity. References are already remapped
+            reader: The snapshot being loaded
+
+        Returns:
+            The component
+        """
+
+        return self.component_type()
+
+
+class PositionTable(ComponentTable):
+    name = "position"
+    component_type = Position
+    fields = [
+        ("x", "<f8"),
+        ("y", "<f8"),
+        ("original_x", "<f8"),
+        ("original_y", "<f8"),
+        ("rect_x", "<i4"),
+        ("rect_y", "<i4"),
+        ("width", "<i4"),
+        ("height", "<i4"),
+        ("direction", "i1"),
+        ("on_ground", "?"),
+    ]
+
+    def pack(self, component: Position, writer: SnapshotWriter) -> tuple:
+        return (*component.pos, *component.original_pos, *component.rect, component.direction, component.on_ground)
+
+    def unpack(self, row: tuple, reader: SnapshotReader) -> Position:
+        x, y, original_x, original_y, rect_x, rect_y, width, height, direction, on_ground = row
+
+        pos = Position(pygame.Vector2(x, y), (width, height))
+        pos.original_pos.update(original_x, original_y)
+        pos.rect.topleft = rect_x, rect_y
+        pos.direction = direction
+        pos.on_ground = on_ground
+        return pos
+
+
+class MovementTable(ComponentTable):
+    name = "movement"
+    component_type = Movement
+    fields = [
+        ("speed", "<f8"),
+        ("vel_x", "<f8"),
+        ("vel_y", "<f8"),
+        ("acc_x", "<f8"),
+        ("acc_y", "<f8"),
+        ("gravity_acc", "<f8"),
+    ]
+
+    def pack(self, component: Movement, writer: SnapshotWriter) -> tuple:
+        return component.speed, *component.vel, *component.acc, component.gravity_acc.y
+
+    def unpack(self, row: tuple, reader: SnapshotReader) -> Movement:
+        speed, vel_x, vel_y, acc_x, acc_y, gravity_acc = row
+
+        movement = Movement(speed, pygame.Vector2(acc_x, acc_y), gravity_acc)
+        movement.vel.update(vel_x, vel_y)
+        return movement
+
+
+class HealthTable(ComponentTable):
+    name = "health"
+    component_type = Health
+    fields = [("hp", "<f8"), ("max_hp", "<f8"), ("prev_hp", "<f8")]
+
+    def pack(self, component: Health, writer: SnapshotWriter) -> tuple:
+        return component.hp, component.max_hp, component.prev_hp
+
+    def unpack(self, row: tuple, reader: SnapshotReader) -> Health:
+        hp, max_hp, prev_hp = row
+
+        health = Health(hp, max_hp)
+        health.prev_hp = prev_hp
+        return health
+
+
+class InventoryTable(ComponentTable):
+    name = "inventory"
+    component_type = Inventory
+    fields = [
+        ("size", "<i4"),
+        ("hotbar_size", "<i4"),
+        ("equipped_item_idx", "<i4"),
+        ("slots_start", "<i8"),
+        ("cooldown_duration", "<f8"),
+        ("cooldown_left", "<f8"),
+    ]
+    timers = ("cooldown_left",)
+
+    def pack(self, component: Inventory, writer: SnapshotWriter) -> tuple:
+        slots_start = len(writer.inventory_slots)
+        writer.inventory_slots.extend(-1 if item is None else item for item in component.inventory)
+
+        return (
+            component.size,
+            -1 if component.hotbar_size is None else component.hotbar_size,
+            component.equipped_item_idx,
+            slots_start,
+            component.cooldown.duration,
+            component.cooldown.remaining,
+        )
+
+    def unpack(self, row: tuple, reader: SnapshotReader) -> Inventory:
+        size, hotbar_size, equipped_item_idx, slots_start, cooldown_duration, cooldown_left = row
+
+        inventory = Inventory(size, None if hotbar_size < 0 else hotbar_size)
+        inventory.inventory = [
+            None if item < 0 else item for item in reader.inventory_slots[slots_start : slots_start + size]
+        ]
+        inventory.equipped_item_idx = equipped_item_idx
+        restore_cooldown(inventory.cooldown, cooldown_duration, cooldown_left)
+        return inventory
+
+
+class GraphicsTable(ComponentTable):
+    name = "graphics"
+    component_type = Graphics
+    fields = [("asset_key", "<i4"), ("animated", "?"), ("frame_width", "<i4"), ("frame_height", "<i4")]
+
+    def pack(self, component: Graphics, writer: SnapshotWriter) -> tuple:
+        if component.asset_key is None:
+            raise ValueError("Graphics without an asset key can't be saved")
+
+        if component.animations is not None:
+            frame_size = next(iter(component.animations.values())).sprite_size
+            return writer.strings.add(component.asset_key), True, *frame_size
+        return writer.strings.add(component.asset_key), False, 0, 0
+
+    def unpack(self, row: tuple, reader: SnapshotReader) -> Graphics:
+        asset_key, animated, frame_width, frame_height = row
+
+        return reader.get_graphics(reader.strings.get(asset_key), animated, (frame_width, frame_height))
+
+
+class NoCollidePlayerTable(ComponentTable):
+    name = "no_collide_player"
+    component_type = NoCollidePlayer
+
+
+class ControlsTable(ComponentTable):
+    # Controls only last a frame, so only which entities are controlled is saved
+    name = "controls"
+    component_type = Controls
+
+
+class ItemTable(ComponentTable):
+    name = "item"
+    component_type = item_component.Item
+    fields = [("item_name", "<i4"), ("cooldown", "<f8"), ("owner", "<i8"), ("used", "?")]
+    references = ("owner",)
+
+    def pack(self, component: item_component.Item, writer: SnapshotWriter) -> tuple:
+        owner = -1 if component.owner is None else component.owner
+        return writer.strings.add(component.name), component.cooldown, owner, component.used
+
+    def unpack(self, row: tuple, reader: SnapshotReader) -> item_component.Item:
+        item_name, cooldown, owner, used = row
+
+        item = item_component.Item(reader.strings.get(item_name), cooldown, None if owner < 0 else owner)
+        item.used = used
+        return item
+
+
+class ItemPositionTable(ComponentTable):
+    name = "item_position"
+    component_type = item_component.ItemPosition
+    fields = [("x", "<f8"), ("y", "<f8"), ("width", "<i4"), ("height", "<i4"), ("in_inventory", "?")]
+
+    def pack(self, component: item_component.ItemPosition, writer: SnapshotWriter) -> tuple:
+        return *component.pos, *component.rect.size, component.in_inventory
+
+    def unpack(self, row: tuple, reader: SnapshotReader) -> item_component.ItemPosition:
+        x, y, width, height, in_inventory = row
+
+        return item_component.ItemPosition(pygame.Vector2(x, y), (width, height), in_inventory)
+
+
+class ItemGraphicsTable(ComponentTable):
+    name = "item_graphics"
+    component_type = item_component.ItemGraphics
+    fields = [
+        ("sprite_key", "<i4"),
+        ("icon_key", "<i4"),
+        ("world_sprite_key", "<i4"),
+        ("width", "<i4"),
+        ("height", "<i4"),
+        ("flip_on_dir", "?"),
+    ]
+
+    def pack(self, component: item_component.ItemGraphics, writer: SnapshotWriter) -> tuple:
+        if component.asset_keys[0] is None:
+            raise ValueError("Item graphics without asset keys can't be saved")
+
+        return (
+            *(writer.strings.add(key) for key in component.asset_keys),
+            *component.original_img.get_size(),
+            component.flip_on_dir,
+        )
+
+    def unpack(self, row: tuple, reader: SnapshotReader) -> item_component.ItemGraphics:
+        sprite_key, icon_key, world_sprite_key, width, height, flip_on_dir = row
+
+        keys = reader.strings.get(sprite_key), reader.strings.get(icon_key), reader.strings.get(world_sprite_key)
+        return reader.get_item_graphics(keys, (width, height), flip_on_dir)
+
+
+class ConsumableTable(ComponentTable):
+    name = "consumable"
+    component_type = item_component.Consumable
+    fields = [("total_uses", "<i4"), ("uses_left", "<i4"), ("consumed", "?")]
+
+    def pack(self, component: item_component.Consumable, writer: SnapshotWriter) -> tuple:
+        return component.total_uses, component.uses_left, component.consumed
+
+    def unpack(self, row: tuple, reader: SnapshotReader) -> item_component.Consumable:
+        total_uses, uses_left, consumed = row
+
+        consumable = item_component.Consumable(total_uses)
+        consumable.uses_left = uses_left
+        consumable.consumed = consumed
+        return consumable
+
+
+class MeleeWeaponTable(ComponentTable):
+    # Weapon effects aren't saved, since no weapon has any yet
+    name = "melee_weapon"
+    component_type = item_component.MeleeWeapon
+    fields = [("attack_damage", "<f8"), ("hit", "?")]
+
+    def pack(self, component: item_component.MeleeWeapon, writer: SnapshotWriter) -> tuple:
+        return component.attack_damage, component.hit
+
+    def unpack(self, row: tuple, reader: SnapshotReader) -> item_component.MeleeWeapon:
+        attack_damage, hit = row
+
+        melee_weapon = item_component.MeleeWeapon(attack_damage)
+        melee_weapon.hit = hit
+        return melee_weapon
+
+
+class RangedWeaponTable(ComponentTable):
+    name = "ranged_weapon"
+    component_type = item_component.RangedWeapon
+    fields = [("projectile_damage", "<f8")]
+
+    def pack(self, component: item_component.RangedWeapon, writer: SnapshotWriter) -> tuple:
+        return (component.projectile_damage,)
+
+    def unpack(self, row: tuple, reader: SnapshotReader) -> item_component.RangedWeapon:
+        return item_component.RangedWeapon(*row)
+
+
+class SlashingSwordTable(ComponentTable):
+    name = "slashing_sword"
+    component_type = item_component.SlashingSword
+    fields = [("angle", "<f8")]
+
+    def pack(self, component: item_component.SlashingSword, writer: SnapshotWriter) -> tuple:
+        return (component.angle,)
+
+    def unpack(self, row: tuple, reader: SnapshotReader) -> item_component.SlashingSword:
+        return item_component.SlashingSword(*row)
+
+
+class GravityBowTable(ComponentTable):
+    name = "gravity_bow"
+    component_type = item_component.GravityBow
+    fields = [("launch_vel_x", "<f8"), ("launch_vel_y", "<f8"), ("angle", "<f8")]
+
+    def pack(self, component: item_component.GravityBow, writer: SnapshotWriter) -> tuple:
+        return *component.launch_vel, component.angle
+
+    def unpack(self, row: tuple, reader: SnapshotReader) -> item_component.GravityBow:
+        launch_vel_x, launch_vel_y, angle = row
+
+        return item_component.GravityBow(pygame.Vector2(launch_vel_x, launch_vel_y), angle)
+
+
+class HealthPotionTable(ComponentTable):
+    name = "health_potion"
+    component_type = item_component.HealthPotion
+    fields = [("heal_power", "<f8")]
+
+    def pack(self, component: item_component.HealthPotion, writer: SnapshotWriter) -> tuple:
+        return (component.heal_power,)
+
+    def unpack(self, row: tuple, reader: SnapshotReader) -> item_component.HealthPotion:
+        return item_component.HealthPotion(*row)
+
+
+class ItemProjectileTable(ComponentTable):
+    name = "item_projectile"
+    component_type = item_component.Projectile
+    fields = [("vel_x", "<f8"), ("vel_y", "<f8"), ("gravity", "?")]
+
+    def pack(self, component: item_component.Projectile, writer: SnapshotWriter) -> tuple:
+        return *component.vel, component.gravity
+
+    def unpack(self, row: tuple, reader: SnapshotReader) -> item_component.Projectile:
+        vel_x, vel_y, gravity = row
+
+        return item_component.Projectile(pygame.Vector2(vel_x, vel_y), gravity)
+
+
+class EntityStateTable(ComponentTable):
+    # Index of each state in the state column
+    STATES = (ai_component.EntityState.Patrol, ai_component.EntityState.Flee, ai_component.EntityState.Follow)
+
+    name = "entity_state"
+    component_type = ai_component.EntityState
+    fields = [
+        ("state", "i1"),
+        ("patrol_speed", "<f8"),  # NaN if it can't patrol
+        ("flee_speed", "<f8"),  # NaN if it can't flee
+        ("flee_time", "<f8"),
+        ("flee_left", "<f8"),
+        ("can_follow", "?"),
+    ]
+    timers = ("flee_left",)
+
+    def pack(self, component: ai_component.EntityState, writer: SnapshotWriter) -> tuple:
+        patrol = component.available_states.get(ai_component.EntityState.Patrol)
+        flee = component.available_states.get(ai_component.EntityState.Flee)
+
+        return (
+            self.STATES.index(type(component.state)),
+            math.nan if patrol is None else patrol.patrol_speed,
+            math.nan if flee is None else flee.flee_speed,
+            0 if flee is None else flee.flee_time,
+            0 if flee is None else flee.flee_timer.remaining,
+            ai_component.EntityState.Follow in component.available_states,
+        )
+
+    def unpack(self, row: tuple, reader: SnapshotReader) -> ai_component.EntityState:
+        state, patrol_speed, flee_speed, flee_time, flee_left, can_follow = row
+
+        available_states = []
+        if not math.isnan(patrol_speed):
+            available_states.append(ai_component.EntityState.Patrol(patrol_speed))
+        if not math.isnan(flee_speed):
+            flee = ai_component.EntityState.Flee(flee_speed, flee_time)
+            restore_cooldown(flee.flee_timer, flee.flee_timer.duration, flee_left)
+            available_states.append(flee)
+        if can_follow:
+            available_states.append(ai_component.EntityState.Follow())
+
+        return ai_component.EntityState(available_states, self.STATES[state])
+
+
+class FollowsEntityCloseTable(ComponentTable):
+    name = "follows_entity_close"
+    component_type = ai_component.FollowsEntityClose
+    fields = [("entity_followed", "<i8"), ("follow_range", "<i4"), ("jump_vel", "<f8")]  # NaN if it can't jump
+    references = ("entity_followed",)
+
+    def pack(self, component: ai_component.FollowsEntityClose, writer: SnapshotWriter) -> tuple:
+        jump_vel = math.nan if component.jump_vel is None else component.jump_vel
+        return component.entity_followed, component.follow_range, jump_vel
+
+    def unpack(self, row: tuple, reader: SnapshotReader) -> ai_component.FollowsEntityClose:
+        entity_followed, follow_range, jump_vel = row
+
+        return ai_component.FollowsEntityClose(entity_followed, follow_range, nan_to_none(jump_vel))
+
+
+class PatrollerTable(ComponentTable):
+    name = "patroller"
+    component_type = ai_component.Patroller
+
+
+class MeleeAttackTable(ComponentTable):
+    name = "melee_attack"
+    component_type = ai_component.MeleeAttack
+    fields = [
+        ("attack_range", "<i4"),
+        ("attack_cooldown", "<f8"),
+        ("damage", "<f8"),
+        ("collision", "?"),
+        ("cooldown_left", "<f8"),
+    ]
+    timers = ("cooldown_left",)
+
+    def pack(self, component: ai_component.MeleeAttack, writer: SnapshotWriter) -> tuple:
+        return (
+            component.attack_range,
+            component.attack_cooldown,
+            component.damage,
+            component.collision,
+            component.cooldown.remaining,
+        )
+
+    def unpack(self, row: tuple, reader: SnapshotReader) -> ai_component.MeleeAttack:
+        attack_range, attack_cooldown, damage, collision, cooldown_left = row
+
+        melee_attack = ai_component.MeleeAttack(attack_range, attack_cooldown, damage, collision)
+        restore_cooldown(melee_attack.cooldown, melee_attack.cooldown.duration, cooldown_left)
+        return melee_attack
+
+
+class MeleeWeaponAttackTable(ComponentTable):
+    name = "melee_weapon_attack"
+    component_type = ai_component.MeleeWeaponAttack
+    fields = [("attack_range", "<i4")]
+
+    def pack(self, component: ai_component.MeleeWeaponAttack, writer: SnapshotWriter) -> tuple:
+        return (component.attack_range,)
+
+    def unpack(self, row: tuple, reader: SnapshotReader) -> ai_component.MeleeWeaponAttack:
+        return ai_component.MeleeWeaponAttack(*row)
+
+
+class RangeAttackTable(ComponentTable):
+    name = "range_attack"
+    component_type = ai_component.RangeAttack
+    fields = [("target", "<i8"), ("attack_cooldown", "<f8"), ("ideal_parabola", "i1"), ("cooldown_left", "<f8")]
+    references = ("target",)
+    timers = ("cooldown_left",)
+
+    def pack(self, component: ai_component.RangeAttack, writer: SnapshotWriter) -> tuple:
+        return (
+            component.target,
+            component.attack_cooldown,
+            component.ideal_parabola,
+            component.cooldown.remaining,
+        )
+
+    def unpack(self, row: tuple, reader: SnapshotReader) -> ai_component.RangeAttack:
+        target, attack_cooldown, ideal_parabola, cooldown_left = row
+
+        range_attack = ai_component.RangeAttack(target, attack_cooldown, ideal_parabola == -1)
+        restore_cooldown(range_attack.cooldown, range_attack.cooldown.duration, cooldown_left)
+        return range_attack
+
+
+# Components without a table aren't saved. Tiles don't need to be, since they're rebuilt from the map
+COMPONENT_TABLES: list[ComponentTable] = [
+    PositionTable(),
+    MovementTable(),
+    HealthTable(),
+    InventoryTable(),
+    GraphicsTable(),
+    NoCollidePlayerTable(),
+    ControlsTable(),
+    ItemTable(),
+    ItemPositionTable(),
+    ItemGraphicsTable(),
+    ConsumableTable(),
+    MeleeWeaponTable(),
+    RangedWeaponTable(),
+    SlashingSwordTable(),
+    GravityBowTable(),
+    HealthPotionTable(),
+    ItemProjectileTable(),
+    EntityStateTable(),
+    FollowsEntityCloseTable(),
+    PatrollerTable(),
+    MeleeAttackTable(),
+    MeleeWeaponAttackTable(),
+    RangeAttackTable(),
+]
+
+TABLES_BY_TYPE: dict[type, ComponentTable] = {table.component_type: table for table in COMPONENT_TABLES}
+
+# Every table of a snapshot, besides the string table
+TABLE_DTYPES: dict[str, np.dtype] = {
+    "entities": ENTITY_DTYPE,
+    **{table.name: table.dtype for table in COMPONENT_TABLES},
+    "inventory_slots": ENTITY_DTYPE,
+    "effects": EFFECT_DTYPE,
+    "projectiles": PROJECTILE_DTYPE,
+    "streamed_objects": STREAMED_OBJECT_DTYPE,
+}
+# Tables with at most one row per entity, keyed by their entity column
+KEYED_TABLES = ("entities", *(table.name for table in COMPONENT_TABLES))
+
+
+def sort_by_entity(arr: np.ndarray) -> np.ndarray:
+    return arr[np.argsort(arr["entity"], kind="stable")]
+
+
+def in_sorted(values: np.ndarray, sorted_values: np.ndarray) -> np.ndarray:
+    """
+    A cheaper `np.isin`, for when the values to look in are sorted (which makes a difference for the small arrays
+    saved every autosave)
+
+    Args:
+        values: The values to look up
+        sorted_values: The sorted values to look in
+
+    Returns:
+        A boolean array, True where the value is in `sorted_values`
+    """
+
+    if len(sorted_values) == 0:
+        return np.zeros(len(values), dtype=bool)
+
+    idxs = np.searchsorted(sorted_values, values)
+    return sorted_values[np.minimum(idxs, len(sorted_values) - 1)] == values
+
+
+def diff_keyed_table(old: np.ndarray, new: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Compares two versions of a table with a row per entity, both sorted by entity
+
+    Args:
+        old: The old rows
+        new: The new rows
+
+    Returns:
+        The new rows that were added or changed, and the entities of the old rows that were removed (as an
+        ENTITY_DTYPE array)
+    """
+
+    idxs = np.searchsorted(old["entity"], new["entity"])
+    found = in_sorted(new["entity"], old["entity"])
+
+    # Rows are compared as raw bytes, which also treats equal NaNs (used for missing values) as unchanged
+    row_dtype = np.dtype((np.void, new.dtype.itemsize))
+    unchanged = found.copy()
+    unchanged[found] = old[idxs[found]].view(row_dtype) == new[found].view(row_dtype)
+
+    removed = old[~in_sorted(old["entity"], new["entity"])]["entity"]
+    return new[~unchanged], removed.astype(np.int64).view(ENTITY_DTYPE)
+
+
+def get_saved_entities(level_state: LevelState) -> np.ndarray:
+    """
+    Gets the entities a snapshot saves, i.e every entity with a component that has a table
+
+    Args:
+        level_state: The level state
+
+    Returns:
+        A sorted array of the entity IDs
+    """
+
+    world = level_state.world
+
+    entities = set()
+    for table in COMPONENT_TABLES:
+        entities.update(entity for entity, _ in world.get_component(table.component_type))
+    return np.array(sorted(entity for entity in entities if world.entity_exists(entity)), dtype=np.int64)
+
+
+def save_effects(writer: SnapshotWriter):
+    stores = [store for store in writer.level.effect_manager.stores.values() if len(store) > 0]
+
+    effects = np.empty(sum(len(store) for store in stores), dtype=EFFECT_DTYPE)
+    start = 0
+    for store in stores:
+        n = store.num_effects
+        rows = effects[start : start + n]
+        rows["type"] = writer.strings.add(store.effect_type.__name__)
+        rows["entity"] = store.entity[:n]
+        rows["hp_change"] = store.hp_change[:n]
+        rows["interval"] = store.interval[:n]
+        rows["next_tick"] = store.next_tick[:n]
+        rows["end_time"] = store.end_time[:n]
+        start += n
+
+    writer.add_table("effects", effects)
+
+
+def load_effects(reader: SnapshotReader):
+    world = reader.level.world
+    effect_manager = reader.level.effect_manager
+    effect_types = {effect_type.__name__: effect_type for effect_type in effect.Effect.__subclasses__()}
+
+    effects = reader.get_table("effects", EFFECT_DTYPE)
+    effects["entity"] = reader.remap(effects["entity"])
+    effects = effects[effects["entity"] >= 0]
+
+    for type_idx in np.unique(effects["type"]).tolist():
+        rows = effects[effects["type"] == type_idx]
+        effect_type = effect_types[reader.strings.get(type_idx)]
+
+        store = effect_manager.stores[effect_type] = effect.EffectStore(effect_type)
+        store.reserve(len(rows))
+
+        n = store.num_effects = len(rows)
+        store.entity[:n] = rows["entity"]
+        store.hp_change[:n] = rows["hp_change"]
+        store.interval[:n] = rows["interval"]
+        store.next_tick[:n] = rows["next_tick"]
+        store.end_time[:n] = rows["end_time"]
+
+        for idx, entity in enumerate(rows["entity"].tolist()):
+            graphics = world.try_component(entity, Graphics)
+            store.size[idx] = graphics.size if graphics is not None else (0, 0)
+            store.positions.append(world.try_component(entity, Position))
+
+        store.update_next_deadline()
+
+
+def save_projectiles(writer: SnapshotWriter):
+    projectile_manager = writer.level.projectile_manager
+
+    n = projectile_manager.num_slots
+    alive = projectile_manager.alive[:n]
+    sprite_keys = np.array(
+        [writer.strings.add(writer.get_image_key(sprite)) for sprite in projectile_manager.sprites], dtype=np.int32
+    )
+
+    projectiles = np.empty(int(alive.sum()), dtype=PROJECTILE_DTYPE)
+    projectiles["spawn_x"] = projectile_manager.spawn_pos[:n, 0][alive]
+    projectiles["spawn_y"] = projectile_manager.spawn_pos[:n, 1][alive]
+    projectiles["initial_angle"] = projectile_manager.initial_angle[:n][alive]
+    projectiles["vel"] = projectile_manager.vel[:n][alive]
+    projectiles["gravity"] = projectile_manager.gravity[:n][alive]
+    projectiles["damage"] = projectile_manager.damage[:n][alive]
+    projectiles["shot_by"] = projectile_manager.shot_by[:n][alive]
+    projectiles["sprite"] = sprite_keys[projectile_manager.sprite_idx[:n][alive]]
+    projectiles["t"] = projectile_manager.t[:n][alive]
+    projectiles["x"] = projectile_manager.pos[:n, 0][alive]
+    projectiles["y"] = projectile_manager.pos[:n, 1][alive]
+    projectiles["angle"] = projectile_manager.angle[:n][alive]
+
+    writer.add_table("projectiles", projectiles)
+
+
+def load_projectiles(reader: SnapshotReader):
+    projectile_manager = reader.level.projectile_manager
+
+    projectiles = reader.get_table("projectiles", PROJECTILE_DTYPE)
+    projectiles["shot_by"] = reader.remap(projectiles["shot_by"])
+
+    n = len(projectiles)
+    projectile_manager.clear()
+    projectile_manager.reserve(n)
+
+    # Sprites are looked up once per key
+    sprite_keys, sprite_key_idxs = np.unique(projectiles["sprite"], return_inverse=True)
+    sprite_idxs = np.array(
+        [
+            projectile_manager.get_sprite_idx(reader.level.imgs[reader.strings.get(key)])
+            for key in sprite_keys.tolist()
+        ],
+        dtype=np.int64,
+    )
+
+    projectile_manager.spawn_pos[:n, 0] = projectiles["spawn_x"]
+    projectile_manager.spawn_pos[:n, 1] = projectiles["spawn_y"]
+    projectile_manager.initial_angle[:n] = projectiles["initial_angle"]
+    projectile_manager.vel[:n] = projectiles["vel"]
+    projectile_manager.gravity[:n] = projectiles["gravity"]
+    projectile_manager.damage[:n] = projectiles["damage"]
+    projectile_manager.shot_by[:n] = projectiles["shot_by"]
+    if n > 0:
+        projectile_manager.sprite_idx[:n] = sprite_idxs[sprite_key_idxs]
+        projectile_manager.size[:n] = np.array(projectile_manager.sprite_sizes)[projectile_manager.sprite_idx[:n]]
+    projectile_manager.t[:n] = projectiles["t"]
+    projectile_manager.pos[:n, 0] = projectiles["x"]
+    projectile_manager.pos[:n, 1] = projectiles["y"]
+    projectile_manager.angle[:n] = projectiles["angle"]
+    projectile_manager.alive[:n] = True
+
+    projectile_manager.num_slots = n
+
+
+def save_streamed_objects(writer: SnapshotWriter):
+    tracked_entities = writer.level.tilemap.tracked_entities
+
+    streamed_objects = np.empty(len(tracked_entities), dtype=STREAMED_OBJECT_DTYPE)
+    for idx, ((map_idx, obj_id), (_, entity)) in enumerate(tracked_entities.items()):
+        streamed_objects[idx] = map_idx, obj_id, entity
+
+    writer.add_table("streamed_objects", streamed_objects)
+
+
+def load_streamed_objects(reader: SnapshotReader):
+    """Tracks the entities spawned from the objects of a streamed map again, so they're unloaded with their region"""
+
+    tilemap = reader.level.tilemap
+    tilemap.tracked_entities.clear()
+
+    streamed_objects = reader.get_table("streamed_objects", STREAMED_OBJECT_DTYPE)
+    streamed_objects["entity"] = reader.remap(streamed_objects["entity"])
+
+    map_objects: dict[int, dict[int, pytmx.TiledObject]] = {}
+    for map_idx, obj_id, entity in streamed_objects.tolist():
+        if entity < 0:
+            continue
+
+        if map_idx not in map_objects:
+            world_map = tilemap.maps[map_idx]
+            world_map.load()
+            map_objects[map_idx] = {obj.id: obj for obj in world_map.objects}
+
+        tilemap.spawned_objects.add((map_idx, obj_id))
+        tilemap.tracked_entities[map_idx, obj_id] = map_objects[map_idx][obj_id], entity
+
+
+def remove_entities(level_state: LevelState, entities: np.ndarray):
+    """Deletes entities right away, along with their widgets"""
+
+    world = level_state.world
+    entity_set = set(entities.tolist())
+
+    for uuid, widget_info in list(level_state.ui.widgets.items()):
+        if getattr(widget_info.widget, "entity", None) in entity_set:
+            level_state.ui.remove_widget(uuid)
+
+    for entity in entity_set:
+        world.delete_entity(entity, immediate=True)
+
+
+def write_tables(
+    writer: SnapshotWriter, entities: Optional[np.ndarray] = None, changed_entities: Optional[np.ndarray] = None
+):
+    """
+    Adds every table of a snapshot to a writer
+
+    Args:
+        writer: The writer
+        entities: The saved entities, if they're already known (see `get_saved_entities`)
+        changed_entities: Only saves the components of these entities (sorted), e.g for autosave journal records.
+            The entity table still has every entity. Defaults to every entity
+    """
+
+    level_state = writer.level
+    world = level_state.world
+
+    if entities is None:
+        entities = get_saved_entities(level_state)
+
+    entity_table = np.empty(len(entities), dtype=ENTITY_DTYPE)
+    entity_table["entity"] = entities
+    writer.add_table("entities", entity_table)
+
+    # Entity by entity, so only the components of changed entities are looked at (and rows come out sorted)
+    table_rows: dict[str, list[tuple]] = {table.name: [] for table in COMPONENT_TABLES}
+    for entity in (entities if changed_entities is None else changed_entities).tolist():
+        for component in world.components_for_entity(entity):
+            table = TABLES_BY_TYPE.get(type(component))
+            if table is not None:
+                table_rows[table.name].append((entity, *table.pack(component, writer)))
+    for table in COMPONENT_TABLES:
+        writer.add_table(table.name, np.array(table_rows[table.name], dtype=table.dtype))
+
+    writer.add_table("inventory_slots", np.array(writer.inventory_slots, dtype=np.int64).view(ENTITY_DTYPE))
+
+    save_effects(writer)
+    save_projectiles(writer)
+    if isinstance(level_state.tilemap, StreamedTileMap):
+        save_streamed_objects(writer)
+
+
+def save_snapshot(level_state: LevelState) -> bytes:
+    """
+    Saves a snapshot of a level
+
+    Args:
+        level_state: The level state
+
+    Returns:
+        The snapshot
+    """
+
+    writer = SnapshotWriter(level_state)
+    write_tables(writer)
+    return writer.to_bytes(level_state.player)
+
+
+def load_snapshot(level_state: LevelState, data: bytes):
+    """
+    Loads a snapshot into a level, replacing its entities (besides tiles), effects, projectiles and the game time.
+    Entities get new IDs, and every reference to them is remapped
+
+    Entities saved by regions of streamed maps that are unloaded aren't part of snapshots, so they're left as they
+    are
+
+    Args:
+        level_state: The level state
+        data: The snapshot
+    """
+
+    world = level_state.world
+
+    # Everything is read before the level is touched, so invalid snapshots leave it as is
+    reader = SnapshotReader(level_state, data)
+    saved_entities = reader.get_table("entities", ENTITY_DTYPE)["entity"]
+    component_rows = [(table, reader.get_table(table.name, table.dtype)) for table in COMPONENT_TABLES]
+
+    remove_entities(level_state, get_saved_entities(level_state))
+    level_state.effect_manager.clear()
+    level_state.pathfinder.requests.clear()
+    level_state.pathfinder.paths.clear()
+    level_state.pathfinder.failed.clear()
+
+    core.time.set_ticks(reader.time)
+
+    reader.saved_entities = saved_entities
+    reader.loaded_entities = np.array([world.create_entity() for _ in range(len(saved_entities))], dtype=np.int64)
+    reader.inventory_slots = reader.remap(reader.get_table("inventory_slots", ENTITY_DTYPE)["entity"]).tolist()
+
+    for table, rows in component_rows:
+        rows["entity"] = reader.remap(rows["entity"])
+        for reference in table.references:
+            rows[reference] = reader.remap(rows[reference])
+
+        for row in rows.tolist():
+            world.add_component(row[0], table.unpack(row[1:], reader))
+
+    player = int(reader.remap(np.array([reader.player]))[0])
+    level_state.set_player(player)
+    for entity in reader.loaded_entities.tolist():
+        level_state.add_entity_widgets(entity)
+
+    load_effects(reader)
+    load_projectiles(reader)
+
+    if isinstance(level_state.tilemap, StreamedTileMap):
+        load_streamed_objects(reader)
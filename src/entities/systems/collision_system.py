@@ -10,10 +10,11 @@ from __future__ import annotations
 
 import pygame
 
-from src import core, utils
+from src import utils
 from src.entities.components import item_component, tile_component
-from src.entities.components.component import (Graphics, Inventory, Movement,
-                                               NoCollidePlayer, Position)
+from src.entities.components.component import (Controls, Graphics, Inventory,
+                                               Movement, NoCollidePlayer,
+                                               Position)
 from src.entities.systems.system import System
 
 
@@ -21,10 +22,12 @@ class CollisionSystem(System):
     def __init__(self, level_state):
         super().__init__(level_state)
 
-    def collide_with_tiles(self, pos: Position, movement: Movement, neighboring_tile_rects: list[pygame.Rect]) -> bool:
+    def collide_with_tiles(
+        self, pos: Position, movement: Movement, neighboring_tile_rects: list[pygame.Rect], dt: float
+    ) -> bool:
         collide_bottom = False
 
-        pos.pos.x += movement.vel.x * core.dt.dt
+        pos.pos.x += movement.vel.x * dt
         pos.pos.x = min(max(pos.pos.x, 0), self.tilemap.width - pos.rect.width)
         pos.rect.x = round(pos.pos.x)
 
@@ -37,7 +40,7 @@ class CollisionSystem(System):
                     pos.rect.left = neighboring_tile_rect.right
                     pos.pos.x = pos.rect.x
 
-        pos.pos.y += movement.vel.y * core.dt.dt
+        pos.pos.y += movement.vel.y * dt
         pos.rect.y = round(pos.pos.y)
 
         for neighboring_tile_rect in neighboring_tile_rects:
@@ -77,6 +80,10 @@ class CollisionSystem(System):
     def process(self):
         # Mob
         for entity, (pos, movement, graphics) in self.world.get_components(Position, Movement, Graphics):
+            dt = self.activity_dt(entity, pos.rect)
+            if dt is None:
+                continue
+
             neighboring_tile_entities = self.tilemap.get_neighboring_tile_entities(3, pos)
             neighboring_tile_rects = self.tilemap.get_unwalkable_rects(neighboring_tile_entities)
             neighboring_ramps = self.tilemap.get_ramps(neighboring_tile_entities)
@@ -95,7 +102,7 @@ class CollisionSystem(System):
                     if nested_entity != self.player and collide_with_player:
                         neighboring_tile_rects.append(nested_pos.rect)
 
-            collide_bottom_tiles = self.collide_with_tiles(pos, movement, neighboring_tile_rects)
+            collide_bottom_tiles = self.collide_with_tiles(pos, movement, neighboring_tile_rects, dt)
             collide_bottom_ramps = self.collide_with_ramps(pos, neighboring_ramps)
             if collide_bottom_tiles or collide_bottom_ramps:
                 pos.on_ground = True
@@ -103,26 +110,27 @@ class CollisionSystem(System):
 
             pos.tile_pos = utils.pixel_to_tile(pos.pos)
 
-        # Item pickup
+        # Item pickup, by any player (there's more than one on servers)
+        players = self.world.get_components(Controls, Position, Inventory)
         for entity, (item, item_pos, item_graphics) in self.world.get_components(
             item_component.Item,
             item_component.ItemPosition,
             item_component.ItemGraphics,
         ):
-            owner_pos = self.component_for_player(Position)
-            player_inventory = self.component_for_player(Inventory)
-            player_rect = owner_pos.rect
+            for player, (_, owner_pos, player_inventory) in players:
+                # Player collided with item
+                if item_pos.in_inventory or not owner_pos.rect.colliderect(item_pos.rect):
+                    continue
 
-            # Player collided with item
-            if not item_pos.in_inventory and player_rect.colliderect(item_pos.rect):
                 available_inventory_idx = player_inventory.get_available_idx()
                 if available_inventory_idx is not None:
-                    item.owner = self.player
+                    item.owner = player
                     item_pos.pos.x, item_pos.pos.y = item_pos.pos.x, item_pos.pos.y
                     item_pos.in_inventory = True
 
                     player_inventory[available_inventory_idx] = entity
 
-                    self.notify("player_get_item", entity)
-                else:
+                    if player == self.player:
+                        self.notify("player_get_item", entity)
+                elif player == self.player:
                     self.particle_manager.create_text_particle(owner_pos.pos, "No more room in inventory!")
@@ -15,12 +15,21 @@ from typing import Generator
 
 from src import core, pygame, utils
 from src.common import TILE_HEIGHT
-from src.entities.components import item_component, projectile_component
-from src.entities.components.component import Health, Inventory, Position
+from src.entities.components import item_component
+from src.entities.components.component import (Controls, Health, Inventory,
+                                               Position)
 from src.entities.effect import RegenEffect
 from src.entities.systems.system import System
 
 
+# Settings of the items that don't get theirs from their owner, by the key of their held sprite
+ITEM_SETTINGS_KEYS = {
+    "items/sword_hold": "items/weapons/slashing_sword",
+    "items/gravity_bow_hold": "items/weapons/gravity_bow",
+    "items/health_potion": "items/consumables/health_potion",
+}
+
+
 @dataclass
 class ItemData:
     equipped_item: int
@@ -137,21 +146,18 @@ class ItemUsages(types.SimpleNamespace):
             return
 
         ranged_weapon = self.world.component_for_entity(equipped_item, item_component.RangedWeapon)
-        mouse_pos = pygame.mouse.get_pos()
-        adj_item_pos = self.camera.apply(item_pos.pos)
-
-        self.world.create_entity(
-            projectile_component.Projectile(
-                vel=20,
-                angle=math.atan2(
-                    mouse_pos[1] - adj_item_pos.y,
-                    mouse_pos[0] - adj_item_pos.x,
-                ),
-                damage=ranged_weapon.projectile_damage,
-                shot_by=entity,
+        aim = self.world.component_for_entity(entity, Controls).aim
+
+        self.projectile_manager.spawn(
+            item_pos.pos,
+            vel=20,
+            angle=math.atan2(
+                aim.y - int(item_pos.pos.y),
+                aim.x - int(item_pos.pos.x),
             ),
-            projectile_component.ProjectilePosition(item_pos.pos.copy()),
-            projectile_component.ProjectileGraphics(self.imgs["projectiles/arrows_sprite"]),
+            damage=ranged_weapon.projectile_damage,
+            sprite=self.imgs["projectiles/arrows_sprite"],
+            shot_by=entity,
         )
 
         item.used = False
@@ -177,6 +183,32 @@ class CombatSystem(System):
 
         self.item_usages = ItemUsages(self)
 
+        self.subscribe("settings_changed", self.on_settings_changed)
+
+    def on_settings_changed(self, changed_keys: list[str]):
+        for entity, (item, item_graphics) in self.world.get_components(
+            item_component.Item, item_component.ItemGraphics
+        ):
+            settings_key = ITEM_SETTINGS_KEYS.get(item_graphics.asset_keys[0])
+            if settings_key is None or not self.settings_changed(changed_keys, settings_key):
+                continue
+
+            item_settings = self.records[settings_key]
+            item.cooldown = item_settings.cooldown
+
+            melee_weapon = self.world.try_component(entity, item_component.MeleeWeapon)
+            if melee_weapon is not None:
+                melee_weapon.attack_damage = item_settings.damage
+            ranged_weapon = self.world.try_component(entity, item_component.RangedWeapon)
+            if ranged_weapon is not None:
+                ranged_weapon.projectile_damage = item_settings.damage
+            gravity_bow = self.world.try_component(entity, item_component.GravityBow)
+            if gravity_bow is not None:
+                gravity_bow.launch_vel = pygame.Vector2(item_settings.launch_vel)
+            health_potion = self.world.try_component(entity, item_component.HealthPotion)
+            if health_potion is not None:
+                health_potion.heal_power = item_settings.heal_power
+
     def handle_items(
         self,
         equipped_item: int,
@@ -8,10 +8,9 @@ from __future__ import annotations
 
 import math
 
-from src import common, core, pygame, screen, utils
+from src import common, core, pygame
 from src.common import TILE_HEIGHT, TILE_WIDTH
-from src.entities.components import (ai_component, item_component,
-                                     projectile_component, tile_component)
+from src.entities.components import item_component, tile_component
 from src.entities.components.component import (Graphics, Inventory, Movement,
                                                Position)
 from src.entities.systems.system import System
@@ -21,9 +20,25 @@ class GraphicsSystem(System):
     def __init__(self, level_state):
         super().__init__(level_state)
 
-        self.normal_map_surf, self.interactable_map_surf = self.tilemap.make_map()
+        self.visible_chunks = []
+        self.last_offset = None
         self.background = pygame.transform.scale(self.imgs["placeholder_background2"], common.RES).convert()
 
+        self.tilemap.subscribe_tiles_changed(self.on_tiles_changed)
+
+        self.debug_overlay.add_field("Entity ID: ", lambda entity: entity)
+        self.debug_overlay.add_field(
+            "Coord pos: ", lambda entity: self.level.world.component_for_entity(entity, Position).pos.xy
+        )
+        self.debug_overlay.add_field(
+            "Tile pos: ", lambda entity: self.level.world.component_for_entity(entity, Position).tile_pos.xy
+        )
+
+    def on_tiles_changed(self, rect: pygame.Rect):
+        """Called when tiles get added or removed, which changes the map surfaces"""
+
+        core.dirty_rects.mark(self.camera.apply(rect))
+
     #####################################################################
     # DRAWING FUNCTIONS: Very similar to ParticleSystem's draw handling #
     #####################################################################
@@ -33,6 +48,7 @@ class GraphicsSystem(System):
             if widget_when == when:
                 widget.draw(self.camera)
                 widget.update()
+                core.dirty_rects.mark(widget.dirty_rect(self.camera))
 
     def handle_pre_interactable_widgets(self):
         self.handle_widgets_base("pre_interactables")
@@ -53,91 +69,75 @@ class GraphicsSystem(System):
     # Helper functions #
     ####################
 
-    def _draw_tree_layer(self, layer: pygame.Surface, adj_rect: pygame.Rect, anim_offset: float):
-        screen.blit(
+    def _draw_tree_layer(self, layer: pygame.Surface, adj_rect: pygame.Rect, anim_offset: float) -> pygame.Rect:
+        sway = math.sin(core.time.get_ticks() / 650) * 1.6
+        return common.screen.blit(
             pygame.transform.rotate(layer, math.sin(core.time.get_ticks() / 800) * 1.4),
-            self.camera.apply(
-                pygame.Vector2(adj_rect.topleft)
-                + pygame.Vector2(
-                    math.sin(core.time.get_ticks() / 600 + anim_offset) * 2,
-                    math.sin(core.time.get_ticks() / 750 + anim_offset) * 1.5,
-                )
-                * (math.sin(core.time.get_ticks() / 650) * 1.6)
+            self.camera.apply_xy(
+                adj_rect.x + math.sin(core.time.get_ticks() / 600 + anim_offset) * 2 * sway,
+                adj_rect.y + math.sin(core.time.get_ticks() / 750 + anim_offset) * 1.5 * sway,
             ),
         )
 
     def _draw_mob_debug(self, entity: int, pos: Position):
-        """Draws debug rects of the mobs"""
-        info = pygame.Surface((180, 100), pygame.SRCALPHA)
-        info.set_alpha(180)
+        """Draws debug rects and info panels of the mobs"""
 
-        adj_pos = self.camera.apply(pos.rect)
-        info_pos = adj_pos.copy()
-        info_pos.width, info_pos.height = info.get_size()
-        info_pos.bottom = adj_pos.top - 5
-        info_pos.centerx = adj_pos.centerx
+        # The panel goes above the mob, so the mob being off-screen isn't enough
+        if not self.camera.visible(pos.rect.union(self.debug_overlay.get_panel_rect(pos.rect))):
+            return
 
-        pygame.draw.rect(info, (249, 204, 127), (0, 0, *info.get_size()), border_radius=5)
-        pygame.draw.rect(info, (80, 46, 23), (0, 0, *info.get_size()), width=2, border_radius=5)
+        adj_pos = self.camera.apply(pos.rect)
         pygame.draw.rect(
-            screen,
+            common.screen,
             (255, 0, 0),
             adj_pos,
             width=1,
         )
 
-        font = utils.load_font(15)
-        lines = (
-            f"Entity ID: {entity}",
-            f"Coord pos: {pos.pos.xy}",
-            f"Tile pos: {pos.tile_pos.xy}",
-        )
-
-        for i, line in enumerate(lines):
-            info.blit(font.render(line, True, (0, 0, 0)), (10, i * 20 + 10))
-
-        if self.world.has_component(entity, ai_component.EntityState):
-            entity_state = self.world.component_for_entity(entity, ai_component.EntityState)
-            info.blit(font.render(f"State: {type(entity_state.state).__name__}", True, (0, 0, 0)), (10, 70))
-
-        screen.blit(info, info_pos)
+        self.debug_overlay.draw(common.screen, entity, adj_pos)
 
     def _draw_mob(self, raw_dt: float, entity: int, graphics: Graphics, pos: Position):
         """Draws the actual mob sprite and animations"""
 
+        draw_pos = self.camera.apply_xy(pos.pos.x, pos.pos.y)
+
         if graphics.sprites is not None:
             if pos.direction == 1:
-                screen.blit(graphics.sprites["right"], self.camera.apply(pos.pos))
+                core.dirty_rects.mark(common.screen.blit(graphics.sprites["right"], draw_pos))
             else:
-                screen.blit(graphics.sprites["left"], self.camera.apply(pos.pos))
+                core.dirty_rects.mark(common.screen.blit(graphics.sprites["left"], draw_pos))
         elif graphics.animations is not None:
             movement = self.world.component_for_entity(entity, Movement)
 
             if movement.vel.x > 0 and graphics.animations.get("move_right"):
-                graphics.animations["move_right"].play_anim(
-                    self.camera.apply(pos.pos),
+                dirty_rect = graphics.animations["move_right"].play_anim(
+                    draw_pos,
                     raw_dt,
                     graphics.animation_speeds["move"],
                 )
             elif movement.vel.x < 0 and graphics.animations.get("move_left"):
-                graphics.animations["move_left"].play_anim(
-                    self.camera.apply(pos.pos),
+                dirty_rect = graphics.animations["move_left"].play_anim(
+                    draw_pos,
                     raw_dt,
                     graphics.animation_speeds["move"],
                 )
 
             elif pos.direction == 1 and graphics.animations.get("idle_right"):
-                graphics.animations["idle_right"].play_anim(
-                    self.camera.apply(pos.pos),
+                dirty_rect = graphics.animations["idle_right"].play_anim(
+                    draw_pos,
                     raw_dt,
                     graphics.animation_speeds["idle"],
                 )
             elif pos.direction == -1 and graphics.animations.get("idle_left"):
-                graphics.animations["idle_left"].play_anim(
-                    self.camera.apply(pos.pos),
+                dirty_rect = graphics.animations["idle_left"].play_anim(
+                    draw_pos,
                     raw_dt,
                     graphics.animation_speeds["idle"],
                 )
+            else:
+                return
+
+            core.dirty_rects.mark(dirty_rect)
 
     def _draw_mob_item(self, entity: int, pos: Position):
         """Draws the mob's equipped item (if any)"""
@@ -158,48 +158,48 @@ class GraphicsSystem(System):
                         )
                         x_offset = item_graphics.bound_size[0] + 8
 
-                screen.blit(
+                dirty_rect = common.screen.blit(
                     item_graphics.current_img,
-                    self.camera.apply((item_pos.pos[0] - x_offset, item_pos.pos[1] + 5)),
+                    self.camera.apply_xy(item_pos.pos[0] - x_offset, item_pos.pos[1] + 5),
                 )
+                core.dirty_rects.mark(dirty_rect)
 
                 item_graphics.current_img = item_graphics.original_img
 
     def draw_mobs(self, raw_dt: float):
         """Draws all mobs appropriately"""
         for entity, (graphics, pos) in self.world.get_components(Graphics, Position):
+            # Off-screen mobs don't need their animations played
+            if self.activity_dt(entity, pos.rect) is None:
+                continue
+
             self._draw_mob(raw_dt, entity, graphics, pos)
             self._draw_mob_item(entity, pos)
 
     def draw_mobs_debug(self):
+        if not self.level.debug:
+            return
+
+        core.dirty_rects.mark_all()
+
         for entity, pos in self.world.get_component(Position):
-            if self.level.debug:
-                self._draw_mob_debug(entity, pos)
+            self._draw_mob_debug(entity, pos)
+
+        self.debug_overlay.end_frame()
 
     def draw_world_items(self):
         for entity, (item_graphics, item_pos) in self.world.get_components(
             item_component.ItemGraphics, item_component.ItemPosition
         ):
             if not item_pos.in_inventory:
-                screen.blit(
+                dirty_rect = common.screen.blit(
                     item_graphics.world_sprite,
-                    self.camera.apply(
-                        (
-                            item_pos.pos[0],
-                            item_pos.pos[1] - 5 - math.sin(core.time.get_ticks() / 200) * 5,
-                        )
+                    self.camera.apply_xy(
+                        item_pos.pos[0],
+                        item_pos.pos[1] - 5 - math.sin(core.time.get_ticks() / 200) * 5,
                     ),
                 )
-
-    def draw_projectiles(self):
-        for entity, (projectile_graphics, projectile_pos) in self.world.get_components(
-            projectile_component.ProjectileGraphics,
-            projectile_component.ProjectilePosition,
-        ):
-            screen.blit(
-                projectile_graphics.current_img,
-                self.camera.apply(projectile_pos.pos),
-            )
+                core.dirty_rects.mark(dirty_rect)
 
     def handle_blade_rotation(self, tile_grass: tile_component.GrassBlades, blade):
         player_rect = self.component_for_player(Position).rect
@@ -226,17 +226,16 @@ class GraphicsSystem(System):
                 img_to_blit = pygame.transform.rotate(blade.img, blade.angle)
                 img_to_blit.set_colorkey((0, 0, 0))
 
-                screen.blit(
+                dirty_rect = common.screen.blit(
                     img_to_blit,
-                    self.camera.apply(
-                        (
-                            tile_grass.tile_x * TILE_WIDTH  # Location
-                            + blade.x  # X rel to location
-                            - img_to_blit.get_width() // 2,  # Centering mechanism
-                            tile_grass.tile_y * TILE_HEIGHT + 31 - img_to_blit.get_height() // 2,
-                        )
+                    self.camera.apply_xy(
+                        tile_grass.tile_x * TILE_WIDTH  # Location
+                        + blade.x  # X rel to location
+                        - img_to_blit.get_width() // 2,  # Centering mechanism
+                        tile_grass.tile_y * TILE_HEIGHT + 31 - img_to_blit.get_height() // 2,
                     ),
                 )
+                core.dirty_rects.mark(dirty_rect)
 
     def animate_trees(self):
         for entity, (tile, tile_deco) in self.world.get_components(tile_component.Tile, tile_component.Decoration):
@@ -244,18 +243,21 @@ class GraphicsSystem(System):
             if not self.camera.visible(adj_rect):
                 continue
 
-            self._draw_tree_layer(tile_deco.layers[-1], adj_rect, tile_deco.anim_offset)
-            screen.blit(tile_deco.img, self.camera.apply(adj_rect))
+            dirty_rect = self._draw_tree_layer(tile_deco.layers[-1], adj_rect, tile_deco.anim_offset)
+            draw_pos = self.camera.apply_xy(adj_rect.x, adj_rect.y)
+            dirty_rect.union_ip(common.screen.blit(tile_deco.img, draw_pos))
 
             for i, layer in enumerate(tile_deco.layers[1::-1]):
                 if i == 0:
-                    screen.blit(layer, self.camera.apply(adj_rect))
+                    dirty_rect.union_ip(common.screen.blit(layer, draw_pos))
                 else:
-                    self._draw_tree_layer(layer, adj_rect, tile_deco.anim_offset)
+                    dirty_rect.union_ip(self._draw_tree_layer(layer, adj_rect, tile_deco.anim_offset))
+
+            core.dirty_rects.mark(dirty_rect)
 
     def process(self):
         # Blits background
-        screen.blit(self.background, (0, 0))
+        common.screen.blit(self.background, (0, 0))
 
         # No shake :( thinking
         self.camera.adjust_to(
@@ -263,9 +265,19 @@ class GraphicsSystem(System):
             self.component_for_player(Position).pos,
         )
 
+        self.visible_chunks = self.tilemap.visible_chunks(self.camera)
+
+        # Everything moved on screen if the camera did
+        offset = (self.camera.offset_x, self.camera.offset_y)
+        if offset != self.last_offset:
+            core.dirty_rects.mark_all()
+            self.last_offset = offset
+
         self.particle_manager.draw_pre_interactables()
         self.handle_pre_interactable_widgets()
-        screen.blit(self.interactable_map_surf, self.camera.apply((0, 0)))
+        for chunk_rect, _, interactable_surf in self.visible_chunks:
+            if interactable_surf is not None:
+                common.screen.blit(interactable_surf, self.camera.apply_xy(chunk_rect.x, chunk_rect.y))
         self.handle_post_interactable_widgets()
 
         self.animate_trees()
@@ -275,11 +287,13 @@ class GraphicsSystem(System):
 
         self.draw_world_items()
 
-        self.draw_projectiles()
+        self.projectile_manager.draw()
 
         self.particle_manager.draw_pre_tilemap()
         self.handle_pre_tilemap_widgets()
-        screen.blit(self.normal_map_surf, self.camera.apply((0, 0)))
+        for chunk_rect, normal_surf, _ in self.visible_chunks:
+            if normal_surf is not None:
+                common.screen.blit(normal_surf, self.camera.apply_xy(chunk_rect.x, chunk_rect.y))
 
         self.particle_manager.draw_pre_ui()
         self.handle_pre_ui_widgets()
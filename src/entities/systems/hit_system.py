@@ -20,6 +20,15 @@ class HitSystem(System):
     def __init__(self, level_state):
         super().__init__(level_state)
 
+        self.subscribe("settings_changed", self.on_settings_changed)
+
+    def on_settings_changed(self, changed_keys: list[str]):
+        for entity, mob_settings in self.changed_mobs(changed_keys):
+            health = self.world.try_component(entity, Health)
+            if health is not None:
+                # Also clamps the hp
+                health.max_hp = mob_settings.max_hp
+
     def process(self):
         for entity, (pos, health) in self.world.get_components(Position, Health):
             # Lost HP
@@ -8,9 +8,9 @@ This file defines the input system, used to get player inputs
 
 from __future__ import annotations
 
-from src import core, pygame
+from src import core, pygame, utils
 from src.entities.components import item_component
-from src.entities.components.component import Inventory
+from src.entities.components.component import Controls, Inventory
 from src.entities.systems.system import System
 
 
@@ -18,16 +18,30 @@ class InputSystem(System):
     def __init__(self, level_state):
         super().__init__(level_state)
 
-    def process(self):
-        inventory = self.component_for_player(Inventory)
-        equipped_item = inventory.equipped_item
+    def read_local_controls(self, controls: Controls):
+        """Fills the controls of the player from the keyboard and mouse"""
+
+        keys = pygame.key.get_pressed()
+        if keys[pygame.K_RIGHT] or keys[pygame.K_d]:
+            controls.move = 1
+        elif keys[pygame.K_LEFT] or keys[pygame.K_a]:
+            controls.move = -1
+        else:
+            controls.move = 0
+
+        screen_x, screen_y = utils.window_to_screen(pygame.mouse.get_pos())
+        controls.aim.update(screen_x - self.camera.offset_x, screen_y - self.camera.offset_y)
 
         for event in core.event.get():
-            if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:  # Left button
+            if event.type == pygame.KEYDOWN and event.key in (pygame.K_SPACE, pygame.K_w):
+                controls.jump = True
+
+            elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:  # Left button
+                ui_pos = utils.window_to_ui(event.pos)
                 cont = False
                 for widget_info in self.ui.widgets.values():
                     interact_rect = widget_info.widget.interact_rect
-                    if interact_rect is not None and interact_rect.collidepoint(event.pos) and widget_info.visible:
+                    if interact_rect is not None and interact_rect.collidepoint(ui_pos) and widget_info.visible:
                         cont = True
                         break
                 if cont:
@@ -35,7 +49,7 @@ class InputSystem(System):
 
                 hotbar_widget = self.ui.get_hud_widget("hotbar").widget
 
-                if hotbar_widget.frame_rect.collidepoint(event.pos):
+                if hotbar_widget.frame_rect.collidepoint(ui_pos):
                     for i, hotbar_rect in enumerate(hotbar_widget.hotbar_rects):
                         adjusted_hotbar_rect = pygame.Rect(
                             hotbar_rect.x + hotbar_widget.frame_rect.x,
@@ -43,19 +57,25 @@ class InputSystem(System):
                             *hotbar_rect.size,
                         )
 
-                        if adjusted_hotbar_rect.collidepoint(pygame.mouse.get_pos()):
-                            hotbar_idx = i
+                        if adjusted_hotbar_rect.collidepoint(ui_pos):
+                            controls.hotbar_idx = i
                             break
-                    else:
-                        continue
-
-                    inventory.equipped_item_idx = hotbar_idx
                 else:
-                    if equipped_item is not None:
-                        item = self.world.component_for_entity(equipped_item, item_component.Item)
-                        if core.time.get_ticks() - inventory.last_used > inventory.cooldown * 1000:
-                            item.use(inventory)
-                            inventory.on_cooldown = True
-
-        if core.time.get_ticks() - inventory.last_used > inventory.cooldown * 1000:
-            inventory.on_cooldown = False
+                    controls.use = True
+
+    def process(self):
+        # Servers fill in the controls of every player from the clients' input instead
+        if self.level.local_input:
+            self.read_local_controls(self.component_for_player(Controls))
+
+        for entity, (controls, inventory) in self.world.get_components(Controls, Inventory):
+            if controls.hotbar_idx is not None:
+                inventory.equipped_item_idx = controls.hotbar_idx
+                controls.hotbar_idx = None
+
+            equipped_item = inventory.equipped_item
+            if controls.use and equipped_item is not None:
+                item = self.world.component_for_entity(equipped_item, item_component.Item)
+                if inventory.cooldown.ready:
+                    item.use(inventory)
+            controls.use = False
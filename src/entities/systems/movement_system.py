@@ -9,69 +9,133 @@ This file defines the velocity system, used to "move" entities around
 from __future__ import annotations
 
 import math
+from typing import Optional
 
-from src import core, pygame, utils
+from src import pygame, utils
+from src.common import TILE_WIDTH
 from src.display.particle import RoundParticle
 from src.entities.components import ai_component, component
-from src.entities.components.component import Movement, Position
+from src.entities.components.component import Controls, Movement, Position
+from src.entities.pathfinding import Path
 from src.entities.systems.system import System
-from src.types import Events
+from src.schema import PlayerSettings
 
 
 class MovementSystem(System):
     def __init__(self, level_state):
         super().__init__(level_state)
 
-        self.player_settings = self.settings["mobs/player"]
+        self.player_settings: PlayerSettings = self.records["mobs/player"]
+
+        self.debug_overlay.add_field("State: ", self.get_debug_state)
+        self.subscribe("settings_changed", self.on_settings_changed)
+
+    def on_settings_changed(self, changed_keys: list[str]):
+        self.player_settings = self.records["mobs/player"]
+
+        for entity, mob_settings in self.changed_mobs(changed_keys):
+            self.world.component_for_entity(entity, Movement).speed = mob_settings.speed
+
+            follows = self.world.try_component(entity, ai_component.FollowsEntityClose)
+            if follows is not None:
+                follows.follow_range = mob_settings.follow_range
+                follows.jump_vel = mob_settings.jump_vel
+
+    def get_debug_state(self, entity: int) -> Optional[str]:
+        # Through the level, since pausing detaches the system from its world while panels are still drawn
+        entity_state = self.level.world.try_component(entity, ai_component.EntityState)
+        if entity_state is None:
+            return None
+        return type(entity_state.state).__name__
 
     def about_to_fall(self, pos: Position):
         return self.tilemap.get_tile(pos.tile_pos.x + math.copysign(1, pos.direction), pos.tile_pos.y + 1) is None
 
-    def handle_player_keys(self, event_list: Events):
-        keys = pygame.key.get_pressed()
-        player_movement = self.component_for_player(Movement)
-        player_pos = self.component_for_player(Position)
-
-        player_movement.vel.x = 0
-
-        if keys[pygame.K_LEFT] or keys[pygame.K_a]:
-            player_movement.vel.x = -player_movement.speed
-            player_pos.direction = -1
-        if keys[pygame.K_RIGHT] or keys[pygame.K_d]:
-            player_movement.vel.x = player_movement.speed
-            player_pos.direction = 1
-
-        for event in event_list:
-            if event.type == pygame.KEYDOWN:
-                if (event.key == pygame.K_SPACE or event.key == pygame.K_w) and player_pos.on_ground:
-                    player_pos.on_ground = False
-                    player_movement.vel.y = self.player_settings["jump_vel"]
-
-                    # Jump effects
-                    for angle in range(-1, 1 + 1):
-                        self.particle_manager.add(
-                            RoundParticle()
-                            .builder()
-                            .at(pos=pygame.Vector2(player_pos.rect.midbottom), angle=angle * 30 + 90)
-                            .angular_speed(speed=1.3)
-                            .size(size=2)
-                            .color(color=(255, 255, 255))
-                            .lifespan(frames=40)
-                            .effect_fade(start_fade_frac=0.7)
-                            .effect_angular_slowdown(slowdown_factor=0.95, start_slowdown_frac=0.3)
-                            .build()
-                        )
+    def get_follow_path(
+        self,
+        entity: int,
+        follows_entity_close: ai_component.FollowsEntityClose,
+        pos: Position,
+        entity_followed_pos: Position,
+    ) -> Optional[Path]:
+        """
+        Gets the path to the followed entity. Entities that can't jump stay on their platform.
+        Everything following the player shares its flow field, which only gives the next step
+        """
+
+        if follows_entity_close.jump_vel is None:
+            return None
+        if follows_entity_close.entity_followed == self.player:
+            return self.player_flow_field.get_path(pos.rect)
+        return self.pathfinder.get_path(entity, pos.rect, entity_followed_pos.rect)
+
+    def follow_path(self, pos: Position, movement: Movement, path: Path, jump_vel: float):
+        """Moves towards the next step of a path, jumping if the step has to be jumped to"""
+
+        feet_tile = self.pathfinder.get_feet_tile(pos.rect)
+        if feet_tile not in self.pathfinder.nav_graph.edges:
+            # Mid-jump, mid-fall or about to walk off a ledge, so keep going the same way
+            movement.vel.x = movement.speed * pos.direction
+            return
+
+        step_idx = min(range(len(path)), key=lambda i: math.dist(path[i].tile, feet_tile))
+
+        if step_idx < len(path) - 1:
+            next_step = path[step_idx + 1]
+            pos.direction = math.copysign(1, next_step.tile[0] - path[step_idx].tile[0])
+            movement.vel.x = movement.speed * pos.direction
+        else:
+            next_step = path[-1]
+            x_dist = (next_step.tile[0] + 0.5) * TILE_WIDTH - pos.rect.centerx
+            movement.vel.x = movement.speed * math.copysign(1, x_dist) if abs(x_dist) > movement.speed else 0
+
+        if next_step.move == "jump" and path[step_idx].tile == feet_tile and pos.on_ground:
+            pos.on_ground = False
+            movement.vel.y = jump_vel
+
+    def handle_controls(self):
+        """Moves every player based on its controls"""
+
+        for entity, (controls, player_pos, player_movement) in self.world.get_components(Controls, Position, Movement):
+            player_movement.vel.x = player_movement.speed * controls.move
+            if controls.move != 0:
+                player_pos.direction = controls.move
+
+            if controls.jump and player_pos.on_ground:
+                player_pos.on_ground = False
+                player_movement.vel.y = self.player_settings.jump_vel
+
+                # Jump effects
+                for angle in range(-1, 1 + 1):
+                    self.particle_manager.add(
+                        RoundParticle()
+                        .builder()
+                        .at(pos=pygame.Vector2(player_pos.rect.midbottom), angle=angle * 30 + 90)
+                        .angular_speed(speed=1.3)
+                        .size(size=2)
+                        .color(color=(255, 255, 255))
+                        .lifespan(frames=40)
+                        .effect_fade(start_fade_frac=0.7)
+                        .effect_angular_slowdown(slowdown_factor=0.95, start_slowdown_frac=0.3)
+                        .build()
+                    )
+            controls.jump = False
 
     def process(self):
-        self.handle_player_keys(core.event.get())
+        self.handle_controls()
 
         for entity, (pos, movement) in self.world.get_components(Position, Movement):
+            # Far away entities are ticked less often (with catch-up DT) or not at all
+            dt = self.activity_dt(entity, pos.rect)
+            if dt is None:
+                continue
+
             # Apply gravity
             # Cap vel so it doesn't just fly straight through the tiles
-            movement.vel.y += movement.gravity_acc.y / 2 * core.dt.dt
+            movement.vel.y += movement.gravity_acc.y / 2 * dt
             movement.vel.y = min(movement.vel.y, 170)
 
-            if entity == self.player:
+            if self.world.has_component(entity, Controls):
                 continue
 
             # AI: Follow entity closely
@@ -84,35 +148,41 @@ class MovementSystem(System):
                 if entity_state.state == entity_state.Patrol:
                     # Patrol if and ONLY if:
                     # 1. The entity following is out of range of it OR
-                    # 2. The entity following is on a different y coordinate than itself
+                    # 2. The entity following is on a different y coordinate than itself, with no path to it
 
                     entity_state.state.patrol(self.tilemap, pos, movement)
 
-                    if (
-                        pos.in_range(entity_followed_pos.tile_pos, follows_entity_close.follow_range)
-                        and entity_followed_pos.tile_pos.y == pos.tile_pos.y
+                    if pos.in_range(entity_followed_pos.tile_pos, follows_entity_close.follow_range) and (
+                        entity_followed_pos.tile_pos.y == pos.tile_pos.y
+                        or self.get_follow_path(entity, follows_entity_close, pos, entity_followed_pos) is not None
                     ):
                         # print(f"Entity {entity} switched to follow")
                         entity_state.state = entity_state.Follow
 
                 elif entity_state.state == entity_state.Follow:
                     # Follow entity if and ONLY if:
-                    # 1. The entity's tile y coordinate is the same as itself's AND
+                    # 1. The entity's tile y coordinate is the same as itself's, OR there is a path to it AND
                     # 2. The distance from entity to itself is less than 10, in tile space
 
-                    pos.direction = math.copysign(1, entity_followed_pos.pos.x - pos.pos.x)
-                    movement.vel.x = movement.speed * pos.direction
+                    path = None
+                    if entity_followed_pos.tile_pos.y != pos.tile_pos.y:
+                        path = self.get_follow_path(entity, follows_entity_close, pos, entity_followed_pos)
 
-                    if (
-                        not pos.in_range(entity_followed_pos.tile_pos, follows_entity_close.follow_range)
-                        or entity_followed_pos.tile_pos.y != pos.tile_pos.y
+                    if path is not None:
+                        self.follow_path(pos, movement, path, follows_entity_close.jump_vel)
+                    else:
+                        pos.direction = math.copysign(1, entity_followed_pos.pos.x - pos.pos.x)
+                        movement.vel.x = movement.speed * pos.direction
+
+                    if not pos.in_range(entity_followed_pos.tile_pos, follows_entity_close.follow_range) or (
+                        entity_followed_pos.tile_pos.y != pos.tile_pos.y and path is None
                     ):
                         # print(f"Entity {entity} switched to patrol")
                         entity_state.state = entity_state.Patrol
-                    elif self.about_to_fall(pos):
+                    elif path is None and self.about_to_fall(pos):
                         # print(f"Entity {entity} switched to flee")
                         entity_state.state = entity_state.Flee
-                        entity_state.state.flee_start_time = core.time.get_ticks()
+                        entity_state.state.flee_timer.start()
                         pos.direction *= -1
 
                 elif entity_state.state == entity_state.Flee:
@@ -121,10 +191,7 @@ class MovementSystem(System):
 
                     movement.vel.x = entity_state.state.flee_speed * pos.direction
 
-                    if (
-                        core.time.get_ticks() - entity_state.state.flee_start_time
-                        > entity_state.state.flee_time * 1000
-                    ):
+                    if entity_state.state.flee_timer.ready:
                         entity_state.state = entity_state.Patrol
                     if self.about_to_fall(pos):
                         # Just go back and forth until timer expires
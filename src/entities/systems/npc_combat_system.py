@@ -10,9 +10,8 @@ from __future__ import annotations
 
 import math
 
-from src import core, pygame
-from src.entities.components import (ai_component, item_component,
-                                     projectile_component)
+from src import pygame
+from src.entities.components import ai_component, item_component
 from src.entities.components.component import Health, Inventory, Position
 from src.entities.systems.system import System
 
@@ -21,10 +20,35 @@ class NPCCombatSystem(System):
     def __init__(self, level_state):
         super().__init__(level_state)
 
+        self.subscribe("settings_changed", self.on_settings_changed)
+
+    def on_settings_changed(self, changed_keys: list[str]):
+        for entity, mob_settings in self.changed_mobs(changed_keys):
+            melee_attack = self.world.try_component(entity, ai_component.MeleeAttack)
+            if melee_attack is not None:
+                melee_attack.attack_cooldown = mob_settings.attack_cooldown
+                melee_attack.cooldown.duration = melee_attack.attack_cooldown * 1000
+                melee_attack.damage = mob_settings.attack_damage
+                melee_attack.collision = mob_settings.attack_collision
+
+            # Weapons of mobs that hold them, e.g the simple melee enemy's sword
+            inventory = self.world.try_component(entity, Inventory)
+            if inventory is None or entity == self.player:
+                continue
+            for item_entity in inventory.inventory:
+                if item_entity is not None and self.world.has_component(item_entity, item_component.MeleeWeapon):
+                    item = self.world.component_for_entity(item_entity, item_component.Item)
+                    melee_weapon = self.world.component_for_entity(item_entity, item_component.MeleeWeapon)
+                    item.cooldown = mob_settings.attack_cooldown
+                    melee_weapon.attack_damage = mob_settings.attack_damage
+
     def process(self):
         # TODO: Rethink AI system completely soon (TM)
 
         for entity, pos in self.world.get_component(Position):
+            if self.activity_dt(entity, pos.rect) is None:
+                continue
+
             # Non-player to entity (including player) damage interaction
             # FOR NOW! SUPER INEFFICIENT
             for nested_entity, (nested_pos, nested_health) in self.world.get_components(Position, Health):
@@ -41,15 +65,11 @@ class NPCCombatSystem(System):
                         else:
                             conditional = pos.in_range(nested_pos.tile_pos, melee_attack.attack_range)
 
-                        if (
-                            conditional
-                            and core.time.get_ticks() - melee_attack.last_attacked
-                            > melee_attack.attack_cooldown * 1000
-                        ):
+                        if conditional and melee_attack.cooldown.ready:
                             self.camera.start_shake(10)
 
                             nested_health.hp -= melee_attack.damage
-                            melee_attack.last_attacked = core.time.get_ticks()
+                            melee_attack.cooldown.start()
 
                     elif self.world.has_component(entity, ai_component.MeleeWeaponAttack):
                         melee_weapon_attack = self.world.component_for_entity(entity, ai_component.MeleeWeaponAttack)
@@ -58,7 +78,7 @@ class NPCCombatSystem(System):
 
                         if (
                             pos.in_range(nested_pos.tile_pos, melee_weapon_attack.attack_range)
-                            and core.time.get_ticks() - inventory.last_used > equipped_item.cooldown * 1000
+                            and inventory.cooldown.ready
                         ):
                             equipped_item.use(inventory)
 
@@ -112,19 +132,15 @@ class NPCCombatSystem(System):
                         #     if rect.bottom < a * ((rect.left + rect.right) / 2) ** 2 + b * ((rect.left + rect.right) / 2) < rect.top:
                         #         print("!")
 
-                        if core.time.get_ticks() - range_attack.last_attacked > range_attack.attack_cooldown * 1000:
-                            self.world.create_entity(
-                                projectile_component.Projectile(
-                                    vel=v,
-                                    angle=-theta if x_target > 0 else math.pi * 2 + (-math.pi - theta),
-                                    damage=1,
-                                    gravity=g,
-                                    shot_by=entity,
-                                ),
-                                projectile_component.ProjectilePosition(
-                                    pygame.Vector2(target_pos.x - x_target, target_pos.y + y_target)
-                                ),
-                                projectile_component.ProjectileGraphics(self.imgs["projectiles/arrows_sprite"]),
+                        if range_attack.cooldown.ready:
+                            self.projectile_manager.spawn(
+                                pygame.Vector2(target_pos.x - x_target, target_pos.y + y_target),
+                                vel=v,
+                                angle=-theta if x_target > 0 else math.pi * 2 + (-math.pi - theta),
+                                damage=1,
+                                sprite=self.imgs["projectiles/arrows_sprite"],
+                                shot_by=entity,
+                                gravity=g,
                             )
 
-                            range_attack.last_attacked = core.time.get_ticks()
+                            range_attack.cooldown.start()
@@ -11,8 +11,8 @@ from typing import TYPE_CHECKING
 
 import pygame
 
-from src import utils
-from src.common import HEIGHT, IMG_DIR, WIDTH
+from src import common, utils
+from src.common import IMG_DIR
 from src.display.particle import ImageParticle
 from src.entities.components import tile_component
 from src.entities.systems.system import System
@@ -39,15 +39,20 @@ class ParticleGenSystem(System):
 
             self.particle_manager.create_wind_particle(
                 pygame.Vector2(
-                    random.randint(self.camera.camera.x, self.camera.camera.x + WIDTH),
-                    random.randint(self.camera.camera.y, self.camera.camera.y + HEIGHT),
+                    random.randint(self.camera.camera.x, self.camera.camera.x + common.WIDTH),
+                    random.randint(self.camera.camera.y, self.camera.camera.y + common.HEIGHT),
                 ),
                 self.wind_gusts,
             )
 
     def create_tree_particles(self):
         for entity, (tile, tile_deco) in self.world.get_components(tile_component.Tile, tile_component.Decoration):
-            if random.random() < 0.025:
+            dt = self.activity_dt(entity, tile.rect)
+            if dt is None:
+                continue
+
+            # Catch-up DT keeps the rate the same for trees ticked less often
+            if random.random() < 0.025 * dt:
                 self.particle_manager.create_wind_particle(
                     pygame.Vector2(
                         random.randint(tile.rect.x, tile.rect.x + tile.rect.width),
@@ -66,7 +71,9 @@ class ParticleGenSystem(System):
                     pygame.Vector2(
                         # MAGIC NUMBERS - DON'T QUESTION
                         # Gist: Spawns clouds at appropriate pos outside of screen
-                        WIDTH + (self.camera.camera.x + WIDTH) * self.cloud_parallax + random.randint(-300, 400),
+                        common.WIDTH
+                        + (self.camera.camera.x + common.WIDTH) * self.cloud_parallax
+                        + random.randint(-300, 400),
                         self.camera.camera.y * self.cloud_parallax + random.randint(-75, 125),
                     )
                 )
@@ -8,93 +8,51 @@ This file defines the projectile system, used to move and handle projectiles
 
 from __future__ import annotations
 
-import math
-import random
+import numpy as np
 
-from src import pygame, utils
+from src import pygame
 from src.display.particle import RoundParticle
-from src.entities.components import component, projectile_component
+from src.entities.components import component
 from src.entities.systems.system import System
 
 
 class ProjectileSystem(System):
-    def process(self):
-        # HEAVILY BUGGY IMPLEMENTATION: WILL WORK ON IT MORE
-
-        for entity, (projectile, projectile_pos, projectile_graphics,) in self.world.get_components(
-            projectile_component.Projectile,
-            projectile_component.ProjectilePosition,
-            projectile_component.ProjectileGraphics,
-        ):
-            # Update t
-            projectile.t += 1
-
-            # Update position
-            rel_x, rel_y = projectile.rel_x(projectile.t), projectile.rel_y(projectile.t)
-            projectile_pos.pos.x = projectile_pos.spawn_pos.x + rel_x
-            projectile_pos.pos.y = projectile_pos.spawn_pos.y + rel_y
-
-            projectile_pos.rect = pygame.Rect(*projectile_pos.pos, *projectile_graphics.size)
-            projectile_pos.tile_pos = utils.pixel_to_tile(projectile_pos.pos)
-
-            projectile_rotate_angle = 180 + math.degrees(
-                math.atan2(
-                    rel_y - projectile.rel_y(projectile.t - 1),
-                    rel_x - projectile.rel_x(projectile.t - 1),
+    def create_trail_particles(self):
+        # Only visible projectiles leave trails, so huge volleys don't flood the particle manager
+        visible = self.projectile_manager.visible()
+        trailing = visible[np.random.random(len(visible)) < 0.2]
+
+        for idx in trailing:
+            pos = pygame.Vector2(*self.projectile_manager.pos[idx])
+            rect = pygame.Rect(pos, self.projectile_manager.size[idx])
+
+            for i in range(-1, 2):
+                self.particle_manager.add(
+                    RoundParticle()
+                    .builder()
+                    .size(2)
+                    .color((255, 255, 255))
+                    .at(pygame.Vector2(rect.bottomright), angle=(90 - i * 5))
+                    .angular_speed(1)
+                    .lifespan(20)
+                    .effect_fade(0.6)
+                    .build()
                 )
-            )
-
-            # Update image with angle
-            projectile_graphics.current_img, _ = utils.rot_center(
-                projectile_graphics.original_img,
-                180 - projectile_rotate_angle
-                if projectile.vel_dir == 1
-                else projectile_rotate_angle * projectile.vel_dir,
-                *projectile_pos.pos,
-            )
 
-            if random.random() < 0.2:
-                for i in range(-1, 2):
-                    self.particle_manager.add(
-                        RoundParticle()
-                        .builder()
-                        .size(2)
-                        .color((255, 255, 255))
-                        .at(
-                            pygame.Vector2(projectile_pos.rect.bottomright)
-                            if projectile_rotate_angle > 0
-                            else projectile_pos.pos,
-                            angle=(90 - i * 5),
-                        )
-                        .angular_speed(1)
-                        .lifespan(20)
-                        .effect_fade(0.6)
-                        .build()
-                    )
-
-            # Handle projectile to entity collision
-            for nested_entity, (nested_pos, nested_health) in self.world.get_components(
-                component.Position, component.Health
-            ):
-                if projectile.shot_by == nested_entity:
-                    continue
+    def process(self):
+        # Positions and angles of every projectile are computed in one pass
+        self.projectile_manager.update()
 
-                if nested_pos.rect.colliderect(projectile_pos.rect):
-                    nested_health.hp -= projectile.damage
-                    self.world.delete_entity(entity)
-                    break
+        # Handle projectile to entity collision: only the hits go back to the ECS
+        for entity, (pos, health) in self.world.get_components(component.Position, component.Health):
+            damage = self.projectile_manager.collide(entity, pos.rect)
+            if damage:
+                health.hp -= damage
 
-            # Delete in out-of-bounds area / collision
-            if projectile_pos.pos.y > self.tilemap.height:
-                self.world.delete_entity(entity)
+        self.create_trail_particles()
 
-            neighboring_tile_rects = self.tilemap.get_unwalkable_rects(
-                self.tilemap.get_neighboring_tile_entities(2, projectile_pos)
-            )
-            for neighboring_tile_rect in neighboring_tile_rects:
-                if neighboring_tile_rect.colliderect(projectile_pos.rect):
-                    self.world.delete_entity(entity)
-                    break
+        # Delete in out-of-bounds area / collision
+        self.projectile_manager.cull()
 
         """if random.random() < 0.01:
             for _ in range(1):
@@ -107,12 +65,11 @@ class ProjectileSystem(System):
                 theta = math.atan(
                     (v**2 + math.sqrt(v**4 - g * (g * x_target**2 + 2 * y_target * v**2))) / (g * x_target)
                 )
-                self.world.create_entity(
-                    projectile_component.Projectile(
-                        vel=v, angle=-theta if x_target > 0 else -math.pi - theta, damage=10, gravity=g
-                    ),
-                    projectile_component.ProjectilePosition(
-                        pygame.Vector2(player_pos.pos.x - x_target, player_pos.pos.y + y_target)
-                    ),
-                    projectile_component.ProjectileGraphics(self.imgs["items/arrows_sprite"]),
+                self.projectile_manager.spawn(
+                    pygame.Vector2(player_pos.pos.x - x_target, player_pos.pos.y + y_target),
+                    vel=v,
+                    angle=-theta if x_target > 0 else -math.pi - theta,
+                    damage=10,
+                    sprite=self.imgs["projectiles/arrows_sprite"],
+                    gravity=g,
                 )"""
@@ -10,8 +10,7 @@ from typing import TYPE_CHECKING, Optional
 
 import pygame
 
-from src import core, utils
-from src.common import RES, screen
+from src import common, core, utils
 from src.display.transition import (DarkenTransition, EaseTransition,
                                     FadeTransition)
 from src.display.widgets.button import DefaultButton
@@ -32,7 +31,7 @@ class ItemInfoSystem(System):
         self.item: Optional[Entity] = None
         self.subscribe("player_get_item", self.on_player_get_item)
 
-        self.screen = pygame.Surface(RES, pygame.SRCALPHA)
+        self.screen = pygame.Surface(common.UI_RES, pygame.SRCALPHA)
         self.title_font = utils.load_font(60)
 
         self.transition_duration = 800
@@ -54,7 +53,7 @@ class ItemInfoSystem(System):
         self.ok_button = self.ui.add_widget(
             DefaultButton(
                 self.ui,
-                (600, 600),
+                (common.UI_WIDTH - 360, common.UI_HEIGHT - 200),
                 (100, 50),
                 text="Okay",
                 text_size=32,
@@ -123,4 +122,8 @@ class ItemInfoSystem(System):
             # Separately handles widget
             self.ui.handle_widget(self.ok_button)
 
-            screen.blit(self.screen, (0, 0))
+            common.ui_screen.blit(self.screen, (0, 0))
+
+            # The whole screen fades while transitioning. Afterwards, only the button changes
+            if self.darken_game.transitioning or self.fade_self.transitioning:
+                core.dirty_rects.mark_all()
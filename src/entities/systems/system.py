@@ -7,11 +7,15 @@ This file contains the base class of all systems
 """
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, Callable, TypeVar
+from typing import TYPE_CHECKING, Callable, Iterator, Optional, TypeVar, Union
 
 import esper
 
+from src import pygame, schema
 from src.display.widgets.widget import Widget
+from src.entities.components.component import Graphics
+from src.schema import MobSettings, PlayerSettings
+from src.types import Entity
 
 if TYPE_CHECKING:
     from src.states.level_state import LevelState
@@ -21,10 +25,6 @@ _C = TypeVar("_C")
 
 
 class System(esper.Processor):
-    # For system-to-system interaction
-    _send_to_graphics_widgets: list[tuple[Widget, str]] = []
-    _listeners: dict[str, list[Callable]] = {}
-
     def __init__(self, level_state: LevelState):
         """
         A base class for all ECS systems (E.g graphics system, collision system)
@@ -39,15 +39,26 @@ class System(esper.Processor):
         self.player = self.level.player
 
         self.settings = self.level.settings
+        self.records = self.level.records
         self.imgs = self.level.imgs
         self.camera = self.level.camera
         self.tilemap = self.level.tilemap
         self.particle_manager = self.level.particle_manager
         self.effect_manager = self.level.effect_manager
+        self.projectile_manager = self.level.projectile_manager
+        self.debug_overlay = self.level.debug_overlay
+        self.activity_scheduler = self.level.activity_scheduler
+        self.pathfinder = self.level.pathfinder
+        self.player_flow_field = self.level.player_flow_field
 
         self.world: esper.World = self.world
         self.ui = self.level.ui
 
+        # For system-to-system interaction. Shared by the systems of a level, but not between levels, since another
+        # level can be loading in the background
+        self._send_to_graphics_widgets: list[tuple[Widget, str]] = self.level.graphics_widgets
+        self._listeners: dict[str, list[Callable]] = self.level.system_listeners
+
     def send_to_graphics(self, *widgets: Widget, when: str = "post_ui"):
         """
         Sends multiple widgets to the graphics system to be processed
@@ -85,6 +96,36 @@ class System(esper.Processor):
         for func in self._listeners.get(event, []):
             func(*args, **kwargs)
 
+    @staticmethod
+    def settings_changed(changed_keys: list[str], key: str) -> bool:
+        """
+        Checks whether a setting was reloaded, i.e it's in one of the settings files that changed
+
+        Args:
+            changed_keys: Keys of the changed settings files, e.g "mobs/enemy/melee"
+            key: The setting, e.g "mobs/enemy/melee/walker"
+
+        Returns:
+            Whether the setting was reloaded
+        """
+
+        return schema.is_changed(key, changed_keys)
+
+    def changed_mobs(self, changed_keys: list[str]) -> Iterator[tuple[Entity, Union[MobSettings, PlayerSettings]]]:
+        """
+        Gets the mobs whose settings were reloaded. A mob's settings are under the same key as its animations
+
+        Args:
+            changed_keys: Keys of the changed settings files
+
+        Returns:
+            An iterator of the mobs and their new settings
+        """
+
+        for entity, graphics in self.world.get_component(Graphics):
+            if graphics.asset_key in self.records and self.settings_changed(changed_keys, graphics.asset_key):
+                yield entity, self.records[graphics.asset_key]
+
     def component_for_player(self, component: type[_C]) -> _C:
         """
         Gets a component of a player since it is so common
@@ -98,6 +139,20 @@ class System(esper.Processor):
 
         return self.world.component_for_entity(self.player, component)
 
+    def activity_dt(self, entity: int, rect: pygame.Rect) -> Optional[float]:
+        """
+        Gets the DT this system should tick an entity with, based on its distance from the camera
+
+        Args:
+            entity: The entity ID
+            rect: The entity's rect
+
+        Returns:
+            The DT to tick the entity with, or None if it should be skipped this frame
+        """
+
+        return self.activity_scheduler.get_dt(self, entity, rect)
+
     def process(self):
         """Processes stuff (sorry that's the best I got :( )"""
 
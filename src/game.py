@@ -8,45 +8,153 @@ This file defines the Game class, which contains vital data for states and is us
 from __future__ import annotations
 
 import json
+from typing import Optional
 
 from src import common, core, pygame
+from src.bootstrap import Bootstrap
 from src.common import IMG_DIR, SETTINGS_DIR
+from src.display.post_processing import (ColorGradePass, DamageFlashPass,
+                                         PostProcessor, VignettePass)
 # from src.display.shaders import ShaderManager
-from src.types import JSONSerializable
-from src.utils.loaders import DirLoader
-
-pygame.init()
-
-from src.display.ui import UI
+from src.display.widgets.health_bar import PlayerHealthBar
+from src.display.widgets.interactable_tiles import SignDialogue, TileHover
+from src.entities.components.tile_component import GrassBlades
+from src.schema import SettingsError, SettingsRecords
 from src.states.level_state import LevelState
 from src.states.state import State
+from src.states.state_manager import StateManager
+from src.types import JSONSerializable
+from src.utils.loaders import DirLoader, DirWatcher
+
+# Classes with assets shared by every instance, which get loaded once the display exists
+SHARED_ASSET_CLASSES = (TileHover, SignDialogue, PlayerHealthBar, GrassBlades)
 
 
 class Game:
     def __init__(self):
-        self.clock = pygame.time.Clock()
-
-        # UI DRAWING MUST BE HANDLED IN THE STATE CODE DUE TO CONFLICTS FROM LEVEL_STATE
-        # No camera at start of game
-        self.ui = UI()
-
-        # Shader manager to handle shaders and actually draw proxy screen onto actual screen
-        # self.shader_manager = ShaderManager()
-
-        # Loaders
-        self.settings: DirLoader[JSONSerializable] = DirLoader(SETTINGS_DIR, ".json", json.load)
-        self.imgs: DirLoader[pygame.Surface] = DirLoader(
-            IMG_DIR, ".png", lambda filename: pygame.image.load(filename).convert_alpha()
-        )
-
-        # States
-        self.state: State = LevelState(self)
-        self.loaded_states: dict[type[State], State] = {LevelState: self.state}
+        # Nothing is created when the game is imported. Everything happens here instead, in timed phases
+        self.bootstrap = Bootstrap()
+
+        with self.bootstrap.phase("pygame"):
+            pygame.init()
+            self.clock = pygame.time.Clock()
+
+        with self.bootstrap.phase("settings"):
+            self.settings: DirLoader[JSONSerializable] = DirLoader(SETTINGS_DIR, ".json", json.load)
+            # Bad gameplay settings fail here, rather than when something spawns
+            self.records = SettingsRecords(self.settings)
+
+            # Reloads settings files when they're saved, so tuning doesn't need a restart
+            self.settings_watcher: Optional[DirWatcher] = None
+            if self.settings["game/hot_reload"]:
+                self.settings_watcher = DirWatcher(self.settings, self.settings["game/hot_reload_interval"])
+
+        with self.bootstrap.phase("display"):
+            common.init_display(self.settings["display"])
+            core.dirty_rects.screen_rect = common.screen.get_rect()
+
+            # Where the render target gets upscaled to. With uneven scales, the leftover edge of the window stays
+            # black
+            self.upscale_target = common.window.subsurface(
+                (0, 0, common.WIDTH * common.RENDER_SCALE, common.HEIGHT * common.RENDER_SCALE)
+            )
+
+            # Set caption
+            self.game_name = self.settings["game/name"]
+            pygame.display.set_caption(self.game_name)
+
+        with self.bootstrap.phase("images"):
+            self.imgs: DirLoader[pygame.Surface] = DirLoader(
+                IMG_DIR, ".png", lambda file: pygame.image.load(file).convert_alpha(), "rb"
+            )
+
+        with self.bootstrap.phase("shared assets"):
+            for asset_class in SHARED_ASSET_CLASSES:
+                asset_class.load_assets()
+
+        with self.bootstrap.phase("post-processing"):
+            # Shader manager to handle shaders and actually draw proxy screen onto actual screen
+            # self.shader_manager = ShaderManager()
+
+            # CPU stand-in for the shader manager, which doesn't need an OpenGL context
+            self.post_processor = self.create_post_processor()
+
+        # Creates the ECS world, loads the map and spawns everything. Later states are loaded in the background
+        with self.bootstrap.phase("level"):
+            self.states = StateManager(self)
+            self.states.load_now(LevelState)
         self.running = True
 
-        # Set caption
-        self.game_name = self.settings["game/name"]
-        pygame.display.set_caption(self.game_name)
+        # Only pushes the changed regions of the screen to the display, if enabled. Native resolution UI on top of
+        # an upscaled world isn't tracked, so everything gets pushed then
+        core.dirty_rects.enabled = self.settings["game/dirty_rects"] and common.ui_screen is common.screen
+        core.dirty_rects.max_rects = self.settings["game/max_dirty_rects"]
+
+        if self.settings["game/startup_report"]:
+            print(self.bootstrap.report())
+
+    def create_post_processor(self) -> PostProcessor:
+        """
+        Creates the post-processor and its passes from the post-processing settings
+
+        Returns:
+            The post-processor
+        """
+
+        post_processing_settings = self.settings["post_processing"]
+        post_processor = PostProcessor(post_processing_settings["retry_interval"])
+        if not post_processing_settings["enabled"]:
+            return post_processor
+
+        vignette_settings = post_processing_settings["vignette"]
+        if vignette_settings["enabled"]:
+            post_processor.add_pass(
+                VignettePass(
+                    vignette_settings["strength"],
+                    vignette_settings["inner_radius"],
+                    vignette_settings["budget"],
+                )
+            )
+
+        color_grade_settings = post_processing_settings["color_grade"]
+        if color_grade_settings["enabled"]:
+            post_processor.add_pass(
+                ColorGradePass.from_curve(
+                    color_grade_settings["contrast"],
+                    color_grade_settings["brightness"],
+                    color_grade_settings["tint"],
+                    color_grade_settings["budget"],
+                )
+            )
+
+        damage_flash_settings = post_processing_settings["damage_flash"]
+        if damage_flash_settings["enabled"]:
+            post_processor.add_pass(
+                DamageFlashPass(
+                    damage_flash_settings["color"],
+                    damage_flash_settings["max_alpha"],
+                    damage_flash_settings["duration"],
+                    damage_flash_settings["budget"],
+                )
+            )
+
+        return post_processor
+
+    @property
+    def state(self) -> State:
+        return self.states.current
+
+    def present(self):
+        """Upscales the render target into the window, then draws native resolution UI over it"""
+
+        if common.RENDER_SCALE == 1:
+            return
+
+        pygame.transform.scale(common.screen, self.upscale_target.get_size(), self.upscale_target)
+
+        if common.ui_screen is not common.screen:
+            common.window.blit(common.ui_screen, (0, 0))
+            common.ui_screen.fill((0, 0, 0, 0))
 
     def run(self):
         while self.running:
@@ -54,35 +162,51 @@ class Game:
             events = pygame.event.get()
             core.event.events = events
             core.dt.dt = self.clock.tick(common.FPS) / 1000
+            core.timers.update()
 
             pygame.display.set_caption(f"{self.game_name} - {self.clock.get_fps():.3f} FPS")
 
+            if self.settings_watcher is not None:
+                changed_keys = self.settings_watcher.poll()
+                if changed_keys:
+                    try:
+                        self.records.compile(changed_keys)
+                    except SettingsError as e:
+                        # Keeps the old records until the settings are fixed
+                        print(f"Couldn't apply reloaded settings: {e}")
+                    else:
+                        self.states.settings_changed(changed_keys)
+
             # Event loop
             for event in events:
                 if event.type == pygame.QUIT:
                     self.running = False
 
-                # State handles event
-                self.state.handle_event(event)
+                # State handles event. Nothing is handled behind the loading screen
+                if self.states.loading is None:
+                    self.state.handle_event(event)
 
-            # State runs other functions that get called once a frame
-            self.state.update()
+            # Finishes loading states on the main thread, a slice at a time
+            self.states.update()
 
-            # State handles drawing
-            self.state.draw()
+            if self.states.loading is None:
+                # State runs other functions that get called once a frame
+                self.state.update()
+
+                # State handles drawing
+                self.state.draw()
+
+            # Draws the loading screen or transition over the state
+            self.states.draw()
 
             # Renders screen
             # self.shader_manager.render()
-            pygame.display.update()
+            self.post_processor.process(common.screen)
+            self.present()
+            core.dirty_rects.update()
 
             # State detector/switcher
             if self.state.next_state != type(self.state):
-                old_state = self.state
-                if self.state.next_state not in self.loaded_states:
-                    # Instantiate new state
-                    self.loaded_states[self.state.next_state] = self.state.next_state(self)
-                self.state = self.loaded_states[self.state.next_state]
-
-                old_state.next_state = type(old_state)  # Resets next state to self
+                self.states.change_state(self.state.next_state)
 
         pygame.quit()
@@ -0,0 +1,150 @@
+"""
+This file is a part of the source code for rpg-tile-game
+This project has been licensed under the MIT license.
+Copyright (c) 2022-present SSS-Says-Snek
+
+This file contains the game client, which sends input to a server and rebuilds what's around its player from the
+server's snapshots
+"""
+from __future__ import annotations
+
+import socket
+import time
+from typing import Callable, Optional
+
+import numpy as np
+
+from src.entities.components.component import Controls
+from src.net import protocol
+from src.types import Entity
+
+
+class GameClient:
+    def __init__(self, address: tuple[str, int], max_states: int = 64):
+        """
+        A client of a game server
+
+        Args:
+            address: Address of the server
+            max_states: Number of received states to keep, as bases for the snapshots the server sends
+        """
+
+        self.address = address
+        self.max_states = max_states
+
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.setblocking(False)
+
+        self.player: Optional[Entity] = None
+        self.tick_rate = 0
+
+        self.strings: list[str] = []
+        # Entity states of every tick received, sorted by entity
+        self.states: dict[int, np.ndarray] = {}
+        self.tick = protocol.NO_TICK
+        self.projectiles = np.empty(0, dtype=protocol.PROJECTILE_STATE_DTYPE)
+
+        self.bytes_received = 0
+
+    @property
+    def entities(self) -> np.ndarray:
+        """The entity states of the latest tick"""
+
+        return self.states.get(self.tick, np.empty(0, dtype=protocol.ENTITY_STATE_DTYPE))
+
+    def connect(self, timeout: float = 2, poll: Optional[Callable[[], None]] = None) -> bool:
+        """
+        Says hello until the server answers
+
+        Args:
+            timeout: Seconds to wait for the server
+            poll: Called while waiting, e.g to step a server in the same process
+
+        Returns:
+            Whether the server answered
+        """
+
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            self.socket.sendto(protocol.HELLO.pack(protocol.MESSAGE_HELLO), self.address)
+            if poll is not None:
+                poll()
+            else:
+                time.sleep(0.05)
+
+            self.receive()
+            if self.player is not None:
+                return True
+        return False
+
+    def disconnect(self):
+        self.socket.sendto(protocol.BYE.pack(protocol.MESSAGE_BYE), self.address)
+        self.socket.close()
+
+    def send_input(self, controls: Controls):
+        """Sends the controls of the player, clearing its jump and item use once they're sent"""
+
+        self.socket.sendto(protocol.pack_input(self.tick, controls), self.address)
+        controls.jump = False
+        controls.use = False
+        controls.hotbar_idx = None
+
+    def receive(self):
+        """Handles every message from the server"""
+
+        while True:
+            try:
+                data, address = self.socket.recvfrom(65536)
+            except (BlockingIOError, ConnectionResetError):
+                break
+            if address != self.address or not data:
+                continue
+
+            self.bytes_received += len(data)
+            if data[0] == protocol.MESSAGE_WELCOME:
+                _, self.player, self.tick_rate = protocol.WELCOME.unpack_from(data)
+            elif data[0] == protocol.MESSAGE_SNAPSHOT:
+                self.apply_snapshot(protocol.Snapshot.from_bytes(data))
+            elif data[0] == protocol.MESSAGE_BYE:
+                self.player = None
+
+    def apply_snapshot(self, snapshot: protocol.Snapshot):
+        # Snapshots arriving late are older than what's known already
+        if self.tick != protocol.NO_TICK and snapshot.tick <= self.tick:
+            return
+
+        if snapshot.base_tick == protocol.NO_TICK:
+            base = None
+        elif snapshot.base_tick in self.states:
+            base = self.states[snapshot.base_tick]
+        else:
+            # The base was forgotten, so the snapshot can't be decoded. The server sends a full one once it gets
+            # acknowledgements of ticks it doesn't remember sending either
+            return
+
+        del self.strings[snapshot.strings_start :]
+        self.strings.extend(snapshot.strings)
+
+        self.states[snapshot.tick] = protocol.apply_delta(base, snapshot)
+        self.tick = snapshot.tick
+        self.player = snapshot.player
+        self.projectiles = snapshot.projectiles
+
+        # Ticks before the base won't be bases anymore, since the server got an acknowledgement of a later one
+        if snapshot.base_tick != protocol.NO_TICK:
+            for tick in [tick for tick in self.states if tick < snapshot.base_tick]:
+                del self.states[tick]
+        while len(self.states) > self.max_states:
+            del self.states[min(self.states)]
+
+    def get_entity(self, entity: Entity) -> Optional[np.void]:
+        """Gets the latest state of an entity, if it's in view"""
+
+        entities = self.entities
+        idx = np.searchsorted(entities["entity"], entity)
+        if idx < len(entities) and entities["entity"][idx] == entity:
+            return entities[idx]
+        return None
+
+    def get_string(self, idx: int) -> Optional[str]:
+        return None if idx == protocol.NO_STRING else self.strings[idx]
@@ -0,0 +1,234 @@
+"""
+This file is a part of the source code for rpg-tile-game
+This project has been licensed under the MIT license.
+Copyright (c) 2022-present SSS-Says-Snek
+
+This file contains the messages servers and clients send each other over UDP
+
+Clients say hello, then send their input every tick, along with the last tick they got a snapshot of. Servers send
+each client a snapshot of the entities (and projectiles) around its player every tick, delta-encoded against the
+last snapshot the client acknowledged: only entity states that changed are sent, along with the entities that are
+gone. States are quantised (e.g positions to 1/8 of a pixel), so entities standing still don't change at all
+"""
+from __future__ import annotations
+
+import math
+import struct
+from typing import Optional
+
+import numpy as np
+
+from src import pygame
+from src.entities.components.component import Controls
+
+MESSAGE_HELLO = 1
+MESSAGE_WELCOME = 2
+MESSAGE_INPUT = 3
+MESSAGE_SNAPSHOT = 4
+MESSAGE_BYE = 5
+
+# Ticks that don't exist, e.g the base of a full snapshot
+NO_TICK = 0xFFFFFFFF
+NO_HOTBAR_IDX = 0xFF
+NO_STRING = 0xFFFF
+
+# Positions are sent in fixed point, with this many steps per pixel
+POSITION_SCALE = 8
+# Animations an entity can be playing, facing its direction
+ANIMATIONS = ("idle", "move")
+
+INPUT_JUMP = 1
+INPUT_USE = 2
+
+HELLO = struct.Struct("<B")
+BYE = struct.Struct("<B")
+# Message type, player entity and tick rate
+WELCOME = struct.Struct("<BIH")
+# Message type, acknowledged tick, move, jump/use flags, hotbar index and aim position
+INPUT = struct.Struct("<BIbBBff")
+# Message type, tick, base tick, player entity, index of the first new string, bytes of new strings, and number of
+# changed entities, removed entities and projectiles
+SNAPSHOT_HEADER = struct.Struct("<BIIIHIHHH")
+
+ENTITY_STATE_DTYPE = np.dtype(
+    [
+        ("entity", "<u4"),
+        ("x", "<i4"),
+        ("y", "<i4"),
+        ("hp", "<u2"),
+        ("max_hp", "<u2"),
+        ("sprite", "<u2"),  # String table index of the graphics' asset key
+        ("animation", "u1"),
+        ("direction", "i1"),
+    ]
+)
+REMOVED_DTYPE = np.dtype([("entity", "<u4")])
+PROJECTILE_STATE_DTYPE = np.dtype([("x", "<i4"), ("y", "<i4"), ("angle", "u1"), ("sprite", "<u2")])
+
+
+def quantise_position(pos: np.ndarray) -> np.ndarray:
+    return np.round(pos * POSITION_SCALE).astype(np.int32)
+
+
+def quantise_angle(angle: np.ndarray) -> np.ndarray:
+    return (np.round(angle / math.tau * 256).astype(np.int64) % 256).astype(np.uint8)
+
+
+def dequantise_angle(angle: np.ndarray) -> np.ndarray:
+    return angle.astype(np.float64) / 256 * math.tau
+
+
+def pack_input(ack_tick: int, controls: Controls) -> bytes:
+    """
+    Packs the controls of a player to send to a server
+
+    Args:
+        ack_tick: The last tick a snapshot was received for
+        controls: The controls
+
+    Returns:
+        The message
+    """
+
+    flags = (INPUT_JUMP if controls.jump else 0) | (INPUT_USE if controls.use else 0)
+    hotbar_idx = NO_HOTBAR_IDX if controls.hotbar_idx is None else controls.hotbar_idx
+    return INPUT.pack(MESSAGE_INPUT, ack_tick, controls.move, flags, hotbar_idx, controls.aim.x, controls.aim.y)
+
+
+def unpack_input(data: bytes, controls: Controls) -> int:
+    """
+    Applies input from a client to the controls of its player. Jumps and item uses are kept until they're handled,
+    in case more than one input arrives in a tick
+
+    Args:
+        data: The message
+        controls: The controls of the player
+
+    Returns:
+        The tick the client acknowledged
+    """
+
+    _, ack_tick, move, flags, hotbar_idx, aim_x, aim_y = INPUT.unpack_from(data)
+
+    controls.move = max(min(move, 1), -1)
+    controls.jump |= bool(flags & INPUT_JUMP)
+    controls.use |= bool(flags & INPUT_USE)
+    if hotbar_idx != NO_HOTBAR_IDX:
+        controls.hotbar_idx = hotbar_idx
+    if math.isfinite(aim_x) and math.isfinite(aim_y):
+        controls.aim.update(aim_x, aim_y)
+
+    return ack_tick
+
+
+class Snapshot:
+    def __init__(
+        self,
+        tick: int,
+        base_tick: int,
+        player: int,
+        strings_start: int,
+        strings: list[str],
+        changed: np.ndarray,
+        removed: np.ndarray,
+        projectiles: np.ndarray,
+    ):
+        """
+        A snapshot sent to a client
+
+        Args:
+            tick: The tick of the snapshot
+            base_tick: The tick the snapshot is a delta of, or NO_TICK for a full snapshot
+            player: The client's player entity
+            strings_start: String table index of the first new string
+            strings: The strings the client doesn't have yet
+            changed: The states of entities that changed since the base tick (or came into view)
+            removed: The entities that were removed since the base tick (or went out of view)
+            projectiles: Every projectile in view
+        """
+
+        self.tick = tick
+        self.base_tick = base_tick
+        self.player = player
+        self.strings_start = strings_start
+        self.strings = strings
+        self.changed = changed
+        self.removed = removed
+        self.projectiles = projectiles
+
+    def to_bytes(self) -> bytes:
+        strings_data = "\0".join(self.strings).encode() if self.strings else b""
+        return b"".join(
+            (
+                SNAPSHOT_HEADER.pack(
+                    MESSAGE_SNAPSHOT,
+                    self.tick,
+                    self.base_tick,
+                    self.player,
+                    self.strings_start,
+                    len(strings_data),
+                    len(self.changed),
+                    len(self.removed),
+                    len(self.projectiles),
+                ),
+                strings_data,
+                self.changed.astype(ENTITY_STATE_DTYPE, copy=False).tobytes(),
+                self.removed.astype(REMOVED_DTYPE, copy=False).tobytes(),
+                self.projectiles.astype(PROJECTILE_STATE_DTYPE, copy=False).tobytes(),
+            )
+        )
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> Snapshot:
+        (
+            _,
+            tick,
+            base_tick,
+            player,
+            strings_start,
+            strings_length,
+            num_changed,
+            num_removed,
+            num_projectiles,
+        ) = SNAPSHOT_HEADER.unpack_from(data)
+
+        offset = SNAPSHOT_HEADER.size
+        strings = data[offset : offset + strings_length].decode().split("\0") if strings_length > 0 else []
+        offset += strings_length
+
+        arrays = []
+        for dtype, count in (
+            (ENTITY_STATE_DTYPE, num_changed),
+            (REMOVED_DTYPE, num_removed),
+            (PROJECTILE_STATE_DTYPE, num_projectiles),
+        ):
+            arrays.append(np.frombuffer(data, dtype=dtype, count=count, offset=offset))
+            offset += dtype.itemsize * count
+
+        return cls(tick, base_tick, player, strings_start, strings, *arrays)
+
+
+def apply_delta(base: Optional[np.ndarray], snapshot: Snapshot) -> np.ndarray:
+    """
+    Applies a snapshot to the entity states of its base tick
+
+    Args:
+        base: The entity states of the base tick (sorted by entity), or None for full snapshots
+        snapshot: The snapshot
+
+    Returns:
+        The entity states of the snapshot's tick, sorted by entity
+    """
+
+    if base is None:
+        states = snapshot.changed
+    else:
+        gone = np.isin(base["entity"], np.concatenate([snapshot.removed["entity"], snapshot.changed["entity"]]))
+        states = np.concatenate([base[~gone], snapshot.changed])
+    return states[np.argsort(states["entity"], kind="stable")]
+
+
+def view_rect(pos: pygame.Vector2, radius: int) -> pygame.Rect:
+    """The area a client gets snapshots of, around its player"""
+
+    return pygame.Rect(pos.x - radius, pos.y - radius, radius * 2, radius * 2)
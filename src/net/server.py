@@ -0,0 +1,373 @@
+"""
+This file is a part of the source code for rpg-tile-game
+This project has been licensed under the MIT license.
+Copyright (c) 2022-present SSS-Says-Snek
+
+This file contains the game server, which runs a level without drawing it, for players connecting over UDP
+"""
+from __future__ import annotations
+
+import socket
+import time
+from typing import TYPE_CHECKING, Optional
+
+import numpy as np
+
+from src import core, pygame
+from src.entities import snapshot
+from src.entities.components.component import (Controls, Graphics, Health,
+                                               Inventory, Movement, Position)
+from src.net import protocol
+from src.types import Entity
+
+if TYPE_CHECKING:
+    from src.states.level_state import LevelState
+
+
+class ClientSession:
+    def __init__(self, address: tuple[str, int], player: Entity):
+        """
+        A client connected to the server
+
+        Args:
+            address: Address of the client
+            player: The client's player entity
+        """
+
+        self.address = address
+        self.player = player
+        self.last_heard = time.perf_counter()
+
+        # Entity states of the snapshots sent, and how many strings the client had once it got them
+        self.sent: dict[int, tuple[np.ndarray, int]] = {}
+        self.acked_tick = protocol.NO_TICK
+
+    def acknowledge(self, tick: int):
+        """Forgets the snapshots older than the acknowledged one, which won't be used as bases anymore"""
+
+        if tick == protocol.NO_TICK or tick not in self.sent:
+            return
+        if self.acked_tick == protocol.NO_TICK or tick > self.acked_tick:
+            self.acked_tick = tick
+            for old_tick in [old_tick for old_tick in self.sent if old_tick < tick]:
+                del self.sent[old_tick]
+
+
+class EntityGrid:
+    def __init__(self, states: np.ndarray, cell_size: int):
+        """
+        The entity states of a tick, bucketed by grid cell, so the entities in an area are found without checking
+        every entity
+
+        Args:
+            states: The entity states, in ENTITY_STATE_DTYPE
+            cell_size: Size of each cell, in pixels
+        """
+
+        self.cell_size = cell_size * protocol.POSITION_SCALE
+
+        # Cells are ordered by row, so each row of cells in an area is one slice
+        keys = self.get_keys(
+            states["y"].astype(np.int64) // self.cell_size, states["x"].astype(np.int64) // self.cell_size
+        )
+        order = np.argsort(keys, kind="stable")
+        self.keys = keys[order]
+        self.states = states[order]
+
+    @staticmethod
+    def get_keys(cell_y, cell_x):
+        # Entities off the left of the map are bucketed with the left-most cells
+        return (np.maximum(cell_y, 0) << 32) + np.clip(cell_x, 0, 0xFFFFFFFF)
+
+    def query(self, rect: pygame.Rect) -> np.ndarray:
+        """
+        Gets the states of the entities in a rect
+
+        Args:
+            rect: The rect, in pixels
+
+        Returns:
+            The states, sorted by entity
+        """
+
+        scale = protocol.POSITION_SCALE
+        left, top = rect.left * scale, rect.top * scale
+        right, bottom = rect.right * scale, rect.bottom * scale
+
+        # Entities above or left of the map are bucketed with the first row or column, so cells before them are
+        # clamped to it rather than looked up again
+        left_cell, right_cell = max(left // self.cell_size, 0), max(right // self.cell_size, 0)
+        top_cell, bottom_cell = max(top // self.cell_size, 0), max(bottom // self.cell_size, 0)
+        slices = []
+        for cell_y in range(top_cell, bottom_cell + 1):
+            start = np.searchsorted(self.keys, self.get_keys(cell_y, left_cell), side="left")
+            end = np.searchsorted(self.keys, self.get_keys(cell_y, right_cell), side="right")
+            slices.append(self.states[start:end])
+
+        states = np.concatenate(slices) if slices else self.states[:0]
+        states = states[(states["x"] >= left) & (states["x"] < right) & (states["y"] >= top) & (states["y"] < bottom)]
+        return states[np.argsort(states["entity"], kind="stable")]
+
+
+class GameServer:
+    def __init__(self, level_state: LevelState):
+        """
+        Steps a level at a fixed tick for clients connecting over UDP, without drawing it. Every client gets its own
+        player, controlled by the input it sends, and snapshots of what's around its player.
+        Configured in `settings/server.json`
+
+        Args:
+            level_state: The level state
+        """
+
+        self.level = level_state
+        self.world = self.level.world
+
+        server_settings = self.level.settings["server"]
+        self.tick_rate = server_settings["tick_rate"]
+        self.view_radius = server_settings["view_radius"]
+        self.cell_size = server_settings["cell_size"]
+        self.max_sent_snapshots = server_settings["max_sent_snapshots"]
+        self.timeout = server_settings["timeout"]
+
+        # Players are controlled by their clients
+        self.level.make_headless()
+        self.level.activity_scheduler.views = []
+
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind((server_settings["host"], server_settings["port"]))
+        self.socket.setblocking(False)
+
+        self.sessions: dict[tuple[str, int], ClientSession] = {}
+        self.tick = 0
+        self.running = True
+
+        # Asset keys of graphics and projectile sprites, which clients know by index
+        self.strings = snapshot.StringTable()
+        self.image_keys = {id(img): key for key, img in self.level.imgs.items()}
+        self.projectile_sprites = np.empty(0, dtype=np.uint16)
+
+    @property
+    def address(self) -> tuple[str, int]:
+        return self.socket.getsockname()
+
+    def connect(self, address: tuple[str, int]) -> ClientSession:
+        """Gives a new client a player. The first one gets the player the level made"""
+
+        if any(session.player == self.level.player for session in self.sessions.values()):
+            spawn_pos = self.world.component_for_entity(self.level.player, Position).original_pos
+            player = self.level.create_player(spawn_pos)
+            self.level.add_entity_widgets(player)
+        else:
+            player = self.level.player
+
+        session = self.sessions[address] = ClientSession(address, player)
+        self.socket.sendto(protocol.WELCOME.pack(protocol.MESSAGE_WELCOME, player, self.tick_rate), address)
+        return session
+
+    def disconnect(self, session: ClientSession):
+        """Removes a client, along with its player (unless it's the player the level made)"""
+
+        del self.sessions[session.address]
+        if session.player == self.level.player or not self.world.entity_exists(session.player):
+            return
+
+        inventory = self.world.component_for_entity(session.player, Inventory)
+        items = [item for item in inventory.inventory if item is not None]
+        snapshot.remove_entities(self.level, np.array([session.player, *items], dtype=np.int64))
+
+    def handle_messages(self):
+        while True:
+            try:
+                data, address = self.socket.recvfrom(2048)
+            except (BlockingIOError, ConnectionResetError):
+                break
+            if not data:
+                continue
+
+            session = self.sessions.get(address)
+            if data[0] == protocol.MESSAGE_HELLO:
+                if session is None:
+                    self.connect(address)
+            elif session is None:
+                continue
+            elif data[0] == protocol.MESSAGE_INPUT and len(data) >= protocol.INPUT.size:
+                session.last_heard = time.perf_counter()
+                controls = self.world.try_component(session.player, Controls)
+                if controls is not None:
+                    session.acknowledge(protocol.unpack_input(data, controls))
+            elif data[0] == protocol.MESSAGE_BYE:
+                self.disconnect(session)
+
+        now = time.perf_counter()
+        for session in list(self.sessions.values()):
+            if (now - session.last_heard) * 1000 > self.timeout:
+                self.disconnect(session)
+
+    def get_view(self, session: ClientSession) -> pygame.Rect:
+        pos = self.world.try_component(session.player, Position)
+        if pos is None:
+            return pygame.Rect(0, 0, 0, 0)
+        return protocol.view_rect(pygame.Vector2(pos.rect.center), self.view_radius)
+
+    def get_entity_states(self) -> np.ndarray:
+        """Gets the state of every mob, once per tick no matter how many clients there are"""
+
+        rows = []
+        for entity, (pos, graphics) in self.world.get_components(Position, Graphics):
+            health = self.world.try_component(entity, Health)
+            movement = self.world.try_component(entity, Movement)
+            rows.append(
+                (
+                    entity,
+                    pos.pos.x,
+                    pos.pos.y,
+                    health.hp if health is not None else 0,
+                    health.max_hp if health is not None else 0,
+                    self.strings.add(graphics.asset_key) if graphics.asset_key is not None else protocol.NO_STRING,
+                    movement is not None and movement.vel.x != 0,
+                    pos.direction,
+                )
+            )
+
+        raw_states = np.array(rows, dtype=[(name, "<f8") for name in protocol.ENTITY_STATE_DTYPE.names])
+        states = np.empty(len(rows), dtype=protocol.ENTITY_STATE_DTYPE)
+        states["entity"] = raw_states["entity"]
+        states["x"] = protocol.quantise_position(raw_states["x"])
+        states["y"] = protocol.quantise_position(raw_states["y"])
+        states["hp"] = np.clip(np.round(raw_states["hp"]), 0, 0xFFFF)
+        states["max_hp"] = np.clip(raw_states["max_hp"], 0, 0xFFFF)
+        states["sprite"] = raw_states["sprite"]
+        states["animation"] = raw_states["animation"]
+        states["direction"] = raw_states["direction"]
+        return states
+
+    def get_projectile_states(self) -> tuple[np.ndarray, np.ndarray]:
+        """Gets the state of every projectile, and their positions in pixels"""
+
+        projectile_manager = self.level.projectile_manager
+        sprites = projectile_manager.sprites
+        if len(self.projectile_sprites) < len(sprites):
+            self.projectile_sprites = np.array(
+                [self.strings.add(self.image_keys.get(id(sprite))) for sprite in sprites], dtype=np.uint16
+            )
+
+        n = projectile_manager.num_slots
+        alive = projectile_manager.alive[:n]
+        pos = projectile_manager.pos[:n][alive]
+
+        states = np.empty(len(pos), dtype=protocol.PROJECTILE_STATE_DTYPE)
+        states["x"] = protocol.quantise_position(pos[:, 0])
+        states["y"] = protocol.quantise_position(pos[:, 1])
+        states["angle"] = protocol.quantise_angle(projectile_manager.angle[:n][alive])
+        states["sprite"] = self.projectile_sprites[projectile_manager.sprite_idx[:n][alive]]
+        return states, pos
+
+    def make_snapshot(
+        self, session: ClientSession, grid: EntityGrid, projectiles: np.ndarray, projectile_pos: np.ndarray
+    ) -> protocol.Snapshot:
+        """
+        Makes the snapshot of a client, delta-encoded against the last snapshot it acknowledged
+
+        Args:
+            session: The client
+            grid: The entity states of this tick
+            projectiles: The projectile states of this tick
+            projectile_pos: The positions of the projectiles, in pixels
+
+        Returns:
+            The snapshot
+        """
+
+        view = self.get_view(session)
+        states = grid.query(view)
+
+        base = session.sent.get(session.acked_tick)
+        if base is None:
+            base_tick = protocol.NO_TICK
+            base_states, num_known_strings = states[:0], 0
+        else:
+            base_tick = session.acked_tick
+            base_states, num_known_strings = base
+
+        changed, removed = snapshot.diff_keyed_table(base_states, states)
+
+        # Sent states are the bases of later snapshots, once the client acknowledges them
+        session.sent[self.tick] = states, len(self.strings.strings)
+        if len(session.sent) > self.max_sent_snapshots:
+            del session.sent[min(session.sent)]
+
+        in_view = (
+            (projectile_pos[:, 0] >= view.left)
+            & (projectile_pos[:, 0] < view.right)
+            & (projectile_pos[:, 1] >= view.top)
+            & (projectile_pos[:, 1] < view.bottom)
+        )
+
+        return protocol.Snapshot(
+            self.tick,
+            base_tick,
+            session.player,
+            num_known_strings,
+            self.strings.strings[num_known_strings:],
+            changed,
+            removed,
+            projectiles[in_view],
+        )
+
+    def broadcast(self):
+        if not self.sessions:
+            return
+
+        grid = EntityGrid(self.get_entity_states(), self.cell_size)
+        projectiles, projectile_pos = self.get_projectile_states()
+
+        for session in self.sessions.values():
+            data = self.make_snapshot(session, grid, projectiles, projectile_pos).to_bytes()
+            try:
+                self.socket.sendto(data, session.address)
+            except OSError:
+                # E.g the snapshot is too big for a datagram. The next one is a delta against the same base
+                del session.sent[self.tick]
+
+    def step(self, dt: Optional[float] = None):
+        """
+        Runs one tick: handles client messages, steps the level, and sends every client its snapshot
+
+        Args:
+            dt: DT of the tick in seconds. Defaults to 1 / tick rate
+        """
+
+        self.handle_messages()
+
+        core.event.events = []
+        core.dt.dt = dt if dt is not None else 1 / self.tick_rate
+        core.timers.update()
+
+        self.level.activity_scheduler.views = [self.get_view(session) for session in self.sessions.values()]
+        self.level.update()
+        # Widgets sent to the graphics system are never drawn
+        self.level.graphics_widgets.clear()
+
+        self.tick += 1
+        self.broadcast()
+
+    def run(self):
+        """Steps the level at the tick rate until stopped"""
+
+        tick_length = 1 / self.tick_rate
+        next_tick = time.perf_counter()
+        while self.running:
+            self.step()
+
+            next_tick += tick_length
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                # Too far behind to catch up, e.g after a hitch
+                next_tick = time.perf_counter()
+
+        for session in list(self.sessions.values()):
+            self.socket.sendto(protocol.BYE.pack(protocol.MESSAGE_BYE), session.address)
+        self.socket.close()
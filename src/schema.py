@@ -0,0 +1,290 @@
+"""
+This file is a part of the source code for rpg-tile-game
+This project has been licensed under the MIT license.
+Copyright (c) 2022-present SSS-Says-Snek
+
+This file defines the settings schema, which validates the gameplay settings (mobs, items) when they're loaded and
+compiles them into immutable records, so spawning reads attributes rather than walking nested dicts
+"""
+from __future__ import annotations
+
+import collections.abc
+import types
+import typing
+from functools import lru_cache
+from typing import (TYPE_CHECKING, Any, Iterator, Mapping, NamedTuple,
+                    Optional, Union)
+
+from src.types import JSONSerializable
+
+if TYPE_CHECKING:
+    from src.utils.loaders import DirLoader
+
+
+class SettingsError(ValueError):
+    pass
+
+
+class PlayerSettings(NamedTuple):
+    animation_dir: str
+    animation_types: tuple[str, ...]
+    animation_speed: Mapping[str, float]
+    hotbar_size: int
+    inventory_size: int
+    hp: float
+    max_hp: float
+    speed: float
+    jump_vel: float
+
+
+class MobSettings(NamedTuple):
+    animation_dir: str
+    animation_types: tuple[str, ...]
+    animation_speed: Mapping[str, float]
+    hp: float
+    max_hp: float
+    speed: float
+    attack_cooldown: float
+    attack_damage: float
+
+    # Only some mobs have these
+    follow_range: Optional[int] = None
+    jump_vel: Optional[float] = None
+    attack_range: Optional[int] = None
+    attack_collision: bool = False
+    collide_with_player: bool = False
+
+
+class MobConfSettings(NamedTuple):
+    flee_speed_factor: float
+    patrol_speed_factor: float
+    flee_time: float
+
+
+class WeaponSettings(NamedTuple):
+    sprites: Mapping[str, str]
+    damage: float
+    cooldown: float
+
+    # Only ranged weapons have these
+    launch_vel: Optional[tuple[float, float]] = None
+
+
+class ConsumableSettings(NamedTuple):
+    heal_power: float
+    uses: int
+    cooldown: float
+
+
+class PrefabSettings(NamedTuple):
+    mob: str
+    components: tuple[str, ...] = ()
+    frame_size: tuple[int, int] = (32, 32)
+
+    # Name of the Tiled objects that spawn the prefab, if any
+    spawn: Optional[str] = None
+
+    # The sword the mob holds, if any
+    weapon_name: Optional[str] = None
+    weapon_sprite: Optional[str] = None
+
+
+# Which settings get compiled into which records. "*" matches any key at that level
+SCHEMA: tuple[tuple[str, type[NamedTuple]], ...] = (
+    ("mobs/player", PlayerSettings),
+    ("mobs/conf", MobConfSettings),
+    ("mobs/enemy/*/*", MobSettings),
+    ("items/weapons/*", WeaponSettings),
+    ("items/consumables/*", ConsumableSettings),
+    ("prefabs/*", PrefabSettings),
+)
+
+
+def is_changed(key: str, changed_keys: list[str]) -> bool:
+    """
+    Checks whether a setting is in one of the settings files that changed
+
+    Args:
+        key: The setting, e.g "mobs/enemy/melee/walker"
+        changed_keys: Keys of the changed settings files, e.g "mobs/enemy/melee"
+
+    Returns:
+        Whether the setting changed
+    """
+
+    return any(key == changed_key or key.startswith(f"{changed_key}/") for changed_key in changed_keys)
+
+
+@lru_cache(maxsize=None)
+def get_field_types(record_type: type[NamedTuple]) -> dict[str, Any]:
+    return typing.get_type_hints(record_type)
+
+
+def check_value(value: JSONSerializable, expected_type: Any, key: str) -> Any:
+    """
+    Checks a setting against a type, converting JSON values to their immutable counterparts (lists to tuples, dicts
+    to read-only mappings, and ints to floats)
+
+    Args:
+        value: The setting
+        expected_type: The type it should be
+        key: The setting's key, for errors
+
+    Returns:
+        The converted setting
+
+    Raises:
+        SettingsError: If the setting isn't of that type
+    """
+
+    origin = typing.get_origin(expected_type)
+    args = typing.get_args(expected_type)
+
+    if origin is Union:
+        if value is None and type(None) in args:
+            return None
+        (expected_type,) = [arg for arg in args if arg is not type(None)]
+        return check_value(value, expected_type, key)
+
+    if expected_type is bool:
+        if isinstance(value, bool):
+            return value
+    elif expected_type is int:
+        if isinstance(value, int) and not isinstance(value, bool):
+            return value
+    elif expected_type is float:
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return float(value)
+    elif expected_type is str:
+        if isinstance(value, str):
+            return value
+    elif origin is tuple:
+        if isinstance(value, list):
+            if len(args) == 2 and args[1] is Ellipsis:
+                return tuple(check_value(item, args[0], f"{key}/{i}") for i, item in enumerate(value))
+            if len(value) == len(args):
+                return tuple(check_value(item, arg, f"{key}/{i}") for i, (item, arg) in enumerate(zip(value, args)))
+    elif origin is collections.abc.Mapping:
+        if isinstance(value, dict):
+            return types.MappingProxyType(
+                {item_key: check_value(item, args[1], f"{key}/{item_key}") for item_key, item in value.items()}
+            )
+
+    raise SettingsError(f'"{key}" should be {typing_name(expected_type)}, not {value!r}')
+
+
+def typing_name(expected_type: Any) -> str:
+    if isinstance(expected_type, type):
+        return expected_type.__name__
+    return str(expected_type).replace("typing.", "")
+
+
+def compile_record(record_type: type[NamedTuple], value: JSONSerializable, key: str) -> NamedTuple:
+    """
+    Validates the settings of a record and creates it
+
+    Args:
+        record_type: The record's class, e.g `MobSettings`
+        value: The settings dict
+        key: The settings' key, e.g "mobs/enemy/melee/walker"
+
+    Returns:
+        The record
+
+    Raises:
+        SettingsError: If any setting is missing, unknown, or of the wrong type
+    """
+
+    if not isinstance(value, dict):
+        raise SettingsError(f'"{key}" should be a dict of settings, not {value!r}')
+
+    field_types = get_field_types(record_type)
+    unknown = value.keys() - field_types.keys()
+    if unknown:
+        raise SettingsError(f'"{key}" has unknown settings: {", ".join(sorted(unknown))}')
+    missing = field_types.keys() - value.keys() - record_type._field_defaults.keys()
+    if missing:
+        raise SettingsError(f'"{key}" is missing settings: {", ".join(sorted(missing))}')
+
+    return record_type(
+        **{field: check_value(field_value, field_types[field], f"{key}/{field}") for field, field_value in value.items()}
+    )
+
+
+class SettingsRecords:
+    def __init__(self, settings: DirLoader[JSONSerializable]):
+        """
+        The gameplay settings, compiled into records by `SCHEMA`. Indexed with the same keys as the settings, e.g
+        `records["mobs/enemy/melee/walker"].speed`
+
+        Args:
+            settings: The settings loader
+
+        Raises:
+            SettingsError: If any settings don't match the schema
+        """
+
+        self.settings = settings
+        self.records: dict[str, NamedTuple] = {}
+        self.compile()
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return self.records[key]
+        except KeyError:
+            raise KeyError(f'No record of "{key}" in the settings schema') from None
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.records
+
+    def expand(self, pattern: str) -> Iterator[tuple[str, JSONSerializable]]:
+        """
+        Finds the settings matching a schema pattern
+
+        Args:
+            pattern: The pattern, e.g "items/weapons/*"
+
+        Returns:
+            An iterator of the keys and values of the matching settings
+        """
+
+        matches = [("", self.settings.data)]
+        for part in pattern.split("/"):
+            next_matches = []
+            for prefix, value in matches:
+                if not isinstance(value, dict):
+                    continue
+                if part == "*":
+                    next_matches.extend((f"{prefix}{key}/", item) for key, item in value.items())
+                elif part in value:
+                    next_matches.append((f"{prefix}{part}/", value[part]))
+            matches = next_matches
+
+        for prefix, value in matches:
+            yield prefix[:-1], value
+
+    def compile(self, changed_keys: Optional[list[str]] = None):
+        """
+        Compiles the settings into records. Nothing is replaced unless every record compiles
+
+        Args:
+            changed_keys: Keys of the settings files to compile again (e.g after a reload). Defaults to every one
+
+        Raises:
+            SettingsError: If any settings don't match the schema
+        """
+
+        records = {}
+        for pattern, record_type in SCHEMA:
+            matches = list(self.expand(pattern))
+            if not matches and "*" not in pattern:
+                raise SettingsError(f'"{pattern}" is missing from the settings')
+
+            for key, value in matches:
+                if changed_keys is None or is_changed(key, changed_keys):
+                    records[key] = compile_record(record_type, value, key)
+
+        if changed_keys is None:
+            self.records = records
+        else:
+            self.records.update(records)
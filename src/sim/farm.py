@@ -0,0 +1,326 @@
+"""
+This file is a part of the source code for rpg-tile-game
+This project has been licensed under the MIT license.
+Copyright (c) 2022-present SSS-Says-Snek
+
+This file contains the balance farm, which runs scenarios (see `scenario.py`) with different settings in worker
+processes, and gathers what happened in each run into a report
+
+Every combination of the override values in `settings/balance.json` is a config, and every config runs every scenario
+a few times with different random seeds. Workers load the game once, then take runs off a task queue and put each
+result on a result queue as soon as it's done. Runs are stepped with a fixed DT and a manual clock, so they go as fast
+as the CPU allows while cooldowns and effects still last as long as they would in game
+"""
+from __future__ import annotations
+
+import copy
+import csv
+import itertools
+import multiprocessing
+import os
+import queue
+import random
+import statistics
+import time
+import traceback
+from typing import Callable, Optional
+
+from src import common, core, pygame
+from src.entities.components.component import Health, Position
+from src.game import Game
+from src.sim.scenario import Scenario
+from src.states.level_state import LevelState
+from src.types import JSONSerializable
+
+RESULT_FIELDS = (
+    "config",
+    "scenario",
+    "seed",
+    "overrides",
+    "killed",
+    "kills",
+    "targets",
+    "time_to_kill",
+    "damage_taken",
+    "damage_dealt",
+    "player_died",
+    "sim_seconds",
+    "frames",
+    "frame_ms_mean",
+    "frame_ms_p95",
+    "frame_ms_max",
+    "error",
+)
+
+Task = dict[str, JSONSerializable]
+Result = dict[str, JSONSerializable]
+
+
+def make_tasks(balance_settings: dict[str, JSONSerializable]) -> list[Task]:
+    """
+    Makes a run for every config, scenario and seed
+
+    Args:
+        balance_settings: The balance settings, e.g from `settings/balance.json`
+
+    Returns:
+        The runs
+    """
+
+    override_keys = list(balance_settings["overrides"])
+    tasks = []
+    for config, values in enumerate(itertools.product(*balance_settings["overrides"].values())):
+        for scenario_settings in balance_settings["scenarios"]:
+            for seed in range(balance_settings["runs"]):
+                tasks.append(
+                    {
+                        "config": config,
+                        "overrides": dict(zip(override_keys, values)),
+                        "scenario": scenario_settings,
+                        "seed": seed,
+                        "tick_rate": balance_settings["tick_rate"],
+                        "max_seconds": balance_settings["max_seconds"],
+                    }
+                )
+    return tasks
+
+
+def run_task(game: Game, base_settings: dict[str, JSONSerializable], task: Task, record: bool = False) -> Result:
+    """
+    Runs a scenario on a fresh level, with the task's settings overrides
+
+    Args:
+        game: The game, whose settings get replaced
+        base_settings: The settings without any overrides
+        task: The run
+        record: Whether to add the player's controls of every frame to the result, as "recording"
+
+    Returns:
+        What happened in the run
+    """
+
+    game.settings.data = copy.deepcopy(base_settings)
+    for key, value in task["overrides"].items():
+        game.settings[key]  # Raises a KeyError for typos, rather than adding a setting nothing reads
+        game.settings[key] = value
+    game.settings["autosave/enabled"] = False
+    game.records.compile()
+
+    # Nothing is left over from the last run
+    random.seed(task["seed"])
+    core.timers.clear()
+    core.time.use_manual_clock()
+
+    level = LevelState(game)
+    level.make_headless()
+    scenario = Scenario(task["scenario"])
+    targets = scenario.setup(level)
+
+    player_pos = level.world.component_for_entity(level.player, Position)
+    player_health = level.world.component_for_entity(level.player, Health)
+    target_healths = [level.world.component_for_entity(target, Health) for target in targets]
+    last_hp = player_health.hp
+    last_target_hps = [health.hp for health in target_healths]
+
+    view = pygame.Rect(0, 0, common.WIDTH, common.HEIGHT)
+    frame_length = 1 / task["tick_rate"]
+    damage_taken = 0
+    damage_dealt = 0
+    time_to_kill = None
+    frame_times = []
+    for frame in range(round(task["max_seconds"] * task["tick_rate"])):
+        scenario.control(level, frame)
+        # Nothing follows the player with the camera, so mobs are woken up around the player instead
+        view.center = player_pos.rect.center
+        level.activity_scheduler.views = [view]
+
+        time_started = time.perf_counter()
+        core.event.events = []
+        core.dt.dt = frame_length
+        core.time.advance(frame_length * 1000)
+        core.timers.update()
+        level.update()
+        # Widgets sent to the graphics system are never drawn
+        level.graphics_widgets.clear()
+        frame_times.append((time.perf_counter() - time_started) * 1000)
+
+        damage_taken += max(last_hp - player_health.hp, 0)
+        last_hp = player_health.hp
+        target_hps = [health.hp for health in target_healths]
+        damage_dealt += sum(max(old_hp - hp, 0) for old_hp, hp in zip(last_target_hps, target_hps))
+        last_target_hps = target_hps
+
+        if all(hp <= 0 for hp in target_hps):
+            time_to_kill = (frame + 1) * frame_length
+            break
+        if player_health.hp <= 0:
+            break
+
+    frame_times.sort()
+    result = {
+        "config": task["config"],
+        "scenario": scenario.name,
+        "seed": task["seed"],
+        "overrides": task["overrides"],
+        "killed": time_to_kill is not None,
+        "kills": sum(hp <= 0 for hp in last_target_hps),
+        "targets": len(targets),
+        "time_to_kill": time_to_kill,
+        "damage_taken": damage_taken,
+        "damage_dealt": damage_dealt,
+        "player_died": player_health.hp <= 0,
+        "sim_seconds": len(frame_times) * frame_length,
+        "frames": len(frame_times),
+        "frame_ms_mean": statistics.fmean(frame_times),
+        "frame_ms_p95": frame_times[int(len(frame_times) * 0.95)],
+        "frame_ms_max": frame_times[-1],
+        "error": None,
+    }
+    if record:
+        result["recording"] = scenario.recording
+    return result
+
+
+def worker(tasks: multiprocessing.Queue, results: multiprocessing.Queue):
+    """
+    Runs tasks until it gets None, then puts None on the result queue
+
+    Args:
+        tasks: Queue of runs
+        results: Queue the result of each run is put on
+    """
+
+    try:
+        game = Game()
+        base_settings = copy.deepcopy(game.settings.data)
+
+        task = tasks.get()
+        while task is not None:
+            try:
+                result = run_task(game, base_settings, task)
+            except Exception:
+                result = {"config": task["config"], "seed": task["seed"], "error": traceback.format_exc()}
+            results.put(result)
+            task = tasks.get()
+    finally:
+        results.put(None)
+
+
+def run_batch(
+    balance_settings: dict[str, JSONSerializable],
+    num_workers: Optional[int] = None,
+    on_result: Optional[Callable[[Result, int, int], None]] = None,
+) -> list[Result]:
+    """
+    Runs every task of the balance settings in worker processes
+
+    Args:
+        balance_settings: The balance settings, e.g from `settings/balance.json`
+        num_workers: Number of worker processes. Defaults to the "workers" setting, or the number of CPUs if that's 0
+        on_result: Called with each result as it arrives, along with the number of results so far and of tasks
+
+    Returns:
+        The result of every run, in the order they finished
+    """
+
+    tasks = make_tasks(balance_settings)
+    if num_workers is None:
+        num_workers = balance_settings["workers"] or os.cpu_count() or 1
+    num_workers = max(min(num_workers, len(tasks)), 1)
+
+    # Workers are started fresh rather than forked, so each one imports and starts up the game by itself
+    context = multiprocessing.get_context("spawn")
+    task_queue = context.Queue()
+    result_queue = context.Queue()
+    for task in tasks:
+        task_queue.put(task)
+    for _ in range(num_workers):
+        task_queue.put(None)
+
+    processes = [context.Process(target=worker, args=(task_queue, result_queue), daemon=True) for _ in range(num_workers)]
+    for process in processes:
+        process.start()
+
+    results = []
+    num_finished = 0
+    while num_finished < num_workers:
+        try:
+            result = result_queue.get(timeout=1)
+        except queue.Empty:
+            # Workers killed by a crash never say they're done
+            if not any(process.is_alive() for process in processes):
+                break
+            continue
+
+        if result is None:
+            num_finished += 1
+            continue
+        results.append(result)
+        if on_result is not None:
+            on_result(result, len(results), len(tasks))
+
+    for process in processes:
+        process.join()
+    return results
+
+
+def summarise(results: list[Result]) -> list[dict[str, JSONSerializable]]:
+    """
+    Averages the results of each config and scenario
+
+    Args:
+        results: The results of every run
+
+    Returns:
+        A row for every config and scenario, sorted by config
+    """
+
+    groups: dict[tuple[int, str], list[Result]] = {}
+    for result in results:
+        if result["error"] is None:
+            groups.setdefault((result["config"], result["scenario"]), []).append(result)
+
+    rows = []
+    for (config, scenario_name), group in sorted(groups.items()):
+        kill_times = [result["time_to_kill"] for result in group if result["killed"]]
+        rows.append(
+            {
+                "config": config,
+                "scenario": scenario_name,
+                "overrides": group[0]["overrides"],
+                "runs": len(group),
+                "kill_rate": sum(result["killed"] for result in group) / len(group),
+                "time_to_kill": statistics.fmean(kill_times) if kill_times else None,
+                "damage_taken": statistics.fmean(result["damage_taken"] for result in group),
+                "death_rate": sum(result["player_died"] for result in group) / len(group),
+                "frame_ms_mean": statistics.fmean(result["frame_ms_mean"] for result in group),
+                "frame_ms_p95": max(result["frame_ms_p95"] for result in group),
+            }
+        )
+    return rows
+
+
+def format_summary(rows: list[dict[str, JSONSerializable]]) -> str:
+    lines = [
+        f"{'config':>6}  {'scenario':<16}{'runs':>5}{'kills':>7}{'ttk (s)':>9}{'dmg taken':>11}{'deaths':>8}"
+        f"{'ms/frame':>10}{'p95':>7}  overrides"
+    ]
+    for row in rows:
+        time_to_kill = "-" if row["time_to_kill"] is None else f"{row['time_to_kill']:.2f}"
+        overrides = ", ".join(f"{key}={value}" for key, value in row["overrides"].items())
+        lines.append(
+            f"{row['config']:>6}  {row['scenario']:<16}{row['runs']:>5}{row['kill_rate']:>7.0%}{time_to_kill:>9}"
+            f"{row['damage_taken']:>11.1f}{row['death_rate']:>8.0%}{row['frame_ms_mean']:>10.3f}"
+            f"{row['frame_ms_p95']:>7.2f}  {overrides}"
+        )
+    return "\n".join(lines)
+
+
+def write_results(path: str, results: list[Result]):
+    """Writes the result of every run to a CSV file"""
+
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, RESULT_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        for result in sorted(results, key=lambda result: (result["config"], result.get("scenario", ""), result["seed"])):
+            writer.writerow(result)
@@ -0,0 +1,171 @@
+"""
+This file is a part of the source code for rpg-tile-game
+This project has been licensed under the MIT license.
+Copyright (c) 2022-present SSS-Says-Snek
+
+This file contains the scenarios balance simulations run, which set up a fight in a level and control its player,
+either with a scripted bot or by replaying recorded controls
+"""
+from __future__ import annotations
+
+import json
+import math
+import types
+from typing import TYPE_CHECKING, Optional
+
+from src.common import TILE_HEIGHT
+from src.entities.components.component import Controls, Health, Position
+from src.types import Entity, JSONSerializable
+
+if TYPE_CHECKING:
+    from src.states.level_state import LevelState
+
+# Move, jump, use, hotbar index (or -1) and aim position of a frame
+RecordedControls = list[float]
+
+
+class Scenario:
+    def __init__(self, scenario_settings: dict[str, JSONSerializable]):
+        """
+        A fight for the player against mobs spawned around it. Configured with a dict, e.g a scenario in
+        `settings/balance.json`:
+
+        - mob: Name of the Tiled object that spawns the mob, e.g "walker_enemy_spawn"
+        - at: Where to move the player to before the fight, or the player's spawn if not given
+        - count: Number of mobs to spawn
+        - distance: Horizontal distance in pixels between the player and the closest mob
+        - clear: Whether to kill the mobs already in the level first
+        - reach: How close in pixels the bot gets to a mob before using its item
+        - hotbar_idx: Hotbar slot the bot uses
+        - replay: Path to a JSON file of recorded controls (see `recording`) to replay instead of using the bot
+
+        Args:
+            scenario_settings: The scenario's settings
+        """
+
+        self.name: str = scenario_settings.get("name", scenario_settings["mob"])
+        self.mob: str = scenario_settings["mob"]
+        self.at: Optional[list[float]] = scenario_settings.get("at")
+        self.count: int = scenario_settings.get("count", 1)
+        self.distance: float = scenario_settings.get("distance", 160)
+        self.clear: bool = scenario_settings.get("clear", True)
+        self.reach: float = scenario_settings.get("reach", 40)
+        self.hotbar_idx: int = scenario_settings.get("hotbar_idx", 0)
+        self.replay: Optional[list[RecordedControls]] = None
+        if "replay" in scenario_settings:
+            with open(scenario_settings["replay"]) as f:
+                self.replay = json.load(f)
+
+        # Controls of every frame so far, which can be replayed later
+        self.recording: list[RecordedControls] = []
+        self.targets: list[Entity] = []
+
+        self.last_x = math.nan
+
+    def setup(self, level: LevelState) -> list[Entity]:
+        """
+        Spawns the mobs to fight
+
+        Args:
+            level: The level, right after it's loaded
+
+        Returns:
+            The spawned mobs
+        """
+
+        if self.clear:
+            # Mobs with no health left are removed (along with their health bars) in the next UI update
+            for entity, health in level.world.get_component(Health):
+                if entity != level.player:
+                    health.hp = 0
+
+        player_pos = level.world.component_for_entity(level.player, Position)
+        if self.at is not None:
+            player_pos.pos.update(self.at)
+            player_pos.rect.topleft = self.at
+
+        for i in range(self.count):
+            # Alternates sides, starting to the right of the player
+            side = 1 if i % 2 == 0 else -1
+            x = player_pos.pos.x + side * (self.distance + i // 2 * TILE_HEIGHT)
+            spawn_point = types.SimpleNamespace(name=self.mob, x=x, y=player_pos.pos.y - TILE_HEIGHT)
+            entity = level.spawn_object(spawn_point)
+            if entity is None:
+                raise ValueError(f'"{self.mob}" doesn\'t spawn a mob')
+            self.targets.append(entity)
+
+        return self.targets
+
+    def control(self, level: LevelState, frame: int):
+        """
+        Fills in the controls of the player for a frame
+
+        Args:
+            level: The level
+            frame: The number of frames since the scenario started
+        """
+
+        controls = level.world.component_for_entity(level.player, Controls)
+        if self.replay is not None:
+            if frame < len(self.replay):
+                move, jump, use, hotbar_idx, aim_x, aim_y = self.replay[frame]
+                controls.move = int(move)
+                controls.jump = bool(jump)
+                controls.use = bool(use)
+                controls.hotbar_idx = None if hotbar_idx < 0 else int(hotbar_idx)
+                controls.aim.update(aim_x, aim_y)
+            else:
+                controls.move = 0
+        else:
+            self.bot_control(level, controls, frame)
+
+        self.recording.append(
+            [
+                controls.move,
+                int(controls.jump),
+                int(controls.use),
+                -1 if controls.hotbar_idx is None else controls.hotbar_idx,
+                controls.aim.x,
+                controls.aim.y,
+            ]
+        )
+
+    def bot_control(self, level: LevelState, controls: Controls, frame: int):
+        """Walks up to the closest mob that's still alive, and attacks it"""
+
+        if frame == 0:
+            controls.hotbar_idx = self.hotbar_idx
+
+        player_pos = level.world.component_for_entity(level.player, Position)
+        target_rect = None
+        for target in self.targets:
+            # Dead mobs are deleted in the UI update after their health runs out
+            if not level.world.entity_exists(target) or level.world.component_for_entity(target, Health).hp <= 0:
+                continue
+            target_pos = level.world.component_for_entity(target, Position)
+            if target_rect is None or abs(target_pos.rect.centerx - player_pos.rect.centerx) < abs(
+                target_rect.centerx - player_pos.rect.centerx
+            ):
+                target_rect = target_pos.rect
+
+        if target_rect is None:
+            controls.move = 0
+            return
+
+        dx = target_rect.centerx - player_pos.rect.centerx
+        side = 1 if dx > 0 else -1
+        in_reach = abs(dx) <= self.reach + target_rect.width / 2
+        if abs(dx) < (player_pos.rect.width + target_rect.width) / 4:
+            # Backs off when on top of the mob, since the sword swings in front of the player
+            controls.move = -side
+        elif not in_reach or player_pos.direction != side:
+            controls.move = side
+        else:
+            controls.move = 0
+        controls.aim.update(target_rect.center)
+
+        # Jumps over whatever it's stuck on, or up to mobs above it
+        stuck = controls.move != 0 and player_pos.pos.x == self.last_x
+        controls.jump = stuck or target_rect.bottom < player_pos.rect.top
+        controls.use = in_reach and abs(target_rect.centery - player_pos.rect.centery) < TILE_HEIGHT * 2
+        self.last_x = player_pos.pos.x
@@ -7,26 +7,31 @@ This file defines the level state, which is the state where the main game happen
 """
 from __future__ import annotations
 
-from typing import Optional
+from typing import Callable, Iterable, Iterator, Optional
 
 # ECS system
 import esper
 from pytmx import TiledObject
 
 # Important modules
-from src import common, core, pygame, screen, utils
+from src import common, core, pygame, schema, utils
 # Display modules
 from src.display import particle
 from src.display.camera import Camera
+from src.display.debug_overlay import DebugOverlay
+from src.display.post_processing import DamageFlashPass
+from src.display.ui import UI
 from src.display.widgets.health_bar import MobHealthBar, PlayerHealthBar
 from src.display.widgets.inventory import Hotbar
+from src.display.widgets.widget import Widget
 # Non-ECS systems
-from src.entities import effect
+from src.entities import (activity, effect, journal, pathfinding, projectile,
+                          snapshot)
 # Components
 from src.entities.components import ai_component, item_component
-from src.entities.components.component import (Graphics, Health, Inventory,
-                                               Movement, NoCollidePlayer,
-                                               Position)
+from src.entities.components.component import (Controls, Graphics, Health,
+                                               Inventory, Movement, Position)
+from src.entities.prefab import Prefab
 # Systems
 from src.entities.systems import (CollisionSystem, CombatSystem,
                                   GraphicsSystem, HitSystem, InputSystem,
@@ -34,12 +39,17 @@ from src.entities.systems import (CollisionSystem, CombatSystem,
                                   ParticleGenSystem, ProjectileSystem,
                                   TileInteractionSystem)
 from src.entities.systems.single_target import ItemInfoSystem
+from src.schema import (ConsumableSettings, PlayerSettings, SettingsError,
+                        WeaponSettings)
+from src.streamed_tilemap import StreamedTileMap
 from src.tilemap import TileMap
 from src.types import Entity
 
 # State (for inheritance)
 from .state import State
 
+QUICKSAVE_FILE = "quicksave.snapshot"
+
 
 class LevelState(State):
     def __init__(self, game_class):
@@ -47,28 +57,47 @@ class LevelState(State):
 
         # esper and tilemap stuff
         self.world = esper.World()
-        self.tilemap = TileMap(common.MAP_DIR / "map2.tmx", self)
+        self.settings = self.game_class.settings
+        self.records = self.game_class.records
+        self.imgs = self.game_class.imgs
+
+        map_path = common.MAP_DIR / self.settings["world/map"]
+        if self.settings["world/streaming"]:
+            self.tilemap = StreamedTileMap(map_path, self)
+        else:
+            self.tilemap = TileMap(map_path, self)
 
         # Stuff
         self.camera = Camera(common.WIDTH, common.HEIGHT, self.tilemap.width, self.tilemap.height)
         self.particle_manager = particle.ParticleManager(self.camera)
         self.effect_manager = effect.EffectManager(self)
+        self.projectile_manager = projectile.ProjectileManager(self)
+        self.debug_overlay = DebugOverlay()
 
-        # UI stuff
-        self.ui = self.game_class.ui
+        # UI stuff. Each level has its own UI, since levels can be loaded side by side
+        self.ui = UI(self.camera)
         self.ui.level = self
-        self.ui.camera = self.camera
         self.ui.world = self.world
         self.ui.particle_manager = self.particle_manager
 
+        # Events and widgets that systems send to each other
+        self.system_listeners: dict[str, list[Callable]] = {}
+        self.graphics_widgets: list[tuple[Widget, str]] = []
+
         # Other stuff
-        self.settings = self.game_class.settings
-        self.imgs = self.game_class.imgs
+        self.activity_scheduler = activity.ActivityScheduler(self)
 
         self.player: Optional[Entity] = None
+        self.prefabs: dict[str, Prefab] = {}
+        self.spawn_prefabs: dict[str, Prefab] = {}  # By the name of the Tiled objects that spawn them
+        self.compile_prefabs()
         self.load_map()
+        self.pathfinder = pathfinding.Pathfinder(self)
+        self.player_flow_field = pathfinding.FlowField(self, self.player)
 
         self.debug = False
+        # Whether the player is controlled by the keyboard and mouse, rather than by a client of a server
+        self.local_input = True
 
         # Add ECS systems
         self.core_processes = list(
@@ -100,180 +129,280 @@ class LevelState(State):
         self.core_processes = list(map(lambda tup: tup[0], self.core_processes))
         self.pausable_processes = list(map(lambda tup: tup[0], self.pausable_processes))
 
-    def load_spawn(self, obj: TiledObject):
-        if obj.name == "player_spawn":
-            player_settings, sword_settings = self.settings["mobs/player", "items/weapons/slashing_sword"]
-            weapon_surf, weapon_icon = self.imgs["items/sword_hold", "items/sword_icon"]
-
-            player_anims, player_anim_speeds = utils.load_mob_animations(player_settings)
-
-            # Inventory outside self.player to add sword
-            inventory = Inventory(
-                size=player_settings["inventory_size"],
-                hotbar_size=player_settings["hotbar_size"],
-            )
-
-            self.player = self.world.create_entity(
-                Movement(speed=player_settings["speed"]),
-                Health(hp=player_settings["hp"], max_hp=player_settings["max_hp"]),
-                Position(pos=pygame.Vector2(obj.x, obj.y), rect_size=utils.get_size(player_anims)),
-                Graphics(animations=player_anims, animation_speeds=player_anim_speeds),
-                inventory,
-            )
+        self.journal: Optional[journal.Journal] = None
+        if self.settings["autosave/enabled"]:
+            self.journal = journal.Journal(self)
+
+    def finish_loading(self) -> Iterator[None]:
+        yield from self.tilemap.convert_chunks()
+
+        # Loading a snapshot sets the game time, which the current state is still using until now
+        if self.journal is not None and self.settings["autosave/resume"]:
+            self.journal.load_autosave()
+            yield
+
+    def on_enter(self):
+        damage_flash = self.game_class.post_processor.get_pass(DamageFlashPass)
+        if damage_flash is not None:
+            damage_flash.watch(self.world.component_for_entity(self.player, Health))
+
+    def unload(self):
+        if self.journal is not None:
+            self.journal.flush()
+
+    def on_settings_changed(self, changed_keys: list[str]):
+        # Mobs spawned from now on use the new settings (Existing ones are updated by the systems)
+        prefab_keys = ("prefabs", "mobs/conf", *(prefab.mob_key for prefab in self.prefabs.values()))
+        if any(schema.is_changed(key, changed_keys) for key in prefab_keys):
+            try:
+                self.compile_prefabs()
+            except SettingsError as e:
+                # Keeps the old prefabs until the settings are fixed
+                print(f"Couldn't apply reloaded prefabs: {e}")
+
+        # Systems subscribe to "settings_changed" to update what they copied from the settings in place
+        for func in self.system_listeners.get("settings_changed", []):
+            func(changed_keys)
+        if self.journal is not None:
+            # Those updates could be to any entity
+            self.journal.touch_all()
+
+    def create_player(self, pos: pygame.Vector2) -> Entity:
+        """
+        Creates a player (with its starting sword), without making it the player this level follows. Servers create
+        one per client
+
+        Args:
+            pos: Where the player spawns
+
+        Returns:
+            The entity ID
+        """
+
+        player_settings: PlayerSettings = self.records["mobs/player"]
+        sword_settings: WeaponSettings = self.records["items/weapons/slashing_sword"]
+        weapon_surf, weapon_icon = self.imgs["items/sword_hold", "items/sword_icon"]
+
+        player_anims, player_anim_speeds = utils.load_mob_animations(player_settings)
+
+        # Inventory outside the player to add sword
+        inventory = Inventory(
+            size=player_settings.inventory_size,
+            hotbar_size=player_settings.hotbar_size,
+        )
 
-            # Add initial sword
-            inventory[0] = self.world.create_entity(
-                item_component.Item(
-                    name="Newbie's Sword",
-                    cooldown=sword_settings["cooldown"],
-                    owner=self.player,
-                ),
-                item_component.ItemPosition(
-                    pos=pygame.Vector2(obj.x, obj.y), rect_size=utils.get_size(weapon_surf), in_inventory=True
-                ),
-                item_component.MeleeWeapon(attack_damage=sword_settings["damage"]),
-                item_component.SlashingSword(),
-                item_component.ItemGraphics(sprite=weapon_surf, icon=weapon_icon),
-            )
+        player = self.world.create_entity(
+            Movement(speed=player_settings.speed),
+            Health(hp=player_settings.hp, max_hp=player_settings.max_hp),
+            Position(pos=pos.copy(), rect_size=utils.get_size(player_anims)),
+            Graphics(animations=player_anims, animation_speeds=player_anim_speeds, asset_key="mobs/player"),
+            inventory,
+            Controls(),
+        )
 
-            self.ui.add_widget(PlayerHealthBar(self.ui, self.player, (700, 10), 230, 20))
-            hotbar = self.ui.add_widget(
-                Hotbar(self.ui, self.player, (common.WIDTH // 2, 40), (64, 64)),
-            )
-            self.ui.add_hud_widget(hotbar, "hotbar")
-            # self.effect_manager.add_effect(
-            #     self.player,
-            #     effect.BurnEffect(self).builder().damage(10).duration(5, 1).build(),
-            # )
-
-        elif obj.name == "walker_enemy_spawn":
-            walker_settings = self.settings["mobs/enemy/melee/walker"]
-            walker_anims, walker_anim_speeds = utils.load_mob_animations(walker_settings)
-
-            walker_enemy = self.world.create_entity(
-                Graphics(animations=walker_anims, animation_speeds=walker_anim_speeds),
-                Position(pos=pygame.Vector2(obj.x, obj.y), rect_size=utils.get_size(walker_anims)),
-                Health(hp=walker_settings["hp"], max_hp=walker_settings["max_hp"]),
-                Movement(walker_settings["speed"]),
-                NoCollidePlayer(),
-                ai_component.MeleeAttack(
-                    attack_range=0,
-                    attack_cooldown=walker_settings["attack_cooldown"],
-                    damage=walker_settings["attack_damage"],
-                    collision=walker_settings["attack_collision"],
-                ),
-                ai_component.Patroller(),
-            )
-            self.ui.add_widget(MobHealthBar(self.ui, walker_enemy, 40, 10))
+        # Add initial sword
+        inventory[0] = self.world.create_entity(
+            item_component.Item(
+                name="Newbie's Sword",
+                cooldown=sword_settings.cooldown,
+                owner=player,
+            ),
+            item_component.ItemPosition(pos=pos.copy(), rect_size=utils.get_size(weapon_surf), in_inventory=True),
+            item_component.MeleeWeapon(attack_damage=sword_settings.damage),
+            item_component.SlashingSword(),
+            item_component.ItemGraphics(
+                sprite=weapon_surf,
+                icon=weapon_icon,
+                asset_keys=("items/sword_hold", "items/sword_icon", None),
+            ),
+        )
 
-        elif obj.name == "simple_melee_enemy_spawn":
-            simple_melee_settings, mob_confs = self.settings["mobs/enemy/melee/simple", "mobs/conf"]
-            simple_melee_animations, simple_melee_animation_speeds = utils.load_mob_animations(
-                simple_melee_settings, (32, 37)
-            )
+        # self.effect_manager.add_effect(
+        #     player,
+        #     effect.BurnEffect(self).builder().damage(10).duration(5, 1).build(),
+        # )
+        return player
 
-            weapon_surf = self.imgs["items/bronze_sword"]
-            speed = simple_melee_settings["speed"]
+    def compile_prefabs(self):
+        """
+        Compiles the mob templates in `settings/prefabs.json`. Nothing is replaced unless every prefab compiles
 
-            inventory = Inventory(size=1)
+        Raises:
+            SettingsError: If any prefab has an unknown mob or component
+        """
 
-            simple_melee_enemy = self.world.create_entity(
-                Graphics(animations=simple_melee_animations, animation_speeds=simple_melee_animation_speeds),
-                Position(pos=pygame.Vector2(obj.x, obj.y), rect_size=utils.get_size(simple_melee_animations)),
-                Health(hp=simple_melee_settings["hp"], max_hp=simple_melee_settings["max_hp"]),
-                Movement(speed=simple_melee_settings["speed"]),
-                ai_component.FollowsEntityClose(
-                    entity=self.player, follow_range=simple_melee_settings["follow_range"]
-                ),
-                ai_component.MeleeWeaponAttack(attack_range=simple_melee_settings["attack_range"]),
-                ai_component.EntityState(
-                    available_states=[
-                        ai_component.EntityState.Patrol(patrol_speed=speed * mob_confs["patrol_speed_factor"]),
-                        ai_component.EntityState.Flee(
-                            flee_speed=speed * mob_confs["flee_speed_factor"],
-                            flee_time=self.settings["mobs/conf/flee_time"],
-                        ),
-                        ai_component.EntityState.Follow(),
-                    ],
-                    starting_state=ai_component.EntityState.Patrol,
-                ),
-                inventory,
-            )
+        prefabs = {name: Prefab(self, name, self.records[f"prefabs/{name}"]) for name in self.settings["prefabs"]}
+        self.prefabs = prefabs
+        self.spawn_prefabs = {prefab.spawn_name: prefab for prefab in prefabs.values() if prefab.spawn_name}
 
-            # Adds sword
-            inventory[0] = self.world.create_entity(
-                item_component.Item(
-                    name="Newbie's Sword",
-                    cooldown=simple_melee_settings["attack_cooldown"],
-                    owner=simple_melee_enemy,
-                ),
-                item_component.ItemGraphics(sprite=weapon_surf),
-                item_component.ItemPosition(
-                    pos=pygame.Vector2(obj.x, obj.y), rect_size=utils.get_size(weapon_surf), in_inventory=True
-                ),
-                item_component.MeleeWeapon(attack_damage=simple_melee_settings["attack_damage"]),
-                item_component.SlashingSword(),
-            )
+    def load_spawn(self, obj: TiledObject) -> Optional[Entity]:
+        if obj.name == "player_spawn":
+            self.player = self.create_player(pygame.Vector2(obj.x, obj.y))
+            return self.player
 
-            self.ui.add_widget(MobHealthBar(self.ui, simple_melee_enemy, 40, 10))
+        elif obj.name in self.spawn_prefabs:
+            return self.spawn_prefabs[obj.name].spawn(pygame.Vector2(obj.x, obj.y))
 
         elif obj.name == "test_shooter_enemy_spawn":
             test_shooter_enemy = self.world.create_entity(
-                Graphics(sprite=self.imgs["mobs/test_shooter"]),
+                Graphics(sprite=self.imgs["mobs/test_shooter"], asset_key="mobs/test_shooter"),
                 Position(pos=pygame.Vector2(obj.x, obj.y), rect_size=utils.get_size(self.imgs["mobs/test_shooter"])),
                 Health(hp=10000, max_hp=10000),
                 Movement(speed=0.0),
                 ai_component.RangeAttack(target=self.player, attack_cooldown=2.0),
             )
-            self.ui.add_widget(MobHealthBar(self.ui, test_shooter_enemy, 40, 10))
+            return test_shooter_enemy
 
-    def load_item(self, obj: TiledObject):
+        return None
+
+    def load_item(self, obj: TiledObject) -> Optional[Entity]:
         if obj.name == "health_potion_item":
-            health_potion_settings = self.settings["items/consumables/health_potion"]
+            health_potion_settings: ConsumableSettings = self.records["items/consumables/health_potion"]
             health_potion_surf = self.imgs["items/health_potion"]
             health_potion_holding = pygame.transform.scale(health_potion_surf, (16, 16))
 
-            self.world.create_entity(
-                item_component.Item(name="Health Potion", cooldown=health_potion_settings["cooldown"]),
+            return self.world.create_entity(
+                item_component.Item(name="Health Potion", cooldown=health_potion_settings.cooldown),
                 item_component.ItemGraphics(
                     sprite=health_potion_holding,
                     icon=health_potion_surf,
                     world_sprite=health_potion_surf,
+                    asset_keys=("items/health_potion", "items/health_potion", "items/health_potion"),
                 ),
                 item_component.ItemPosition(
                     pos=pygame.Vector2(obj.x, obj.y), rect_size=utils.get_size(health_potion_holding)
                 ),
-                item_component.Consumable(num_uses=health_potion_settings["uses"]),
-                item_component.HealthPotion(heal_power=health_potion_settings["heal_power"]),
+                item_component.Consumable(num_uses=health_potion_settings.uses),
+                item_component.HealthPotion(heal_power=health_potion_settings.heal_power),
             )
 
         elif obj.name == "gravity_bow_item":
-            gravity_bow_settings = self.settings["items/weapons/gravity_bow"]
+            gravity_bow_settings: WeaponSettings = self.records["items/weapons/gravity_bow"]
             gravity_bow_surf, gravity_bow_icon = self.imgs["items/gravity_bow_hold", "items/gravity_bow_icon"]
 
-            self.world.create_entity(
-                item_component.Item(name="Newbie's Bow", cooldown=gravity_bow_settings["cooldown"]),
+            return self.world.create_entity(
+                item_component.Item(name="Newbie's Bow", cooldown=gravity_bow_settings.cooldown),
                 item_component.ItemGraphics(
                     sprite=gravity_bow_surf,
                     world_sprite=gravity_bow_icon,
                     icon=gravity_bow_icon,
                     flip_on_dir=True,
+                    asset_keys=("items/gravity_bow_hold", "items/gravity_bow_icon", "items/gravity_bow_icon"),
                 ),
                 item_component.ItemPosition(
                     pos=pygame.Vector2(obj.x, obj.y), rect_size=utils.get_size(gravity_bow_surf)
                 ),
-                item_component.RangedWeapon(projectile_damage=gravity_bow_settings["damage"]),
-                item_component.GravityBow(launch_vel=pygame.Vector2(gravity_bow_settings["launch_vel"])),
+                item_component.RangedWeapon(projectile_damage=gravity_bow_settings.damage),
+                item_component.GravityBow(launch_vel=pygame.Vector2(gravity_bow_settings.launch_vel)),
             )
 
         elif obj.name == "jetpack_item":
             pass
 
+        return None
+
+    def spawn_object(self, obj: TiledObject) -> Optional[Entity]:
+        """
+        Spawns the mob or item of a Tiled object
+
+        Args:
+            obj: The Tiled object
+
+        Returns:
+            The entity ID, or None if the object isn't a spawn or an item
+        """
+
+        entity = self.load_spawn(obj)
+        if entity is None:
+            entity = self.load_item(obj)
+        else:
+            self.add_entity_widgets(entity)
+        return entity
+
+    def spawn_many(self, prefab_name: str, positions: Iterable[pygame.Vector2]) -> list[Entity]:
+        """
+        Spawns mobs from a prefab (along with their health bars), e.g for a wave
+
+        Args:
+            prefab_name: Name of the prefab in `settings/prefabs.json`
+            positions: Where the mobs spawn
+
+        Returns:
+            The entity IDs
+        """
+
+        entities = self.prefabs[prefab_name].spawn_many(positions)
+        for entity in entities:
+            self.add_entity_widgets(entity)
+        return entities
+
+    def add_entity_widgets(self, entity: Entity):
+        """
+        Adds the widgets that display a mob, i.e its health bar (and the hotbar, for the player)
+
+        Args:
+            entity: The entity ID
+        """
+
+        if entity == self.player:
+            self.ui.add_widget(PlayerHealthBar(self.ui, entity, (common.UI_WIDTH - 260, 10), 230, 20))
+            hotbar = self.ui.add_widget(
+                Hotbar(self.ui, entity, (common.UI_WIDTH // 2, 40), (64, 64)),
+            )
+            self.ui.add_hud_widget(hotbar, "hotbar")
+        elif self.world.has_component(entity, Health):
+            self.ui.add_widget(MobHealthBar(self.ui, entity, 40, 10))
+
+    def set_player(self, entity: Entity):
+        """
+        Makes another entity the player, e.g after loading a snapshot
+
+        Args:
+            entity: The entity ID
+        """
+
+        self.player = entity
+        self.player_flow_field.target = entity
+        for system in self.core_processes + self.pausable_processes:
+            system.player = entity
+
+        damage_flash = self.game_class.post_processor.get_pass(DamageFlashPass)
+        if damage_flash is not None:
+            damage_flash.watch(self.world.component_for_entity(entity, Health))
+
+    def make_headless(self):
+        """Stops drawing and reading the keyboard and mouse, for servers and simulations"""
+
+        self.local_input = False
+        for core_process in self.core_processes:
+            self.world.remove_processor(type(core_process))
+
+    def quicksave(self):
+        """Saves a snapshot of the level to the quicksave file"""
+
+        common.SAVE_DIR.mkdir(parents=True, exist_ok=True)
+        with open(common.SAVE_DIR / QUICKSAVE_FILE, "wb") as f:
+            f.write(snapshot.save_snapshot(self))
+
+    def quickload(self):
+        """Loads the quicksave file, if there is one"""
+
+        quicksave_path = common.SAVE_DIR / QUICKSAVE_FILE
+        if quicksave_path.exists():
+            snapshot.load_snapshot(self, quicksave_path.read_bytes())
+            if self.journal is not None:
+                self.journal.reset()
+
     def load_map(self):
+        if isinstance(self.tilemap, StreamedTileMap):
+            # Everything else is spawned as the regions around the camera load
+            self.tilemap.load_initial_regions()
+            return
+
         # Sorts in a way that guarentees player be defined first
-        for obj in sorted(self.tilemap.tilemap.objects, key=lambda x: x.name != "player_spawn"):
-            self.load_spawn(obj)
-            self.load_item(obj)
+        for obj in sorted(self.tilemap.get_objects(), key=lambda x: x.name != "player_spawn"):
+            self.spawn_object(obj)
+        self.tilemap.make_map()
 
     def pause(self):
         if not core.time.paused:
@@ -295,11 +424,17 @@ class LevelState(State):
 
     def handle_event(self, event: pygame.event.Event):
         if event.type == pygame.KEYDOWN:
-            # DEBUG stuff: F1 -> debug mode, F6 -> pause, F7 -> unpause, F8 -> transition state
-            # F9 -> toggle FPS cap
+            # DEBUG stuff: F1 -> debug mode, F2 -> quicksave, F3 -> quickload, F4 -> load autosave, F6 -> pause,
+            # F7 -> unpause, F8 -> transition state, F9 -> toggle FPS cap
 
             if event.key == pygame.K_F1:
                 self.debug = not self.debug
+            elif event.key == pygame.K_F2:
+                self.quicksave()
+            elif event.key == pygame.K_F3:
+                self.quickload()
+            elif event.key == pygame.K_F4 and self.journal is not None:
+                self.journal.load_autosave()
             elif event.key == pygame.K_F6 and not core.time.paused:
                 self.pause()
             elif event.key == pygame.K_F7 and core.time.paused:
@@ -314,19 +449,27 @@ class LevelState(State):
                     common.FPS = 60
 
     def update(self):
+        self.tilemap.update()
+        if not core.time.paused:
+            self.activity_scheduler.update()
+            self.pathfinder.update()
+            self.player_flow_field.update()
+
         # Draws UI in GraphicsSystem
         self.world.process()
 
         if not core.time.paused:
             self.particle_manager.update()
             self.effect_manager.update()
+            if self.journal is not None:
+                self.journal.update()
 
         self.ui.update()
 
 
 class TestState(State):
     def draw(self):
-        screen.fill((128, 128, 128))
+        common.screen.fill((128, 128, 128))
 
     def handle_event(self, event):
         if event.type == pygame.KEYDOWN:
@@ -10,7 +10,7 @@ from __future__ import annotations
 
 import abc
 import importlib
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Iterator
 
 from src import pygame
 
@@ -23,6 +23,10 @@ class State(abc.ABC):
         """
         A base class for all game states (E.g game state, menu state)
 
+        States can be constructed on a loader thread (see `StateManager`), so constructors shouldn't touch anything
+        shared with the current state, like the screen or the post-processor. That goes in `finish_loading` or
+        `on_enter` instead
+
         Args:
             game_class: The game class
         """
@@ -52,6 +56,37 @@ class State(abc.ABC):
 
         pass
 
+    def finish_loading(self) -> Iterator[None]:
+        """
+        Finishes loading the state on the main thread, after it's constructed. Yields between small slices of work
+        (E.g converting a surface), so loading can be spread over frames
+
+        Returns:
+            An iterator that does a slice of work every step
+        """
+
+        yield from ()
+
+    def on_enter(self):
+        """This function gets called every time the state becomes the current state"""
+
+        pass
+
+    def unload(self):
+        """This function gets called when the state is evicted from the loaded states"""
+
+        pass
+
+    def on_settings_changed(self, changed_keys: list[str]):
+        """
+        This function gets called when settings files are reloaded, while the state is loaded
+
+        Args:
+            changed_keys: Keys of the changed settings files, e.g "mobs/player"
+        """
+
+        pass
+
     def change_state(self, desired_state_str: str):
         """
         Changes to a new state given the name of the state in strings
@@ -60,9 +95,33 @@ class State(abc.ABC):
             desired_state_str: The location of the state class in "module.name" format
         """
 
-        state_module_name, state_name = desired_state_str.split(".")
-        state_module = importlib.import_module(f"src.states.{state_module_name}")
-        self.next_state = getattr(state_module, state_name)
+        self.next_state = resolve_state(desired_state_str)
 
         # DEBUG
         print(self.next_state)
+
+    def preload_state(self, desired_state_str: str):
+        """
+        Starts loading a state in the background, so changing to it later doesn't have to wait
+
+        Args:
+            desired_state_str: The location of the state class in "module.name" format
+        """
+
+        self.game_class.states.preload(resolve_state(desired_state_str))
+
+
+def resolve_state(desired_state_str: str) -> type[State]:
+    """
+    Gets a state class given its name in strings
+
+    Args:
+        desired_state_str: The location of the state class in "module.name" format
+
+    Returns:
+        The state class
+    """
+
+    state_module_name, state_name = desired_state_str.split(".")
+    state_module = importlib.import_module(f"src.states.{state_module_name}")
+    return getattr(state_module, state_name)
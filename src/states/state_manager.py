@@ -0,0 +1,203 @@
+"""
+This file is a part of the source code for rpg-tile-game
+This project has been licensed under the MIT license.
+Copyright (c) 2022-present SSS-Says-Snek
+
+This file defines the StateManager class, which loads states (in the background if they aren't loaded yet), keeps the
+most recently used ones around, and changes between them behind a loading screen
+"""
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Iterator, Optional
+
+from src import common, core, pygame, utils
+from src.display.transition import DarkenTransition, EaseTransition
+
+from .state import State
+
+if TYPE_CHECKING:
+    from src.game import Game
+
+
+class StateManager:
+    def __init__(self, game_class: Game):
+        """
+        Manages the states of the game. Configured in `settings/states.json`
+
+        States that aren't loaded are constructed on a loader thread, then finished on the main thread (see
+        `State.finish_loading`) in slices of at most `slice_budget` milliseconds a frame. Changing to a state that
+        isn't loaded yet darkens the screen and shows a loading screen until it's ready. At most `max_loaded` states
+        are kept loaded, and the least recently used one is unloaded when there are more
+
+        Args:
+            game_class: The game class
+        """
+
+        self.game_class = game_class
+
+        states_settings = self.game_class.settings["states"]
+        self.max_loaded = states_settings["max_loaded"]
+        self.slice_budget = states_settings["slice_budget"]
+        self.transition_duration = states_settings["transition_duration"]
+
+        self.current: Optional[State] = None
+        # Least recently used first
+        self.loaded: OrderedDict[type[State], State] = OrderedDict()
+
+        # States being constructed on the loader thread, and the state being finished on the main thread
+        self.pending: dict[type[State], Future[State]] = {}
+        self.finishing: Optional[tuple[State, Iterator[None]]] = None
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="state-loader")
+
+        # The state being changed to, while the loading screen is up
+        self.loading: Optional[type[State]] = None
+        self.loading_background: Optional[pygame.Surface] = None
+        self.transition: Optional[DarkenTransition] = None
+
+    def load_now(self, state_class: type[State]) -> State:
+        """
+        Loads a state on the spot (E.g the first state, when there's nothing to draw while waiting) and changes to it
+
+        Args:
+            state_class: The state's class
+
+        Returns:
+            The state
+        """
+
+        state = state_class(self.game_class)
+        for _ in state.finish_loading():
+            pass
+        self.add(state)
+        self.activate(state)
+        return state
+
+    def preload(self, state_class: type[State]):
+        """
+        Starts constructing a state on the loader thread, if it isn't loaded or being loaded already
+
+        Args:
+            state_class: The state's class
+        """
+
+        if state_class in self.loaded or state_class in self.pending:
+            return
+        if self.finishing is not None and type(self.finishing[0]) is state_class:
+            return
+
+        self.pending[state_class] = self.executor.submit(state_class, self.game_class)
+
+    def change_state(self, state_class: type[State]):
+        """
+        Changes to a state right away if it's loaded. Otherwise, starts loading it behind the loading screen
+
+        Args:
+            state_class: The state's class
+        """
+
+        if state_class is self.loading:
+            return
+
+        if state_class in self.loaded:
+            self.activate(self.loaded[state_class])
+            return
+
+        self.preload(state_class)
+        self.loading = state_class
+        self.loading_background = common.screen.copy()
+        self.transition = DarkenTransition(
+            DarkenTransition.DARKEN, self.transition_duration, ease_function=EaseTransition.ease_out_quad
+        )
+        self.transition.start()
+
+    def add(self, state: State):
+        """Adds a loaded state as the most recently used one"""
+
+        self.loaded[type(state)] = state
+        self.loaded.move_to_end(type(state))
+        self.evict()
+
+    def evict(self):
+        """Unloads the least recently used states while there are too many, except the current and incoming ones"""
+
+        for state_class in list(self.loaded):
+            if len(self.loaded) <= self.max_loaded:
+                break
+            if state_class is not type(self.current) and state_class is not self.loading:
+                self.loaded.pop(state_class).unload()
+
+    def activate(self, state: State):
+        """Makes a loaded state the current state"""
+
+        old_state = self.current
+        if old_state is not None:
+            old_state.next_state = type(old_state)  # Resets next state to self
+
+        self.current = state
+        self.loaded.move_to_end(type(state))
+        self.evict()
+        state.on_enter()
+
+        if old_state is not None:
+            # Lightens the new state back in
+            self.transition = DarkenTransition(
+                DarkenTransition.LIGHTEN, self.transition_duration, ease_function=EaseTransition.ease_in_out_quad
+            )
+            self.transition.start()
+        core.dirty_rects.mark_all()
+
+    def settings_changed(self, changed_keys: list[str]):
+        """Tells every loaded state that settings files were reloaded"""
+
+        for state in self.loaded.values():
+            state.on_settings_changed(changed_keys)
+
+    def update(self):
+        """
+        Advances loading: Picks up states the loader thread is done with, and finishes them within the budget. Once
+        the state being changed to is loaded and the screen is dark, changes to it
+        """
+
+        if self.finishing is None:
+            for state_class, future in self.pending.items():
+                if future.done():
+                    del self.pending[state_class]
+                    state = future.result()
+                    self.finishing = state, state.finish_loading()
+                    break
+
+        if self.finishing is not None:
+            state, slices = self.finishing
+            time_started = time.perf_counter()
+            for _ in slices:
+                if (time.perf_counter() - time_started) * 1000 >= self.slice_budget:
+                    break
+            else:
+                self.finishing = None
+                self.add(state)
+
+        if self.loading in self.loaded and not self.transition.transitioning:
+            state = self.loaded[self.loading]
+            self.loading = None
+            self.loading_background = None
+            self.activate(state)
+
+    def draw(self):
+        """Draws the loading screen while loading, or the transition into the current state after"""
+
+        if self.loading is not None:
+            common.screen.blit(self.loading_background, (0, 0))
+            self.transition.draw()
+            if not self.transition.transitioning:
+                loading_surf = utils.render_text("Loading...", 48, (255, 255, 255))
+                common.screen.blit(loading_surf, loading_surf.get_rect(center=(common.WIDTH // 2, common.HEIGHT // 2)))
+            core.dirty_rects.mark_all()
+
+        elif self.transition is not None:
+            self.transition.draw()
+            core.dirty_rects.mark_all()
+            if not self.transition.transitioning:
+                self.transition = None
@@ -0,0 +1,490 @@
+"""
+This file is a part of the source code for rpg-tile-game
+This project has been licensed under the MIT license.
+Copyright (c) 2022-present SSS-Says-Snek
+
+This file defines the StreamedTileMap class, which splits a map (or a Tiled world of adjacent maps) into regions
+that are loaded in the background as the camera approaches them, and unloaded as it leaves
+"""
+
+from __future__ import annotations
+
+import json
+import pathlib
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from enum import Enum, auto
+from typing import TYPE_CHECKING, Iterator, Optional
+
+import pytmx
+
+from src import pygame, utils
+from src.common import TILE_HEIGHT, TILE_WIDTH
+from src.entities.components import item_component
+from src.entities.components.component import Health, Inventory, Position
+from src.tilemap import TileMap
+from src.types import Entity
+
+if TYPE_CHECKING:
+    from src.states.level_state import LevelState
+
+# (Index of the map in the world, ID of the object in the map)
+ObjectKey = tuple[int, int]
+
+
+class WorldMap:
+    def __init__(self, map_path: pathlib.Path, rect: pygame.Rect):
+        """
+        A Tiled map that is part of a streamed world. It is only parsed once a region needs it
+
+        Args:
+            map_path: The Path to the tmx map
+            rect: The (pixel) rect the map covers in the world
+        """
+
+        self.map_path = map_path
+        self.rect = rect
+
+        self.tilemap: Optional[pytmx.TiledMap] = None
+        self.objects: list[pytmx.TiledObject] = []
+        self.tilename_to_img: dict[str, pygame.Surface] = {}
+        self._lock = threading.Lock()
+
+    def load(self) -> pytmx.TiledMap:
+        """
+        Parses the map if it hasn't been already. Safe to call from any thread
+
+        Returns:
+            The parsed map
+        """
+
+        with self._lock:
+            if self.tilemap is None:
+                tilemap = pytmx.load_pygame(str(self.map_path))
+
+                # Objects are moved to world coordinates once, so everything else can ignore map offsets
+                for obj in tilemap.objects:
+                    obj.x += self.rect.x
+                    obj.y += self.rect.y
+                self.objects = list(tilemap.objects)
+
+                # Named tile images (E.g for sign outlines) are needed even if the tile isn't in a loaded region
+                for gid, tile_props in tilemap.tile_properties.items():
+                    if tile_props.get("tile_img"):
+                        tile_img = tilemap.get_tile_image_by_gid(gid)
+                        if tile_img is not None:
+                            self.tilename_to_img.setdefault(tile_props["tile_img"], tile_img)
+
+                self.tilemap = tilemap
+
+        return self.tilemap
+
+
+class RegionState(Enum):
+    UNLOADED = auto()
+    LOADING = auto()
+    LOADED = auto()
+
+
+@dataclass
+class RegionData:
+    """Data of a region baked on the background thread, to be activated on the main thread"""
+
+    tiles: list[tuple[int, int, int, dict]]  # (layer ID, tile x, tile y, tile props)
+    normal_surf: Optional[pygame.Surface]
+    interactable_surf: Optional[pygame.Surface]
+    objects: list[tuple[ObjectKey, pytmx.TiledObject]]
+
+
+@dataclass
+class Region:
+    pos: tuple[int, int]
+    rect: pygame.Rect
+
+    state: RegionState = RegionState.UNLOADED
+    future: Optional[Future] = None
+    chunk: Optional[tuple[pygame.Rect, Optional[pygame.Surface], Optional[pygame.Surface]]] = None
+
+    # What has to be removed when unloading
+    tiles: list[tuple[int, int, int]] = field(default_factory=list)
+    objects: list[Entity] = field(default_factory=list)
+
+    # Spawned entities that were in the region when it got unloaded, to be respawned when it loads again
+    saved_entities: list[tuple[ObjectKey, pytmx.TiledObject, dict]] = field(default_factory=list)
+
+
+class StreamedTileMap(TileMap):
+    def __init__(self, map_path: pathlib.Path, level_state: LevelState):
+        """
+        A TileMap that streams regions of tiles and objects in and out around the camera.
+        Regions are baked on a background thread, then activated on the main thread (a few per frame).
+        Configured in `settings/world.json`
+
+        Args:
+            map_path: The Path to either a tmx map, or a Tiled world file (.world) of adjacent maps.
+                The maps of a world should be aligned to the tile grid and have the same tile size
+            level_state: The game state
+        """
+
+        world_settings = level_state.settings["world"]
+
+        region_width, region_height = world_settings["region_size"]
+        self.region_size = (region_width * TILE_WIDTH, region_height * TILE_HEIGHT)
+        self.load_radius = world_settings["load_radius"]
+        self.unload_radius = world_settings["unload_radius"]
+        self.activations_per_frame = world_settings["activations_per_frame"]
+
+        if map_path.suffix == ".world":
+            with open(map_path) as world_file:
+                world = json.load(world_file)
+
+            self.maps = [
+                WorldMap(
+                    map_path.parent / world_map["fileName"],
+                    pygame.Rect(world_map["x"], world_map["y"], world_map["width"], world_map["height"]),
+                )
+                for world_map in world["maps"]
+            ]
+        else:
+            world_map = WorldMap(map_path, pygame.Rect(0, 0, 0, 0))
+            tilemap = world_map.load()
+            world_map.rect.size = (tilemap.width * tilemap.tilewidth, tilemap.height * tilemap.tileheight)
+            self.maps = [world_map]
+
+        world_rect = self.maps[0].rect.unionall([world_map.rect for world_map in self.maps])
+
+        # Layer IDs of the first map are assumed to be shared by the others, so it's parsed right away
+        tile_layer_ids = [
+            layer_id
+            for layer_id, layer in enumerate(self.maps[0].load().visible_layers)
+            if isinstance(layer, pytmx.TiledTileLayer)
+        ]
+        self.init_map_data(
+            level_state, world_rect.right // TILE_WIDTH, world_rect.bottom // TILE_HEIGHT, tile_layer_ids
+        )
+
+        self.regions: dict[tuple[int, int], Region] = {}
+        self.active_regions: set[tuple[int, int]] = set()  # Regions that aren't unloaded
+
+        # Objects that have been spawned once are never spawned from the map again (E.g killed mobs)
+        self.spawned_objects: set[ObjectKey] = set()
+        self.tracked_entities: dict[ObjectKey, tuple[pytmx.TiledObject, Entity]] = {}
+
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="region-loader")
+
+    def get_objects(self) -> list[pytmx.TiledObject]:
+        objects = []
+        for world_map in self.maps:
+            world_map.load()
+            objects.extend(world_map.objects)
+        return objects
+
+    def make_map(self) -> None:
+        """Does nothing: Regions are baked as they stream in, so there are no whole-map surfaces"""
+
+    def convert_chunks(self) -> Iterator[None]:
+        """Region chunks come and go as they stream, and are removed by identity, so they're never replaced"""
+
+        yield from ()
+
+    ###########
+    # Regions #
+    ###########
+
+    def get_region_pos(self, x: float, y: float) -> tuple[int, int]:
+        return int(x // self.region_size[0]), int(y // self.region_size[1])
+
+    def get_region(self, region_pos: tuple[int, int]) -> Region:
+        if region_pos not in self.regions:
+            region_rect = pygame.Rect(
+                region_pos[0] * self.region_size[0], region_pos[1] * self.region_size[1], *self.region_size
+            )
+            self.regions[region_pos] = Region(region_pos, region_rect.clip(0, 0, self.width, self.height))
+        return self.regions[region_pos]
+
+    def get_regions_in(self, rect: pygame.Rect) -> Iterator[Region]:
+        """Gets every region (within the world) that collides with a rect"""
+
+        rect = rect.clip(0, 0, self.width, self.height)
+        if not rect:
+            return
+
+        min_x, min_y = self.get_region_pos(rect.left, rect.top)
+        max_x, max_y = self.get_region_pos(rect.right - 1, rect.bottom - 1)
+        for region_x in range(min_x, max_x + 1):
+            for region_y in range(min_y, max_y + 1):
+                yield self.get_region((region_x, region_y))
+
+    def is_loaded(self, rect: pygame.Rect) -> bool:
+        region = self.regions.get(self.get_region_pos(*rect.center))
+        return region is not None and region.state == RegionState.LOADED
+
+    def bake_region(self, region: Region) -> RegionData:
+        """
+        Loads a region's tiles and objects, and blits its tiles onto chunk surfaces.
+        Runs on the background thread, so it must not touch the ECS world
+
+        Args:
+            region: The region to bake
+
+        Returns:
+            The baked region data
+        """
+
+        tiles = []
+        objects = []
+        surfs: dict[bool, pygame.Surface] = {}  # Interactable or not -> surface
+
+        for map_idx, world_map in enumerate(self.maps):
+            overlap = world_map.rect.clip(region.rect)
+            if not overlap:
+                continue
+
+            tilemap = world_map.load()
+            map_tile_x, map_tile_y = world_map.rect.x // TILE_WIDTH, world_map.rect.y // TILE_HEIGHT
+
+            for layer_id, layer in enumerate(tilemap.visible_layers):
+                if not isinstance(layer, pytmx.TiledTileLayer):
+                    continue
+
+                for y in range(overlap.top // TILE_HEIGHT, overlap.bottom // TILE_HEIGHT):
+                    row = layer.data[y - map_tile_y]
+                    for x in range(overlap.left // TILE_WIDTH, overlap.right // TILE_WIDTH):
+                        gid = row[x - map_tile_x]
+                        tile_img = tilemap.get_tile_image_by_gid(gid) if gid else None
+                        if tile_img is None:
+                            continue
+
+                        tile_props = tilemap.get_tile_properties_by_gid(gid)
+                        if tile_props is None:
+                            tile_props = {}
+                        tiles.append((layer_id, x, y, tile_props))
+
+                        interactable = bool(tile_props.get("interactable"))
+                        if interactable not in surfs:
+                            surfs[interactable] = pygame.Surface(region.rect.size, pygame.SRCALPHA)
+                        surfs[interactable].blit(
+                            tile_img, (x * TILE_WIDTH - region.rect.x, y * TILE_HEIGHT - region.rect.y)
+                        )
+
+            objects.extend(
+                ((map_idx, obj.id), obj) for obj in world_map.objects if region.rect.collidepoint(obj.x, obj.y)
+            )
+
+        return RegionData(tiles, surfs.get(False), surfs.get(True), objects)
+
+    def activate_region(self, region: Region, region_data: RegionData):
+        """
+        Adds a baked region's tiles and objects to the ECS world. Runs on the main thread
+
+        Args:
+            region: The region
+            region_data: The baked data of the region
+        """
+
+        for world_map in self.maps:
+            if world_map.tilemap is not None:
+                for tile_img_name, tile_img in world_map.tilename_to_img.items():
+                    self.tilename_to_img.setdefault(tile_img_name, tile_img)
+
+        for layer_id, x, y, tile_props in region_data.tiles:
+            self.add_tile(layer_id, x, y, tile_props)
+            region.tiles.append((layer_id, x, y))
+
+        region.chunk = (region.rect, region_data.normal_surf, region_data.interactable_surf)
+        self.chunks.append(region.chunk)
+
+        # The player is spawned separately, before anything else
+        for obj_key, obj in region_data.objects:
+            entity = self.add_object(obj)
+            if entity is not None:
+                region.objects.append(entity)
+            elif obj.name != "player_spawn" and obj_key not in self.spawned_objects:
+                self.spawned_objects.add(obj_key)
+                self.spawn_object(obj_key, obj)
+
+        for obj_key, obj, entity_state in region.saved_entities:
+            entity = self.spawn_object(obj_key, obj)
+            if entity is not None:
+                self.restore_entity(entity, entity_state)
+        region.saved_entities.clear()
+
+        region.state = RegionState.LOADED
+        self.notify_tiles_changed(region.rect)
+
+    def unload_region(self, region: Region):
+        """
+        Removes a region's tiles and objects from the ECS world,
+        saving the state of spawned entities that are in unloaded regions
+
+        Args:
+            region: The region
+        """
+
+        for layer_id, x, y in region.tiles:
+            self.remove_tile(layer_id, x, y)
+        for entity in region.objects:
+            self.remove_object(entity)
+
+        region.tiles.clear()
+        region.objects.clear()
+        self.chunks.remove(region.chunk)
+        region.chunk = None
+
+        region.state = RegionState.UNLOADED
+        self.active_regions.discard(region.pos)
+
+        # Entities could have wandered off into other unloaded regions too, where they would be frozen forever
+        for obj_key, (obj, entity) in list(self.tracked_entities.items()):
+            entity_rect = self.get_entity_rect(entity)
+            if entity_rect is None:
+                # Dead, or picked up (and therefore owned by someone else)
+                del self.tracked_entities[obj_key]
+                continue
+
+            entity_region = self.get_region(self.get_region_pos(*entity_rect.center))
+            if entity_region.state == RegionState.UNLOADED:
+                entity_region.saved_entities.append((obj_key, obj, self.save_entity(entity)))
+                self.delete_entity(entity)
+                del self.tracked_entities[obj_key]
+
+        self.notify_tiles_changed(region.rect)
+
+    def load_initial_regions(self):
+        """Spawns the player, then synchronously loads the regions around it (and centers the camera on it)"""
+
+        # Maps are parsed in order until the player spawn is found, so it's best kept in the first map
+        for map_idx, world_map in enumerate(self.maps):
+            world_map.load()
+            player_spawn = next((obj for obj in world_map.objects if obj.name == "player_spawn"), None)
+            if player_spawn is not None:
+                # Never spawn the player twice
+                self.spawned_objects.add((map_idx, player_spawn.id))
+                break
+        else:
+            raise ValueError("No player spawn in any of the maps")
+
+        self.level.spawn_object(player_spawn)
+        self.level.camera.camera.center = (player_spawn.x, player_spawn.y)
+        self.level.camera.update_offset()
+
+        for region in self.get_regions_in(self.level.camera.camera.inflate(self.load_radius * 2, self.load_radius * 2)):
+            self.activate_region(region, self.bake_region(region))
+            self.active_regions.add(region.pos)
+
+    def update(self):
+        """Requests regions approaching the camera, activates baked regions and unloads regions far away"""
+
+        camera_rect = self.level.camera.camera
+        load_rect = camera_rect.inflate(self.load_radius * 2, self.load_radius * 2)
+        keep_rect = camera_rect.inflate(self.unload_radius * 2, self.unload_radius * 2)
+
+        for region in self.get_regions_in(load_rect):
+            if region.state == RegionState.UNLOADED:
+                region.state = RegionState.LOADING
+                region.future = self.executor.submit(self.bake_region, region)
+                self.active_regions.add(region.pos)
+
+        # Spreads activations over multiple frames to avoid frame spikes
+        num_activations = 0
+        for region_pos in list(self.active_regions):
+            region = self.regions[region_pos]
+
+            if region.state == RegionState.LOADING and region.future.done():
+                if not keep_rect.colliderect(region.rect):
+                    # Camera left before the region finished loading
+                    region.state = RegionState.UNLOADED
+                    region.future = None
+                    self.active_regions.discard(region_pos)
+                elif num_activations < self.activations_per_frame:
+                    region_data = region.future.result()
+                    region.future = None
+                    self.activate_region(region, region_data)
+                    num_activations += 1
+
+            elif region.state == RegionState.LOADED and not keep_rect.colliderect(region.rect):
+                self.unload_region(region)
+
+    ############
+    # Entities #
+    ############
+
+    def spawn_object(self, obj_key: ObjectKey, obj: pytmx.TiledObject) -> Optional[Entity]:
+        entity = self.level.spawn_object(obj)
+        if entity is not None:
+            self.tracked_entities[obj_key] = (obj, entity)
+        return entity
+
+    def get_entity_rect(self, entity: Entity) -> Optional[pygame.Rect]:
+        """Gets the rect of a mob or item in the world, or None if it doesn't exist or is in an inventory"""
+
+        if not self.world.entity_exists(entity):
+            return None
+        if self.world.has_component(entity, Position):
+            return self.world.component_for_entity(entity, Position).rect
+
+        item_pos = self.world.component_for_entity(entity, item_component.ItemPosition)
+        return None if item_pos.in_inventory else item_pos.rect
+
+    def save_entity(self, entity: Entity) -> dict:
+        """
+        Serialises the state of an entity that is about to be unloaded
+
+        Args:
+            entity: The entity ID
+
+        Returns:
+            A (JSON-serializable) dict of the entity state
+        """
+
+        entity_state = {}
+
+        if self.world.has_component(entity, Position):
+            pos = self.world.component_for_entity(entity, Position)
+            entity_state["pos"] = tuple(pos.pos)
+            entity_state["direction"] = pos.direction
+        if self.world.has_component(entity, item_component.ItemPosition):
+            entity_state["pos"] = tuple(self.world.component_for_entity(entity, item_component.ItemPosition).pos)
+        if self.world.has_component(entity, Health):
+            entity_state["hp"] = self.world.component_for_entity(entity, Health).hp
+
+        return entity_state
+
+    def restore_entity(self, entity: Entity, entity_state: dict):
+        """
+        Restores the state saved with `save_entity` onto a newly spawned entity
+
+        Args:
+            entity: The entity ID
+            entity_state: The saved entity state
+        """
+
+        if self.world.has_component(entity, Position):
+            pos = self.world.component_for_entity(entity, Position)
+            pos.pos.update(entity_state["pos"])
+            pos.rect.topleft = pos.pos
+            pos.tile_pos = utils.pixel_to_tile(pos.pos)
+            pos.direction = entity_state["direction"]
+        if self.world.has_component(entity, item_component.ItemPosition):
+            item_pos = self.world.component_for_entity(entity, item_component.ItemPosition)
+            item_pos.pos.update(entity_state["pos"])
+            item_pos.rect.topleft = item_pos.pos
+        if self.world.has_component(entity, Health):
+            health = self.world.component_for_entity(entity, Health)
+            health.hp = health.prev_hp = entity_state["hp"]
+
+    def delete_entity(self, entity: Entity):
+        """Deletes an unloaded entity, along with its items, widgets and effects"""
+
+        if self.world.has_component(entity, Inventory):
+            for item in self.world.component_for_entity(entity, Inventory).inventory:
+                if item is not None:
+                    self.world.delete_entity(item)
+
+        for uuid, widget_info in list(self.level.ui.widgets.items()):
+            if getattr(widget_info.widget, "entity", None) == entity:
+                self.level.ui.remove_widget(uuid)
+
+        self.level.effect_manager.remove_effect(entity)
+        self.world.delete_entity(entity)
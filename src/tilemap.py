@@ -9,14 +9,16 @@ This file defines the TileMap class, which is used to further interact with pytm
 from __future__ import annotations
 
 import pathlib
-from typing import TYPE_CHECKING, Optional, Union
+from typing import TYPE_CHECKING, Callable, Iterator, Optional, Union
 
 from src.entities.components.component import Position
 from src.types import Entity
 
 if TYPE_CHECKING:
+    from src.display.camera import Camera
     from src.states.level_state import LevelState
 
+import numpy as np
 import pygame
 import pytmx
 
@@ -36,11 +38,32 @@ class TileMap:
         """
 
         self.tilemap = pytmx.load_pygame(str(map_path))
-        self.width = self.tilemap.width * self.tilemap.tilewidth
-        self.height = self.tilemap.height * self.tilemap.tileheight
+
+        # IDs (indices in the visible layers) of the tile layers, which are the first part of `tiles` keys
+        tile_layer_ids = [
+            layer_id
+            for layer_id, layer in enumerate(self.tilemap.visible_layers)
+            if isinstance(layer, pytmx.TiledTileLayer)
+        ]
+        self.init_map_data(level_state, self.tilemap.width, self.tilemap.height, tile_layer_ids)
+
+    def init_map_data(self, level_state: LevelState, tile_width: int, tile_height: int, tile_layer_ids: list[int]):
+        """
+        Sets up the (initially empty) tile data of a map
+
+        Args:
+            level_state: The game state
+            tile_width: Width of the map, in tiles
+            tile_height: Height of the map, in tiles
+            tile_layer_ids: IDs of the tile layers
+        """
+
+        self.width = tile_width * TILE_WIDTH
+        self.height = tile_height * TILE_HEIGHT
 
         self.level = level_state
         self.world = self.level.world
+        self.tile_layer_ids = tile_layer_ids
 
         # Map tile name to image for other usages (such as tile outlines)
         self.tilename_to_img = {}
@@ -49,11 +72,35 @@ class TileMap:
         self.tiles: dict[tuple, dict] = {}
         self.entity_tiles: dict[tuple, int] = {}
 
+        # Grid of tiles that are ONLY collidable (same as `get_unwalkable_rects`), for vectorized lookups
+        self.collision_grid = np.zeros((tile_width, tile_height), dtype=bool)
+        self.ramp_grid = np.zeros((tile_width, tile_height), dtype=bool)
+
         # Interactable tiles are different: They are generally uncollidable (so players can walk through),
         # and are created through Tiled objects, rather than tiles. This is because
         # a lot of interactable tiles have specific data other tiles won't have.
         self.interactable_tiles: dict[tuple, int] = {}
 
+        # Baked map surfaces, as (world rect, normal surface, interactable surface). Filled in on make_map
+        self.chunks: list[tuple[pygame.Rect, Optional[pygame.Surface], Optional[pygame.Surface]]] = []
+
+        # Functions called with a (pixel) rect whenever tiles within it are added or removed
+        self._tile_listeners: list[Callable[[pygame.Rect], None]] = []
+
+    def subscribe_tiles_changed(self, func: Callable[[pygame.Rect], None]):
+        """
+        Subscribes to tiles being added or removed (e.g when streamed in or out)
+
+        Args:
+            func: A function that will get called with the (pixel) rect of the changed area
+        """
+
+        self._tile_listeners.append(func)
+
+    def notify_tiles_changed(self, rect: pygame.Rect):
+        for func in self._tile_listeners:
+            func(rect)
+
     def make_map(self) -> tuple[pygame.Surface, pygame.Surface]:
         """
         Creates both the normal map and the interactable tiles surface
@@ -71,87 +118,204 @@ class TileMap:
                     tile_img = self.tilemap.get_tile_image_by_gid(gid)
                     if tile_img is None:
                         continue
-                    tile_img = tile_img.convert_alpha()
 
                     # Adds tile props to dict
                     tile_props = self.tilemap.get_tile_properties_by_gid(gid)
                     if tile_props is None:
                         tile_props = {}
 
-                    self.tiles[(layer_id, (x, y))] = tile_props
-                    blit_surf = normal_surf
-
-                    tile_type = tile_component.Type.DEFAULT
-
-                    if tile_props.get("unwalkable"):
-                        tile_type |= tile_component.Type.COLLIDABLE
-                    if tile_props.get("ramp"):
-                        if tile_props["ramp"] == "up":
-                            tile_type |= tile_component.Type.RAMP_UP
-                        elif tile_props["ramp"] == "down":
-                            tile_type |= tile_component.Type.RAMP_DOWN
-                    if tile_props.get("interactable"):
-                        blit_surf = interactable_surf
-                    if tile_props.get("tile_img"):
-                        tile_img_name = tile_props["tile_img"]
-                        if tile_img_name not in self.tilename_to_img:
-                            self.tilename_to_img[tile_img_name] = tile_img
-
-                    tile = tile_component.Tile(x, y, self.tilemap.tilewidth, self.tilemap.tileheight, tile_type)
-                    entity_id = self.world.create_entity(tile)
-                    self.entity_tiles[(layer_id, (x, y))] = entity_id
-
-                    blit_surf.blit(
-                        tile_img,
-                        (x * self.tilemap.tilewidth, y * self.tilemap.tileheight),
-                    )
+                    self.add_tile(layer_id, x, y, tile_props, tile_img)
+
+                    blit_surf = interactable_surf if tile_props.get("interactable") else normal_surf
+                    blit_surf.blit(tile_img, (x * TILE_WIDTH, y * TILE_HEIGHT))
 
         for obj in self.tilemap.objects:
-            obj_pos = (obj.x // TILE_WIDTH, obj.y // TILE_HEIGHT)
-
-            tile = tile_component.Tile(*obj_pos, obj.width, obj.height)
-            if obj.name == "sign":
-                if obj.text is None:
-                    # Dummy text
-                    obj.text = (
-                        "Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor "
-                        "incididunt ut labore et dolore magna aliqua. Ut enim ad minim veniam, quis nostrud "
-                        "exercitation ullamco laboris nisi ut aliquip ex ea commodo consequat."
-                    )
-                self.interactable_tiles[obj_pos] = self.world.create_entity(
-                    tile,
-                    tile_component.Interactable(tile, self.tilename_to_img["sign"]),
-                    tile_component.Sign(obj.text),
-                )
+            self.add_object(obj)
+
+        self.chunks = [(pygame.Rect(0, 0, self.width, self.height), normal_surf, interactable_surf)]
+        return normal_surf, interactable_surf
+
+    def convert_chunks(self) -> Iterator[None]:
+        """
+        Converts the baked map surfaces to the display's pixel format, which makes drawing them faster. Maps can be
+        made on a loader thread, so this is done afterwards on the main thread, yielding after each surface
+        """
+
+        for i, (chunk_rect, normal_surf, interactable_surf) in enumerate(self.chunks):
+            if normal_surf is not None:
+                normal_surf = normal_surf.convert_alpha()
+                yield
+            if interactable_surf is not None:
+                interactable_surf = interactable_surf.convert_alpha()
+                yield
+            self.chunks[i] = (chunk_rect, normal_surf, interactable_surf)
+
+    @staticmethod
+    def get_tile_type(tile_props: dict) -> tile_component.Type:
+        tile_type = tile_component.Type.DEFAULT
+
+        if tile_props.get("unwalkable"):
+            tile_type |= tile_component.Type.COLLIDABLE
+        if tile_props.get("ramp"):
+            if tile_props["ramp"] == "up":
+                tile_type |= tile_component.Type.RAMP_UP
+            elif tile_props["ramp"] == "down":
+                tile_type |= tile_component.Type.RAMP_DOWN
+
+        return tile_type
+
+    def add_tile(
+        self, layer_id: int, x: int, y: int, tile_props: dict, tile_img: Optional[pygame.Surface] = None
+    ) -> Entity:
+        """
+        Adds a tile's props, collision and entity to the map. Does NOT blit the tile anywhere
+
+        Args:
+            layer_id: ID of the tile's layer
+            x: Tile x
+            y: Tile y
+            tile_props: Properties of the tile
+            tile_img: Image of the tile, remembered if the tile has a `tile_img` property
+
+        Returns:
+            The tile's entity ID
+        """
+
+        self.tiles[(layer_id, (x, y))] = tile_props
+        tile_type = self.get_tile_type(tile_props)
+
+        if tile_img is not None and tile_props.get("tile_img"):
+            tile_img_name = tile_props["tile_img"]
+            if tile_img_name not in self.tilename_to_img:
+                self.tilename_to_img[tile_img_name] = tile_img
+
+        if tile_type == tile_component.Type.DEFAULT | tile_component.Type.COLLIDABLE:
+            self.collision_grid[x, y] = True
+        if tile_type & (tile_component.Type.RAMP_UP | tile_component.Type.RAMP_DOWN):
+            self.ramp_grid[x, y] = True
+
+        tile = tile_component.Tile(x, y, TILE_WIDTH, TILE_HEIGHT, tile_type)
+        entity_id = self.world.create_entity(tile)
+        self.entity_tiles[(layer_id, (x, y))] = entity_id
 
-            if obj.name.startswith("tree"):
-                tree_layer_col = [[192, 199, 65], [100, 125, 52], [23, 67, 75]]
-                img = utils.load_img(IMG_DIR / "deco" / "foliage" / f"{obj.name}.png")
-                img = pygame.transform.scale2x(img)
-                img.set_colorkey((0, 0, 0))
-
-                layers = []
-                for i, color in enumerate(tree_layer_col):
-                    if i == 0:
-                        layers.append(utils.extract_color(img, color))
-                    else:
-                        layers.append(
-                            utils.extract_color(
-                                img,
-                                color,
-                                add_surf=(
-                                    layers[-1],
-                                    tree_layer_col[i - 1],
-                                ),
-                            )
+        return entity_id
+
+    def remove_tile(self, layer_id: int, x: int, y: int):
+        """
+        Removes a tile added with `add_tile`
+
+        Args:
+            layer_id: ID of the tile's layer
+            x: Tile x
+            y: Tile y
+        """
+
+        tile_props = self.tiles.pop((layer_id, (x, y)), None)
+        if tile_props is not None:
+            tile_type = self.get_tile_type(tile_props)
+            if tile_type == tile_component.Type.DEFAULT | tile_component.Type.COLLIDABLE:
+                self.collision_grid[x, y] = False
+            if tile_type & (tile_component.Type.RAMP_UP | tile_component.Type.RAMP_DOWN):
+                self.ramp_grid[x, y] = False
+
+        entity_id = self.entity_tiles.pop((layer_id, (x, y)), None)
+        if entity_id is not None:
+            self.world.delete_entity(entity_id)
+
+    def add_object(self, obj: pytmx.TiledObject) -> Optional[Entity]:
+        """
+        Creates the entity of a decoration or interactable Tiled object (signs, trees and grass)
+
+        Args:
+            obj: The Tiled object
+
+        Returns:
+            The entity ID, or None if the object isn't one of those
+        """
+
+        obj_pos = (obj.x // TILE_WIDTH, obj.y // TILE_HEIGHT)
+
+        tile = tile_component.Tile(*obj_pos, obj.width, obj.height)
+        if obj.name == "sign":
+            if obj.text is None:
+                # Dummy text
+                obj.text = (
+                    "Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor "
+                    "incididunt ut labore et dolore magna aliqua. Ut enim ad minim veniam, quis nostrud "
+                    "exercitation ullamco laboris nisi ut aliquip ex ea commodo consequat."
+                )
+            self.interactable_tiles[obj_pos] = self.world.create_entity(
+                tile,
+                tile_component.Interactable(tile, self.tilename_to_img["sign"]),
+                tile_component.Sign(obj.text),
+            )
+            return self.interactable_tiles[obj_pos]
+
+        if obj.name.startswith("tree"):
+            tree_layer_col = [[192, 199, 65], [100, 125, 52], [23, 67, 75]]
+            img = utils.load_img(IMG_DIR / "deco" / "foliage" / f"{obj.name}.png")
+            img = pygame.transform.scale2x(img)
+            img.set_colorkey((0, 0, 0))
+
+            layers = []
+            for i, color in enumerate(tree_layer_col):
+                if i == 0:
+                    layers.append(utils.extract_color(img, color))
+                else:
+                    layers.append(
+                        utils.extract_color(
+                            img,
+                            color,
+                            add_surf=(
+                                layers[-1],
+                                tree_layer_col[i - 1],
+                            ),
                         )
+                    )
 
-                self.world.create_entity(tile, tile_component.Decoration(img, layers))
+            return self.world.create_entity(tile, tile_component.Decoration(img, layers))
 
-            if obj.name == "grass":
-                self.world.create_entity(tile, tile_component.GrassBlades(*obj_pos, obj.width))
+        if obj.name == "grass":
+            return self.world.create_entity(tile, tile_component.GrassBlades(*obj_pos, obj.width))
 
-        return normal_surf, interactable_surf
+        return None
+
+    def remove_object(self, entity: Entity):
+        """
+        Removes an object entity created with `add_object`
+
+        Args:
+            entity: The entity ID
+        """
+
+        if self.world.has_component(entity, tile_component.Interactable):
+            tile = self.world.component_for_entity(entity, tile_component.Tile)
+            self.interactable_tiles.pop((tile.x, tile.y), None)
+        self.world.delete_entity(entity)
+
+    def get_objects(self) -> list[pytmx.TiledObject]:
+        return list(self.tilemap.objects)
+
+    def update(self):
+        """Called every frame. Static maps have nothing to stream in or out"""
+
+    def is_loaded(self, rect: pygame.Rect) -> bool:
+        """Whether the part of the map under a rect is loaded. Static maps are always fully loaded"""
+
+        return True
+
+    def visible_chunks(self, camera: Camera) -> list[tuple[pygame.Rect, pygame.Surface, pygame.Surface]]:
+        """
+        Gets the chunks of the baked map surfaces that are within the camera viewport
+
+        Args:
+            camera: The camera
+
+        Returns:
+            A list of (chunk rect, normal surface, interactable surface). Surfaces can be None if the chunk is empty
+        """
+
+        return [chunk for chunk in self.chunks if camera.visible(chunk[0])]
 
     def get_visible_tile_layers(self) -> list[pytmx.TiledTileLayer]:
         return [layer for layer in self.tilemap.visible_layers if isinstance(layer, pytmx.TiledTileLayer)]
@@ -174,7 +338,7 @@ class TileMap:
 
         neighboring_tile_entities = []
 
-        for layer_id in range(len(self.get_visible_tile_layers())):
+        for layer_id in self.tile_layer_ids:
             for x in range(int(pos.tile_pos.x) - radius, int(pos.tile_pos.x) + radius + 1):
                 for y in range(int(pos.tile_pos.y) - radius, int(pos.tile_pos.y) + radius + 1):
                     try:
@@ -10,13 +10,14 @@ from __future__ import annotations
 import operator
 from typing import Optional, Union
 
-from src import core, pygame
+from src import common, core, pygame
 from src.common import TILE_HEIGHT, TILE_WIDTH
 from src.types import Color, TupSize
 
 from ..display import animation
-from .loaders import (DirLoader, load_font, load_img, load_img_dir, load_imgs,
-                      load_mob_animations)
+from .loaders import (DirLoader, DirWatcher, load_font, load_img, load_img_dir,
+                      load_imgs, load_mob_animations)
+from .text import draw_glyphs, render_text, text_cache
 
 
 class Task:
@@ -64,6 +65,94 @@ class Task:
         return False
 
 
+class Cooldown:
+    def __init__(self, duration: float = 0):
+        """
+        A cooldown that becomes ready again through the timer service, so checking it doesn't need the time
+
+        Args:
+            duration: The duration of the cooldown in milliseconds. Defaults to 0
+        """
+
+        self.duration = duration
+        self.time_started = 0
+        self.ready = True
+
+        self.timer: Optional[core.Timer] = None
+
+    def start(self, duration: Optional[float] = None, elapsed: float = 0):
+        """
+        Starts (or restarts) the cooldown
+
+        Args:
+            duration: A new duration in milliseconds. Defaults to the current duration
+            elapsed: How many milliseconds into the cooldown to start at, e.g when loading a save. Defaults to 0
+        """
+
+        if duration is not None:
+            self.duration = duration
+        if self.timer is not None:
+            self.timer.cancel()
+
+        self.time_started = core.time.get_ticks() - elapsed
+        self.ready = False
+        self.timer = core.timers.after(self.duration - elapsed, self.finish)
+
+    def finish(self):
+        """Makes the cooldown ready, cancelling it if it's still running"""
+
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        self.ready = True
+
+    @property
+    def progress(self) -> float:
+        """How far into the cooldown it is, from 0 to 1"""
+
+        if self.ready or self.duration <= 0:
+            return 1
+        return min((core.time.get_ticks() - self.time_started) / self.duration, 1)
+
+    @property
+    def remaining(self) -> float:
+        """How many milliseconds are left until the cooldown is ready"""
+
+        if self.ready:
+            return 0
+        return max(self.time_started + self.duration - core.time.get_ticks(), 0)
+
+
+def window_to_screen(window_pos: tuple[int, int]) -> tuple[int, int]:
+    """
+    Maps a window position (e.g. the mouse position) to a position on the render target, where the world is drawn
+
+    Args:
+        window_pos: The window position
+
+    Returns:
+        The position on the render target
+    """
+
+    return window_pos[0] // common.RENDER_SCALE, window_pos[1] // common.RENDER_SCALE
+
+
+def window_to_ui(window_pos: tuple[int, int]) -> tuple[int, int]:
+    """
+    Maps a window position (e.g. the mouse position) to a position on the surface UI is drawn on
+
+    Args:
+        window_pos: The window position
+
+    Returns:
+        The position on the UI surface
+    """
+
+    if common.NATIVE_UI:
+        return window_pos
+    return window_to_screen(window_pos)
+
+
 def pixel_to_tile(
     pixel_pos: pygame.Vector2,
     tile_width: int = TILE_WIDTH,
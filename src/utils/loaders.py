@@ -6,18 +6,23 @@ Copyright (c) 2022-present SSS-Says-Snek
 
 from __future__ import annotations
 
+import math
 import os
 import pathlib
+import time
 from functools import lru_cache
-from typing import (IO, Callable, Generic, Iterable, Optional, TypeVar, Union,
-                    overload)
+from typing import (IO, TYPE_CHECKING, Callable, Generic, Iterable, Iterator,
+                    Mapping, Optional, TypeVar, Union, overload)
 
 from src import pygame
 from src.common import ANIM_DIR, FONT_DIR
 from src.display import animation
-from src.types import Color, ImgLoadOptions, JSONSerializable, TupSize
+from src.types import Color, ImgLoadOptions, TupSize
 from src.utils.compat import removesuffix
 
+if TYPE_CHECKING:
+    from src.schema import MobSettings, PlayerSettings
+
 _T = TypeVar("_T")
 
 
@@ -39,6 +44,10 @@ class DirLoader(Generic[_T]):
             open_mode: File open mode
         """
 
+        self.data_dir = data_dir
+        self.file_ext = file_ext
+        self.data_loader = data_loader
+        self.open_mode = open_mode
         self.data = {}
 
         for directory, subcategories, setting_filenames in os.walk(data_dir):
@@ -74,6 +83,51 @@ class DirLoader(Generic[_T]):
             split_keys = [item.split("/") for item in items]
             return [self._reduce_dict(split_key) for split_key in split_keys]
 
+    def __setitem__(self, key: str, value: _T):
+        """Replaces a value, e.g `settings["mobs/player/speed"] = 5`. The dict it's in has to exist already"""
+
+        *parts, last_part = key.split("/")
+        self._reduce_dict(parts)[last_part] = value
+
+    def get_key(self, path: pathlib.Path) -> str:
+        """Gets the key of an asset file, e.g "mobs/player" for `settings/mobs/player.json`"""
+
+        return removesuffix(path.relative_to(self.data_dir).as_posix(), self.file_ext)
+
+    def reload(self, path: pathlib.Path) -> str:
+        """
+        Loads an asset file again, replacing its old value
+
+        Args:
+            path: Path of the asset file
+
+        Returns:
+            The key of the asset
+        """
+
+        key = self.get_key(path)
+        with open(path, self.open_mode) as f:
+            self[key] = self.data_loader(f)
+        return key
+
+    def items(self) -> Iterator[tuple[str, _T]]:
+        """
+        Iterates over every asset in the loader. Assets that are dicts themselves (e.g settings) can't be told apart
+        from directories, so they get walked into
+
+        Returns:
+            An iterator of the key (e.g "items/sword_icon") and the asset
+        """
+
+        dicts = [("", self.data)]
+        while dicts:
+            prefix, current_dict = dicts.pop()
+            for key, value in current_dict.items():
+                if isinstance(value, dict):
+                    dicts.append((f"{prefix}{key}/", value))
+                else:
+                    yield f"{prefix}{key}", value
+
     def _reduce_dict(self, parts: Iterable[str]) -> Union[dict[str, _T], _T]:
         """Utilizes dict references to grab a portion of settings to be updated"""
 
@@ -87,6 +141,63 @@ class DirLoader(Generic[_T]):
         return current_dict
 
 
+class DirWatcher:
+    def __init__(self, loader: DirLoader, interval: float):
+        """
+        Watches the files of a `DirLoader` by polling their modification times, and reloads the ones that changed
+
+        Args:
+            loader: The loader to keep up to date
+            interval: Milliseconds between polls
+        """
+
+        self.loader = loader
+        self.interval = interval
+
+        self.last_polled = -math.inf
+        self.mtimes = self.scan()
+
+    def scan(self) -> dict[pathlib.Path, int]:
+        """Gets the modification time of every asset file"""
+
+        mtimes = {}
+        for path in self.loader.data_dir.rglob(f"*{self.loader.file_ext}"):
+            try:
+                mtimes[path] = path.stat().st_mtime_ns
+            except FileNotFoundError:
+                # Removed since it was listed (e.g an editor saving by renaming a temporary file over it)
+                continue
+        return mtimes
+
+    def poll(self) -> list[str]:
+        """
+        Reloads the files that changed since the last poll, if the interval has passed. Files that fail to load (e.g
+        while they're still being written) keep their old value, and are tried again next poll
+
+        Returns:
+            The keys of the reloaded files
+        """
+
+        now = time.perf_counter() * 1000
+        if now - self.last_polled < self.interval:
+            return []
+        self.last_polled = now
+
+        changed_keys = []
+        for path, mtime in self.scan().items():
+            if self.mtimes.get(path) == mtime:
+                continue
+
+            try:
+                changed_keys.append(self.loader.reload(path))
+            except (OSError, KeyError, ValueError) as e:
+                print(f'Couldn\'t reload "{self.loader.get_key(path)}": {e}')
+                continue
+            self.mtimes[path] = mtime
+
+        return changed_keys
+
+
 @lru_cache(maxsize=256)
 def load_img(path: pathlib.Path, mode: ImgLoadOptions = "alpha", colorkey: Optional[Color] = None) -> pygame.Surface:
     img = pygame.image.load(path)
@@ -130,13 +241,13 @@ def load_font(size: int, font_name: str = "PixelMillenium") -> pygame.font.Font:
 
 
 def load_mob_animations(
-    mob_settings: dict[str, JSONSerializable], size: TupSize = (32, 32)
-) -> tuple[dict[str, animation.Animation], dict]:
+    mob_settings: Union[MobSettings, PlayerSettings], size: TupSize = (32, 32)
+) -> tuple[dict[str, animation.Animation], Mapping[str, float]]:
     """
     Loads animations and animation speed given mob settings
 
     Args:
-        mob_settings: Mob settings
+        mob_settings: Mob settings record
         size: The size of the mob (frame)
 
     Returns:
@@ -144,8 +255,8 @@ def load_mob_animations(
     """
 
     animations = {
-        animation_type: animation.Animation(ANIM_DIR / mob_settings["animation_dir"] / f"{animation_type}.png", size)
-        for animation_type in mob_settings["animation_types"]
+        animation_type: animation.Animation(ANIM_DIR / mob_settings.animation_dir / f"{animation_type}.png", size)
+        for animation_type in mob_settings.animation_types
     }
 
-    return animations, mob_settings["animation_speed"]
+    return animations, mob_settings.animation_speed
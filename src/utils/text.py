@@ -0,0 +1,223 @@
+"""
+This file is a part of the source code for rpg-tile-game
+This project has been licensed under the MIT license.
+Copyright (c) 2022-present SSS-Says-Snek
+
+This file defines the TextCache class, used to avoid rendering the same text over and over again
+"""
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Optional
+
+from src import pygame
+from src.types import Color
+
+from .loaders import load_font
+
+DEFAULT_FONT = "PixelMillenium"
+
+_TextKey = tuple[str, int, str, tuple[int, ...], bool]
+_AtlasKey = tuple[str, int, tuple[int, ...], bool]
+
+
+def get_surf_bytes(surf: pygame.Surface) -> int:
+    return surf.get_pitch() * surf.get_height()
+
+
+class GlyphAtlas:
+    def __init__(self, font: pygame.font.Font, color: Color, antialias: bool):
+        """
+        A strip of individually rendered glyphs, which text can be drawn from without rasterizing the font or
+        allocating a surface. Worth it for short, ever changing text at larger sizes (e.g big numbers), since each
+        glyph is its own blit. Kerning is ignored, which doesn't matter for the pixel fonts in use
+
+        Args:
+            font: The font
+            color: The text color
+            antialias: Whether the glyphs are antialiased
+        """
+
+        self.font = font
+        self.color = color
+        self.antialias = antialias
+
+        self.surf = pygame.Surface((0, font.get_height()), pygame.SRCALPHA)
+        self.glyphs: dict[str, pygame.Rect] = {}
+
+    def add_glyphs(self, chars: str):
+        """
+        Adds glyphs to the atlas. The atlas is rebuilt once for all the new glyphs
+
+        Args:
+            chars: Characters to add
+        """
+
+        new_chars = [char for char in dict.fromkeys(chars) if char not in self.glyphs]
+        if not new_chars:
+            return
+
+        glyph_surfs = [self.font.render(char, self.antialias, self.color).convert_alpha() for char in new_chars]
+        new_width = self.surf.get_width() + sum(glyph_surf.get_width() for glyph_surf in glyph_surfs)
+
+        # Glyphs are copied as is instead of blended onto the transparent atlas, which would darken their edges
+        surf = pygame.Surface((new_width, self.font.get_height()), pygame.SRCALPHA)
+        surf.blit(self.surf, (0, 0), special_flags=pygame.BLEND_RGBA_MAX)
+
+        x = self.surf.get_width()
+        for char, glyph_surf in zip(new_chars, glyph_surfs):
+            self.glyphs[char] = surf.blit(glyph_surf, (x, 0), special_flags=pygame.BLEND_RGBA_MAX)
+            x += glyph_surf.get_width()
+
+        self.surf = surf
+
+    def size(self, text: str) -> tuple[int, int]:
+        self.add_glyphs(text)
+        return sum(self.glyphs[char].width for char in text), self.surf.get_height()
+
+    def draw(self, surf: pygame.Surface, text: str, pos: tuple[int, int]) -> pygame.Rect:
+        """
+        Draws text straight onto a surface, glyph by glyph
+
+        Args:
+            surf: The surface to draw on
+            text: The text
+            pos: Topleft position of the text
+
+        Returns:
+            The region of the surface drawn over
+        """
+
+        self.add_glyphs(text)
+
+        x, y = pos
+        blit_sequence = []
+        for char in text:
+            glyph_rect = self.glyphs[char]
+            blit_sequence.append((self.surf, (x, y), glyph_rect))
+            x += glyph_rect.width
+        surf.blits(blit_sequence, doreturn=False)
+
+        return pygame.Rect(pos, (x - pos[0], self.surf.get_height()))
+
+
+class TextCache:
+    def __init__(self, max_bytes: int = 8 * 1024 * 1024):
+        """
+        A least recently used cache of rendered text surfaces, as well as glyph atlases
+
+        Surfaces returned are shared, so they must not be drawn on. Setting their alpha right before blitting is fine
+
+        Args:
+            max_bytes: How many bytes of text surfaces can be kept before the least recently used get evicted
+        """
+
+        self.max_bytes = max_bytes
+        self.used_bytes = 0
+
+        self.surfs: OrderedDict[_TextKey, pygame.Surface] = OrderedDict()
+        self.atlases: dict[_AtlasKey, GlyphAtlas] = {}
+
+        self.hits = 0
+        self.misses = 0
+
+    def render(
+        self, text: str, size: int, color: Color, antialias: bool = True, font_name: str = DEFAULT_FONT
+    ) -> pygame.Surface:
+        """
+        Renders text, or gets it from the cache if it was rendered before
+
+        Args:
+            text: The text
+            size: The font size
+            color: The text color
+            antialias: Whether the text is antialiased. Defaults to True
+            font_name: The font name. Defaults to PixelMillenium
+
+        Returns:
+            The (shared) text surface
+        """
+
+        key = (font_name, size, text, tuple(pygame.Color(color)), antialias)
+
+        surf = self.surfs.get(key)
+        if surf is not None:
+            self.hits += 1
+            self.surfs.move_to_end(key)
+            return surf
+
+        self.misses += 1
+        surf = load_font(size, font_name).render(text, antialias, color)
+        self.surfs[key] = surf
+        self.used_bytes += get_surf_bytes(surf)
+
+        while self.used_bytes > self.max_bytes and len(self.surfs) > 1:
+            _, evicted_surf = self.surfs.popitem(last=False)
+            self.used_bytes -= get_surf_bytes(evicted_surf)
+
+        return surf
+
+    def get_atlas(
+        self, size: int, color: Color, antialias: bool = True, font_name: str = DEFAULT_FONT
+    ) -> GlyphAtlas:
+        """
+        Gets the glyph atlas of a font, for text that changes too often to be worth caching (e.g numbers)
+
+        Args:
+            size: The font size
+            color: The text color
+            antialias: Whether the text is antialiased. Defaults to True
+            font_name: The font name. Defaults to PixelMillenium
+
+        Returns:
+            The glyph atlas
+        """
+
+        key = (font_name, size, tuple(pygame.Color(color)), antialias)
+
+        atlas = self.atlases.get(key)
+        if atlas is None:
+            atlas = self.atlases[key] = GlyphAtlas(load_font(size, font_name), color, antialias)
+        return atlas
+
+    @property
+    def atlas_bytes(self) -> int:
+        return sum(get_surf_bytes(atlas.surf) for atlas in self.atlases.values())
+
+    def clear(self, atlases: bool = False):
+        """
+        Clears cached text surfaces
+
+        Args:
+            atlases: Whether to clear glyph atlases too. Defaults to False
+        """
+
+        self.surfs.clear()
+        self.used_bytes = 0
+        if atlases:
+            self.atlases.clear()
+
+
+text_cache = TextCache()
+
+
+def render_text(
+    text: str, size: int, color: Color, antialias: bool = True, font_name: Optional[str] = None
+) -> pygame.Surface:
+    """Shortcut of `text_cache.render`"""
+
+    return text_cache.render(text, size, color, antialias, font_name or DEFAULT_FONT)
+
+
+def draw_glyphs(
+    surf: pygame.Surface,
+    text: str,
+    pos: tuple[int, int],
+    size: int,
+    color: Color,
+    antialias: bool = True,
+    font_name: Optional[str] = None,
+) -> pygame.Rect:
+    """Shortcut of drawing with `text_cache.get_atlas`"""
+
+    return text_cache.get_atlas(size, color, antialias, font_name or DEFAULT_FONT).draw(surf, text, pos)